@@ -30,6 +30,9 @@ import pickle
 
 import joblib
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import model_cache
+
 
 logger = logging.getLogger('cumul')
 random.seed(1123)
@@ -111,15 +114,17 @@ def config_logger(args):
 
 
 #SVM with RBF kernel for open world!!
-def GridSearch(train_X,train_Y):
-    global OPEN_WORLD
-    #find the optimal gamma
-    param_grid = [
+PARAM_GRID = [
     { 
      'C': [2**11,2**13,2**15,2**17],
      'gamma' : [2**-3,2**-1,2**1,2**3]
     }
     ]
+
+def GridSearch(train_X,train_Y):
+    global OPEN_WORLD
+    #find the optimal gamma
+    param_grid = PARAM_GRID
     if OPEN_WORLD:
         my_scorer = make_scorer(score_func, greater_is_better=True)
     else:
@@ -166,11 +171,14 @@ if __name__ == '__main__':
 
     # find the optimal params
     # logger.info('GridSearchCV...')
-    clf = GridSearch(X,y)
+    # the search result only depends on the features and the grid, so it is cached
+    setting = dict(open_world = OPEN_WORLD, mon_site_num = MON_SITE_NUM)
+    best_params = model_cache.cached_fit('cumul-grid', args.fp, lambda: GridSearch(X,y).best_params_,
+                                         params = dict(setting, grid = PARAM_GRID))
 
    
-    C = clf.best_params_['C']
-    gamma = clf.best_params_['gamma']
+    C = best_params['C']
+    gamma = best_params['gamma']
     #C, gamma = 131072, 8.000000
     # C, gamma = 8192, 8.00
     # logger.info('Best params are: %d %f'%(C,gamma))
@@ -188,7 +196,8 @@ if __name__ == '__main__':
         X_train, X_test = X[train_index], X[test_index]
         y_train, y_test = y[train_index], y[test_index]
         model = SVC(C = C, gamma = gamma, kernel = 'rbf')
-        model.fit(X_train, y_train)
+        model = model_cache.cached_fit('cumul', args.fp, lambda: model.fit(X_train, y_train),
+                                       index = train_index, params = dict(setting, **model.get_params()))
 
         y_pred = model.predict(X_test)
         r_precision = score_func(y_test, y_pred)
@@ -12,6 +12,9 @@ import pandas as pd
 import joblib
 from sklearn.preprocessing import MinMaxScaler
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import model_cache
 
 random.seed(1123)
 np.random.seed(1123)
@@ -62,7 +65,7 @@ if __name__ == '__main__':
     y = np.array(dic['label'])
 
     model = RandomForestClassifier(n_jobs=-1, n_estimators=1000, oob_score=True)
-    model.fit(X,y)
+    model = model_cache.cached_fit('decision', args.p, lambda: model.fit(X,y), params = model.get_params())
     modeldir = args.p.split('/')[-1].split('.')[0] +'.pkl'
     modeldir = os.path.join(const.modeldir, modeldir)
     joblib.dump(model, modeldir)
@@ -0,0 +1,97 @@
+#Lazy batch access to DF datasets for training and evaluation#
+# open_data() keeps a .dfs store memory-mapped as int8. The datasets below only
+# hold the memmap and the row indices of a fold, and gather + convert to float32
+# one batch at a time, so a fold never copies X[train_index] and the float32
+# matrix of the whole dataset never exists.
+#   TraceDataset / loader()   torch, batches of shape (b, 1, length)
+#   keras_sequence()          keras, batches of shape (b, length, 1), one-hot labels
+import math
+
+import numpy as np
+
+import dfstore
+
+
+def open_data(fpath):
+    '''(X, y) of a .dfs store or of a pickled {'feature', 'label'} .npy dict.
+    y is always int64 class ids; one-hot labels are decoded.'''
+    if fpath.endswith(dfstore.STORE_SUFFIX):
+        X, y = dfstore.open_store(fpath)
+        return X, np.array(y)
+    dic = np.load(fpath, allow_pickle=True).item()
+    X, y = np.asarray(dic['feature']), np.asarray(dic['label'])
+    if X.ndim == 3:
+        X = X[:, :, 0]
+    if y.ndim > 1 and y.shape[1] > 1:
+        y = np.argmax(y, axis=1)
+    return X, y.reshape(len(y)).astype(np.int64)
+
+
+def gather(X, rows, length=None):
+    '''float32 copy of X[rows, :length], reading the rows in file order.'''
+    rows = np.asarray(rows, dtype=np.int64)
+    length = X.shape[1] if length is None else length
+    order = np.argsort(rows, kind='stable')
+    out = np.zeros((len(rows), length), dtype=np.float32)
+    width = min(length, X.shape[1])
+    out[order, :width] = X[rows[order], :width]
+    return out
+
+
+class TraceDataset(object):
+    '''torch map-style dataset over rows `index` of (X, y). It is meant to be
+    indexed with a list of positions (see loader()) and then returns a whole
+    batch: (float32 (b, 1, length), int64 (b,)).'''
+
+    def __init__(self, X, y, index=None, length=None):
+        self.X = X
+        self.y = np.asarray(y, dtype=np.int64)
+        self.index = np.arange(len(X)) if index is None else np.asarray(index, dtype=np.int64)
+        self.length = length
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, pos):
+        rows = self.index[np.atleast_1d(pos)]
+        x = gather(self.X, rows, self.length)[:, np.newaxis, :]
+        if np.ndim(pos) == 0:
+            return x[0], self.y[rows[0]]
+        return x, self.y[rows]
+
+
+def loader(dataset, batch_size, shuffle=False, num_workers=0):
+    '''DataLoader that hands whole batches of positions to the dataset.'''
+    import torch.utils.data as Data
+    sampler = Data.RandomSampler(dataset) if shuffle else Data.SequentialSampler(dataset)
+    return Data.DataLoader(dataset,
+                           sampler=Data.BatchSampler(sampler, batch_size, drop_last=False),
+                           batch_size=None,
+                           num_workers=num_workers)
+
+
+def keras_sequence(X, y, index, batch_size, num_classes=None, length=None, shuffle=False):
+    '''keras.utils.Sequence over rows `index` of X. Without y it only yields inputs (for predict).'''
+    from keras.utils import Sequence
+    index = np.arange(len(X)) if index is None else np.asarray(index, dtype=np.int64)
+
+    class TraceSequence(Sequence):
+        def __init__(self):
+            self.order = index.copy()
+            self.on_epoch_end()
+
+        def __len__(self):
+            return int(math.ceil(len(self.order) / float(batch_size)))
+
+        def __getitem__(self, i):
+            rows = self.order[i * batch_size:(i + 1) * batch_size]
+            x = gather(X, rows, length)[:, :, np.newaxis]
+            if y is None:
+                return x
+            return x, np.eye(num_classes, dtype=np.float32)[y[rows]]
+
+        def on_epoch_end(self):
+            if shuffle:
+                np.random.shuffle(self.order)
+
+    return TraceSequence()
@@ -10,7 +10,12 @@ import const
 from sklearn.model_selection import StratifiedShuffleSplit
 from torchsummary import summary
 import torch.utils.data as Data
+import multiprocessing as mp
+import os
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from torchmodel import DF
+import dfdata
 
 # Device configuration
 device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
@@ -43,9 +48,8 @@ def init_logger():
 
 
 def load_data(fpath):
-    train = np.load(fpath, allow_pickle=True).item()
-    X, y = train['feature'], train['label']
-    return X, y
+    # .dfs rows stay memory-mapped; batches are converted to float32 by dfdata
+    return dfdata.open_data(fpath)
 
 
 def score_func(predictions, ground_truths, mon_site_num):
@@ -67,6 +71,95 @@ def score_func(predictions, ground_truths, mon_site_num):
 
 
 
+def set_threads(threads):
+    '''Intra-op threads of this process. DF is one chain of layers, so inter-op
+    parallelism only oversubscribes the cores.'''
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # already fixed once parallel work has run in this process
+        pass
+
+
+def init_worker(threads):
+    init_logger()
+    set_threads(threads)
+
+
+def inference_model(model, mode):
+    '''(model, autocast context) used for testing: fp32, bf16 autocast or int8 dynamic quantization.'''
+    if mode == 'int8':
+        # dynamic quantization covers the Linear layers and runs on CPU only
+        model = torch.quantization.quantize_dynamic(model.to('cpu'), {nn.Linear}, dtype=torch.qint8)
+        return model, contextlib.nullcontext(), torch.device('cpu')
+    if mode == 'bf16':
+        return model, torch.autocast(device.type, dtype=torch.bfloat16), device
+    return model, contextlib.nullcontext(), device
+
+
+def run_fold(folder_num, feature_path, y_rows, train_rows, test_rows, num_classes, mon_site_num, args):
+    '''Train and test DF on one fold; returns (tp, wp, fp, p, n).'''
+    logger = logging.getLogger('df')
+    X, _ = load_data(feature_path)
+    model = DF(length, num_classes).to(device)
+    # summary(model, (1, length))
+    # Loss and optimizer
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adamax(model.parameters())
+
+    logger.info("train shape: {} {}".format((len(train_rows), 1, length), (len(train_rows),)))
+    logger.info("test shape: {} {}".format((len(test_rows), 1, length), (len(test_rows),)))
+    # the datasets index into the memory-mapped X, labels are per row of X
+    train_dataset = dfdata.TraceDataset(X, y_rows, train_rows, length)
+    test_dataset = dfdata.TraceDataset(X, y_rows, test_rows, length)
+
+    train_loader = dfdata.loader(train_dataset, batch_size, shuffle=True, num_workers=args.workers)
+    test_loader = dfdata.loader(test_dataset, batch_size, shuffle=False, num_workers=args.workers)
+    total_step = len(train_loader)
+    fold_start = time.time()
+    for epoch in range(num_epochs):
+        epoch_start = time.time()
+        for step, (batch_x, batch_y) in enumerate(train_loader):
+            batch_x = batch_x.to(device).contiguous()
+            batch_y = batch_y.to(device)
+            # Forward pass
+            outputs = model(batch_x)
+            loss = criterion(outputs, batch_y)
+
+            # Backward and optimize
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            if (step + 1) % 50 == 0:
+                logger.info('Epoch [{}/{}], Step [{}/{}], Loss: {:.4f}'
+                      .format(epoch + 1, num_epochs, step + 1, total_step, loss.item()))
+        logger.info('Fold #{} epoch [{}/{}]: {:.1f} traces/s'
+                    .format(folder_num, epoch + 1, num_epochs, len(train_dataset) / (time.time() - epoch_start)))
+    train_time = time.time() - fold_start
+    # Test the model
+    model.eval()  # eval mode (batchnorm uses moving mean/variance instead of mini-batch mean/variance)
+    model, autocast, test_device = inference_model(model, args.infer)
+    tps, wps, fps, ps, ns = 0, 0, 0, 0, 0
+    test_start = time.time()
+    with torch.no_grad(), autocast:
+        for batch_x, batch_y in test_loader:
+            batch_x = batch_x.to(test_device).contiguous()
+            outputs = model(batch_x)
+            _, predicted = torch.max(outputs.data, 1)
+            # print(predicted)
+            tp, wp, fp, p, n = score_func(predicted.data.cpu().numpy(), batch_y.numpy(), mon_site_num)
+            logger.info("Fold #{}: {} {} {} {} {}".format(folder_num, tp, wp, fp, p, n))
+            tps, wps, fps, ps, ns = tps + tp, wps + wp, fps + fp, ps + p, ns + n
+    logger.info('Fold #{} done: train {:.1f} traces/s, test ({}) {:.1f} traces/s'
+                .format(folder_num, num_epochs * len(train_dataset) / train_time, args.infer,
+                        len(test_dataset) / max(time.time() - test_start, 1e-9)))
+    # Save the model checkpoint
+    # torch.save(model.state_dict(), 'models/df.ckpt')
+    return tps, wps, fps, ps, ns
+
+
 if __name__ == '__main__':
     cf = read_conf(const.confdir)
     MON_SITE_NUM = int(cf['monitored_site_num'])
@@ -79,108 +172,61 @@ if __name__ == '__main__':
     parser.add_argument('feature_path',
                         metavar='<feature path>',
                         help='Path to the directory of the extracted features')
+    parser.add_argument('-fold_jobs',
+                        type=int,
+                        default=1,
+                        help='Number of folds trained at the same time, each in its own process.')
+    parser.add_argument('-threads',
+                        type=int,
+                        default=None,
+                        help='Intra-op threads per fold (default: cores / fold_jobs).')
+    parser.add_argument('-workers',
+                        type=int,
+                        default=2,
+                        help='Data loading processes per fold.')
+    parser.add_argument('-infer',
+                        default='fp32',
+                        choices=['fp32', 'bf16', 'int8'],
+                        help='Precision of the test pass: bf16 autocast or int8 dynamic quantization.')
     args = parser.parse_args()
+    if args.threads is None:
+        args.threads = max(1, (os.cpu_count() or 1) // max(1, args.fold_jobs))
 
     X, y = load_data(args.feature_path)
-    X = X[:, :length]
-    X = X.astype('float32')
-
-    # we need a [Length x 1] x n shape as input to the DFNet (Tensorflow)
-    if len(X.shape) < 3:
-        X = X[:, :, np.newaxis]
-    if len(y.shape) > 1 and y.shape[1] > 1:
-        y = np.argmax(y, axis=1)
 
+    # rows of X taking part; X itself is never copied or converted as a whole
+    rows = np.arange(len(y))
     if not open_world:
-        X = X[y < MON_SITE_NUM]
-        y = y[y < MON_SITE_NUM]
+        rows = rows[y < MON_SITE_NUM]
+    y = y[rows]
     num_classes = MON_SITE_NUM + open_world
-    # X = X[:,:cut_length,:]
-    X = torch.from_numpy(X).permute(0, 2, 1)
-    y = torch.from_numpy(y)
+    # fix labels of synthesized traces for training, labels are per row of X
+    y_rows = np.zeros(len(X), dtype=np.int64)
+    y_rows[rows] = np.where(y < 0, -(y + 1), y)
 
 
     sss = StratifiedShuffleSplit(n_splits=10, test_size=0.1, random_state=0)
-    tps, wps, fps, ps, ns = 0, 0, 0, 0, 0
-    start_time = time.time()
+    jobs = []
     folder_num = 0
-    for train_index, test_index in sss.split(X, y):
+    for train_index, test_index in sss.split(np.zeros(len(y)), y):
         folder_num += 1
         # if folder_num > 2:
         #     break
+        # remove synthesized traces in testset
+        test_index = test_index[y[test_index] >= 0]
+        jobs.append((folder_num, args.feature_path, y_rows, rows[train_index], rows[test_index],
+                     num_classes, MON_SITE_NUM, args))
 
-        model = DF(length, num_classes).to(device)
-        # summary(model, (1, length))
-        # Loss and optimizer
-        criterion = nn.CrossEntropyLoss()
-        optimizer = torch.optim.Adamax(model.parameters())
-
-        X_train, X_test = X[train_index], X[test_index]
-        y_train, y_test = y[train_index], y[test_index]
-
-        # logger.info("train shape: {} {}".format(X_train.data.shape, y_train.data.shape))
-        # logger.info("test shape: {} {}".format(X_test.data.shape, y_test.data.shape))
-        # remove synthesized traces in testset, meanwhile, fix labels for trainset
-        X_test = X_test[y_test >= 0]
-        y_test = y_test[y_test >= 0]
-        y_train[y_train < 0] = -(y_train[y_train < 0] + 1)
-        assert np.all(y_train.numpy() >= 0) and np.all(y_test.numpy() >= 0)
-        logger.info("train shape: {} {}".format(X_train.data.shape, y_train.data.shape))
-        logger.info("test shape: {} {}".format(X_test.data.shape, y_test.data.shape))
-        # (unique, counts) = np.unique(y_train, return_counts=True)
-        # frequencies = np.asarray((unique, counts)).T
-        # print(frequencies)
-
-        train_dataset = Data.TensorDataset(X_train, y_train)
-        test_dataset = Data.TensorDataset(X_test, y_test)
-
-        train_loader = Data.DataLoader(
-            dataset=train_dataset,  # torch TensorDataset format
-            batch_size=batch_size,  # mini batch size
-            shuffle=True,
-            num_workers=2,
-        )
-        test_loader = Data.DataLoader(
-            dataset=test_dataset,  # torch TensorDataset format
-            batch_size=batch_size,  # mini batch size
-            shuffle=False,
-            num_workers=2,
-        )
-        total_step = len(train_loader)
-        for epoch in range(num_epochs):
-            for step, (batch_x, batch_y) in enumerate(train_loader):
-                batch_x = batch_x.to(device)
-                batch_y = batch_y.to(device)
-                # Forward pass
-                outputs = model(batch_x)
-                loss = criterion(outputs, batch_y)
-
-                # Backward and optimize
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
-
-                if (step + 1) % 50 == 0:
-                    logger.info('Epoch [{}/{}], Step [{}/{}], Loss: {:.4f}'
-                          .format(epoch + 1, num_epochs, step + 1, total_step, loss.item()))
-        # Test the model
-        model.eval()  # eval mode (batchnorm uses moving mean/variance instead of mini-batch mean/variance)
-        with torch.no_grad():
-            correct = 0
-            total = 0
-            for batch_x, batch_y in test_loader:
-                batch_x = batch_x.to(device)
-                batch_y = batch_y.to(device)
-                outputs = model(batch_x)
-                _, predicted = torch.max(outputs.data, 1)
-                # print(predicted)
-                tp, wp, fp, p, n = score_func(predicted.data.cpu().numpy(), batch_y.data.cpu().numpy(), MON_SITE_NUM)
-                logger.info("Fold #{}: {} {} {} {} {}".format(folder_num, tp, wp, fp, p, n))
-                tps, wps, fps, ps, ns = tps + tp, wps + wp, fps + fp, ps + p, ns + n
-                # total += batch_y.size(0)
-                # correct += (predicted == batch_y).sum().item()
-        del model
-            # print('Test Accuracy on {} examples: {} %'.format(total, 100 * correct / total))
-        # Save the model checkpoint
-        # torch.save(model.state_dict(), 'models/df.ckpt')
+    start_time = time.time()
+    if args.fold_jobs <= 1:
+        set_threads(args.threads)
+        results = [run_fold(*job) for job in jobs]
+    else:
+        # spawn: forking a process that already ran torch kernels can deadlock
+        with ProcessPoolExecutor(args.fold_jobs, mp_context=mp.get_context('spawn'),
+                                 initializer=init_worker, initargs=(args.threads,)) as executor:
+            results = list(executor.map(run_fold, *zip(*jobs)))
+    tps, wps, fps, ps, ns = np.sum(results, axis=0)
+    logger.info("{} folds in {:.1f} s, {} fold(s) at a time with {} thread(s) each"
+                .format(len(jobs), time.time() - start_time, args.fold_jobs, args.threads))
     logger.info("{} {} {} {} {}\n".format(tps, wps, fps, ps, ns))
@@ -0,0 +1,80 @@
+#int8 memory-mapped DF dataset, built row by row#
+# Layout of a .dfs file:
+#   MAGIC | uint64 n | uint64 length | uint64 num_class   (32 bytes)
+#   X  int8[n, length]   packet directions (+1/-1), zero padded/truncated to length
+#   y  int64[n]          class ids (not one-hot), 8-byte aligned after X
+# The builder preallocates X for every input file and fills it as pool results
+# arrive, so only a few rows are ever held in Python. Traces dropped by the
+# row function are skipped and the file is shrunk to the rows kept.
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+MAGIC = b'WFDFSET1'
+HEADER = len(MAGIC) + 3 * 8
+STORE_SUFFIX = '.dfs'
+
+
+def _align(n):
+    return (n + 7) // 8 * 8
+
+
+def direction_row(feature, length):
+    '''pad_sequences(padding='post', truncating='post', value=0) of one trace, as int8 directions.'''
+    row = np.zeros(length, dtype=np.int8)
+    feature = np.sign(np.asarray(feature[:length]))
+    row[:len(feature)] = feature
+    return row
+
+
+def build(flist, out_path, row_fn, length, num_class, n_jobs=20):
+    '''Write row_fn(f) -> (int8 row, class id) or None for every f of flist into out_path.'''
+    tmp_out = out_path + '.tmp'
+    with open(tmp_out, 'wb') as fo:
+        fo.truncate(HEADER + len(flist) * length)
+    n = 0
+    labels = []
+    if len(flist):
+        X = np.memmap(tmp_out, dtype=np.int8, mode='r+', offset=HEADER, shape=(len(flist), length))
+        pool = mp.Pool(n_jobs)
+        try:
+            for res in pool.imap(row_fn, flist, chunksize=16):
+                if res is None:
+                    continue
+                X[n] = res[0]
+                labels.append(res[1])
+                n += 1
+        finally:
+            pool.close()
+            pool.join()
+        X.flush()
+        del X
+    with open(tmp_out, 'r+b') as fo:
+        fo.write(MAGIC)
+        fo.write(np.array([n, length, num_class], dtype=np.uint64).tobytes())
+        fo.seek(_align(HEADER + n * length))
+        fo.write(np.array(labels, dtype=np.int64).tobytes())
+        fo.truncate()
+    os.replace(tmp_out, out_path)
+    return out_path
+
+
+def open_store(path):
+    '''(X, y) of a .dfs file: X is a read-only int8 memmap of shape (n, length).'''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a DF dataset".format(path))
+        n, length, num_class = (int(v) for v in np.frombuffer(f.read(24), dtype=np.uint64))
+    if n == 0:
+        return np.zeros((0, length), dtype=np.int8), np.zeros(0, dtype=np.int64)
+    X = np.memmap(path, dtype=np.int8, mode='r', offset=HEADER, shape=(n, length))
+    y = np.memmap(path, dtype=np.int64, mode='r', offset=_align(HEADER + n * length), shape=(n,))
+    return X, y
+
+
+def num_classes(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a DF dataset".format(path))
+        return int(np.frombuffer(f.read(24), dtype=np.uint64)[2])
@@ -13,6 +13,7 @@ import logging
 import argparse
 import configparser
 import const
+import dfdata
 import numpy as np
 
 
@@ -112,17 +113,10 @@ if __name__ == '__main__':
     model = load_model(args.m)
 
     # logger.info('loading test data...')
-    dic = np.load(args.p, allow_pickle=True).item()
-    X = np.array(dic['feature'])
-    y = np.array(dic['label'])
-    if y.shape[-1] > 1:
-        #means the data is one-hot encoded
-        y = np.argmax(y, axis= 1)
-    
-    if len(X.shape) < 3:
-        X = X[:, :, np.newaxis]
+    # X stays memory-mapped for .dfs stores, one-hot labels are decoded
+    X, y = dfdata.open_data(args.p)
 
-    y_pred = model.predict(X)
+    y_pred = model.predict_generator(dfdata.keras_sequence(X, None, None, 128))
     y_pred = np.argmax(y_pred,axis = 1)
     print(sum(y_pred==MON_SITE_NUM))
     score_func(y, y_pred)
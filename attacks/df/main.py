@@ -12,6 +12,7 @@ import argparse
 import configparser
 import logging
 import const
+import dfdata
 import keras
 import tensorflow as tf
 from sklearn.model_selection import StratifiedShuffleSplit
@@ -39,9 +40,8 @@ def init_logger():
     return logger
 
 def loadData(fpath):
-    train = np.load(fpath).item()
-    train_X ,train_y = train['feature'], train['label']
-    return train_X, train_y
+    # X stays memory-mapped for .dfs stores, y are class ids
+    return dfdata.open_data(fpath)
 
 def score_func(ground_truths, predictions):
     global MON_SITE_NUM
@@ -104,31 +104,23 @@ if __name__ == "__main__":
 
     X, y = loadData(args.feature_path)
     K.set_image_dim_ordering("tf") # tf is tensorflow
-    # consider them as float and normalize
-    X = X.astype('float32')
-    y = y.astype('float32')
-    # print(y_train)
-
-
-    # we need a [Length x 1] x n shape as input to the DFNet (Tensorflow)
-    if len(X.shape) < 3:
-        X = X[:, :,np.newaxis]
-    if y.shape[1] == 1:
-        y = y.flatten()
-        y = to_categorical(y, num_classes = NB_CLASSES) 
+    # batches are converted to float32 [Length x 1] inputs and one-hot labels by dfdata
     # print(X.shape[0], 'data samples')
 
     sss = StratifiedShuffleSplit(n_splits=10, test_size=0.1, random_state=0)
     tps, wps, fps, ps, ns = 0, 0, 0, 0, 0
     start_time = time.time()
     folder_num = 1
-    for train_index, test_index in sss.split(X,y):
+    for train_index, test_index in sss.split(np.zeros(len(y)),y):
         # logger.info('Testing fold %d'%folder_num)
         folder_num += 1 
 #       if folder_num > 2:
 #           break
-        X_train, X_test = X[train_index], X[test_index]
-        y_train, y_test = y[train_index], y[test_index]
+        # same hold-out as validation_split=0.1: the last 10% of the training rows
+        split_at = int(len(train_index) * (1. - 0.1))
+        train_seq = dfdata.keras_sequence(X, y, train_index[:split_at], BATCH_SIZE, NB_CLASSES, LENGTH, shuffle=True)
+        valid_seq = dfdata.keras_sequence(X, y, train_index[split_at:], BATCH_SIZE, NB_CLASSES, LENGTH)
+        test_seq = dfdata.keras_sequence(X, None, test_index, BATCH_SIZE, length=LENGTH)
         
         
         # initialize the optimizer and model
@@ -140,12 +132,11 @@ if __name__ == "__main__":
         # print ("Model compiled")
 
         # Start training
-        history = model.fit(X_train, y_train,
-                batch_size=BATCH_SIZE, epochs=NB_EPOCH, verbose=VERBOSE,validation_split=0.1)
+        history = model.fit_generator(train_seq, epochs=NB_EPOCH, verbose=VERBOSE, validation_data=valid_seq)
 
-        y_pred = model.predict(X_test)
+        y_pred = model.predict_generator(test_seq)
         y_pred = np.argmax(y_pred,axis = 1)
-        y_test = np.argmax(y_test, axis= 1)
+        y_test = y[test_index]
 
         tp, wp, fp, p, n = score_func(y_test, y_pred)
         tps += tp
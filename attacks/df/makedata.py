@@ -12,6 +12,10 @@ import pandas as pd
 from keras.preprocessing.sequence import pad_sequences
 from keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import trace_store
+import dfstore
 logger = logging.getLogger('df')
 
 
@@ -55,19 +59,35 @@ def extractfeature(f):
 #        
 #    except:
 #        raise ValueError("..")
-    with open(f,'r') as f:
-        tcp_dump = f.readlines()
-        if len(tcp_dump) < 50:
-            return None
+    _, lengths = trace_store.load(f)
+    if len(lengths) < 50:
+        return None
 
-    feature = pd.Series(tcp_dump).str.slice(0,-1).str.split('\t',expand = True).astype("float")
-    feature = np.array(feature.iloc[:,1]).astype("int")
+    feature = lengths.astype("int")
+    return (feature,filelabel(fname))
+
+def filelabel(fname):
+    global MON_SITE_NUM
     if '-' in fname:
         label = fname.split('-')
         label = int(label[0])
     else:
         label = MON_SITE_NUM
-    return (feature,label)
+    return label
+
+def extractrow(f):
+    res = extractfeature(f)
+    if res is None:
+        return None
+    return dfstore.direction_row(res[0], LENGTH), res[1]
+
+def save_store(flist, outputdir, num_class):
+    '''Stream the traces of flist into an int8 .dfs dataset, labels as class ids.'''
+    outputdir = outputdir + dfstore.STORE_SUFFIX
+    dfstore.build(flist, outputdir, extractrow, LENGTH, num_class, n_jobs = 20)
+    X, y = dfstore.open_store(outputdir)
+    logger.info("Data size:{}, {}".format(X.shape, y.shape))
+    logger.info('save to %s'% outputdir)
 
 
 if __name__== '__main__':
@@ -99,6 +119,9 @@ if __name__== '__main__':
                         metavar='<suffix of files>',
                         help='The suffix of files',
                         default = ".cell")
+    parser.add_argument('-store',
+                        action='store_true',
+                        help='Write an int8 memory-mapped .dfs dataset (class ids, no one-hot) instead of a .npy dict')
     args = parser.parse_args()
     
   
@@ -128,7 +151,23 @@ if __name__== '__main__':
         if os.path.exists( os.path.join(args.traces_path, str(i)+ args.format) ):
             flist.append( os.path.join( args.traces_path, str(i)+ args.format) )
 
-    if args.mode == "all":
+    if args.store:
+        if args.mode == "all":
+            # split on file names; traces too short to keep are dropped afterwards
+            train_f, test_f = train_test_split(flist, shuffle = True, test_size=0.1, \
+                                               stratify = [filelabel(f.split('/')[-1]) for f in flist])
+            save_store(train_f, outputdir+"_train", num_class)
+            save_store(test_f, outputdir+"_test", num_class)
+        elif args.mode == "whole":
+            save_store(flist, outputdir, num_class)
+        elif args.mode == "train":
+            save_store(flist, outputdir+"_train", num_class)
+        elif args.mode == "test":
+            save_store(glob.glob(os.path.join(args.traces_path, 'head/*/*')), outputdir+"_head", num_class)
+            otherflist = glob.glob(os.path.join(args.traces_path, 'other/*/*'))
+            if len(otherflist) > 1:
+                save_store(otherflist, outputdir+"_other", num_class)
+    elif args.mode == "all":
         ##this is for evaluating front, 9:1 ,training : testing
         # fpath = os.path.join(args.traces_path,'*')
         # flist = glob.glob(fpath)
@@ -9,6 +9,7 @@ import os
 import argparse
 import logging
 import const
+import dfdata
 import keras
 import tensorflow as tf
 config = tf.ConfigProto( device_count = {'GPU': 1 , 'CPU': 20} ) 
@@ -30,9 +31,8 @@ def init_logger():
     return logger
 
 def loadData(fpath):
-	train = np.load(fpath).item()
-	train_X ,train_y = train['feature'], train['label']
-	return train_X, train_y
+	# X stays memory-mapped for .dfs stores, y are class ids
+	return dfdata.open_data(fpath)
 
 
 if __name__ == "__main__":
@@ -65,14 +65,11 @@ if __name__ == "__main__":
 
     X_train, y_train = loadData(args.feature_path)
     K.set_image_dim_ordering("tf") # tf is tensorflow
-    # consider them as float and normalize
-    X_train = X_train.astype('float32')
-    y_train = y_train.astype('float32')
-    # print(y_train)
-
-
-    # we need a [Length x 1] x n shape as input to the DFNet (Tensorflow)
-    X_train = X_train[:, :,np.newaxis]
+    # batches are converted to float32 [Length x 1] inputs and one-hot labels by dfdata
+    # same hold-out as validation_split=0.1: the last 10% of the rows
+    split_at = int(len(y_train) * (1. - 0.1))
+    train_seq = dfdata.keras_sequence(X_train, y_train, np.arange(split_at), BATCH_SIZE, NB_CLASSES, LENGTH, shuffle=True)
+    valid_seq = dfdata.keras_sequence(X_train, y_train, np.arange(split_at, len(y_train)), BATCH_SIZE, NB_CLASSES, LENGTH)
 
 
     print(X_train.shape[0], 'training samples')
@@ -93,8 +90,7 @@ if __name__ == "__main__":
     print ("Model compiled")
 
     # Start training
-    history = model.fit(X_train, y_train,
-    		batch_size=BATCH_SIZE, epochs=NB_EPOCH, verbose=VERBOSE,validation_split=0.1)
+    history = model.fit_generator(train_seq, epochs=NB_EPOCH, verbose=VERBOSE, validation_data=valid_seq)
 
     # Save model
     print ("Saving Model")
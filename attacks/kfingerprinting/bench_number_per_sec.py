@@ -0,0 +1,69 @@
+#Micro-benchmark of the per-second packet counting in number_per_sec.
+#Synthetic traces mimic glued l-traces: long, at a roughly constant packet rate.
+#   python3 bench_number_per_sec.py -sizes 10000 50000 200000
+import argparse
+import math
+import time
+
+import numpy as np
+
+import kfp_features
+
+
+def legacy_per_second(times):
+    '''The original O(packets x seconds) loop of number_per_sec.'''
+    temp = []
+    for i in range(1, int(math.ceil(times[-1]))+1):
+        c = 0
+        for t in times:
+            if t <= i:
+                c+=1
+        temp.append(c)
+    return [b - a for a, b in zip([0] + temp, temp)]
+
+def make_times(n, rate, seed=1123):
+    rng = np.random.RandomState(seed)
+    return np.cumsum(rng.exponential(1.0/rate, n))
+
+def best_of(fn, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark k-FP number_per_sec.')
+    parser.add_argument('-sizes',
+                        type=int,
+                        nargs='+',
+                        default=[10000, 50000, 200000],
+                        help='Trace lengths in packets.')
+    parser.add_argument('-rate',
+                        type=float,
+                        default=100.0,
+                        help='Packets per second of the synthetic traces.')
+    parser.add_argument('-legacy_max',
+                        type=int,
+                        default=50000,
+                        help='Only time the quadratic loop up to this many packets.')
+    parser.add_argument('-repeat',
+                        type=int,
+                        default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    print("{:>8} {:>8} {:>14} {:>14} {:>9}".format('packets', 'seconds', 'histogram (s)', 'legacy (s)', 'speedup'))
+    for n in args.sizes:
+        times = make_times(n, args.rate)
+        fast = best_of(kfp_features.per_second_diffs, times, args.repeat)
+        if n <= args.legacy_max:
+            tlist = times.tolist()
+            legacy = best_of(legacy_per_second, tlist, 1)
+            assert legacy_per_second(tlist) == kfp_features.per_second_diffs(times).tolist()
+            print("{:>8} {:>8} {:>14.6f} {:>14.4f} {:>8.0f}x".format(n, int(math.ceil(times[-1])), fast, legacy, legacy/fast))
+        else:
+            print("{:>8} {:>8} {:>14.6f} {:>14} {:>9}".format(n, int(math.ceil(times[-1])), fast, '-', '-'))
@@ -6,6 +6,7 @@ import argparse
 import configparser
 import numpy as np
 import multiprocessing
+import leaf_knn
 
 logger = logging.getLogger('kf')
 
@@ -84,15 +85,8 @@ def read_conf(file):
 
 
 def get_single_neighbor(testleaf):
-    global trainleaves, K
-    
-    # print(trainleaves[:2])
-    trainleaf, trainlabel = list(zip(*trainleaves))[0], list(zip(*trainleaves))[1]
-    trainleaf = np.array(trainleaf)
-    trainlabel = np.array(trainlabel)
-    atile = np.tile(testleaf[0], (trainleaf.shape[0],1))
-    dists = np.sum(atile != trainleaf, axis = 1)
-    k_neighbors = trainlabel[np.argsort(dists)[:K]]
+    global trainleaf, trainlabel, K
+    k_neighbors = leaf_knn.neighbor_labels(trainleaf, [testleaf[0]], trainlabel, K)[0]
     return [testleaf[1], k_neighbors]
     # if len(set(k_neighbors)) == 1:
     #     return k_neighbors[0]
@@ -112,14 +106,14 @@ def get_single_neighbor(testleaf):
 #     return [testleaf[1],guessclasses]
 
 def parallel_get_neighbors(traindata, testdata, MAX_K, n_jobs = 15):
-    global trainleaves, K
+    global trainleaf, trainlabel, K
     K = MAX_K
-    trainleaves = list(traindata)
-    testleaves = list(testdata)
+    trainleaf, trainlabel = zip(*traindata)
+    trainleaf, trainlabel = np.array(trainleaf), np.array(trainlabel)
+    testleaf, testlabel = zip(*testdata)
 
-    pool = multiprocessing.Pool(n_jobs)
-    neighbors = pool.map(get_single_neighbor, testleaves)
-    return neighbors
+    k_neighbors = leaf_knn.neighbor_labels(trainleaf, np.array(testleaf), trainlabel, K, n_jobs = n_jobs)
+    return [[y, k] for y, k in zip(testlabel, k_neighbors)]
 
 # def get_neighbors(traindata, testdata, MAX_K):
 #     neighbors = [] 
@@ -0,0 +1,177 @@
+#Array based k-FP features.
+#A trace is parsed once into two arrays (times relative to the first packet,
+#directions +1 OUT / -1 IN) and all 175 features are computed from them.
+#Values -- and their Python/NumPy types -- are identical to the list based
+#helpers extract.py used to have (kept as the reference in tests/test_kfp_features.py),
+#so features stay comparable with existing .npy files.
+#Sums that the original takes with the builtin sum() over Python floats are
+#still taken that way: NumPy's pairwise summation would round differently.
+import math
+import numpy as np
+
+
+def parse_trace(trace_data):
+    '''Lines "time direction ..." -> (relative times, directions), as get_pkt_list.'''
+    rows = [line.split(None, 2) for line in trace_data]
+    times = np.array([float(r[0]) for r in rows], dtype=np.float64)
+    sizes = np.array([float(r[1]) for r in rows], dtype=np.float64)
+    return times - times[0], np.where(sizes > 0, 1, -1)
+
+def from_arrays(times, lengths):
+    '''(absolute times, signed lengths) arrays, e.g. from trace_store -> parse_trace output.'''
+    times = np.asarray(times, dtype=np.float64)
+    return times - times[0], np.where(np.asarray(lengths) > 0, 1, -1)
+
+
+def _mean(x):
+    return sum(x.tolist())/float(len(x))
+
+def interarrival_maxminmeansd_stats(times, dirs):
+    In = np.diff(times[dirs == -1])
+    Out = np.diff(times[dirs == 1])
+    Total = np.diff(times)
+    if len(In) and len(Out):
+        return [float(In.max()), float(Out.max()), float(Total.max()), _mean(In), _mean(Out), _mean(Total),
+                np.std(In), np.std(Out), np.std(Total),
+                np.percentile(In, 75), np.percentile(Out, 75), np.percentile(Total, 75)]
+    elif len(Out):
+        return [0, float(Out.max()), float(Total.max()), 0, _mean(Out), _mean(Total),
+                0, np.std(Out), np.std(Total), 0, np.percentile(Out, 75), np.percentile(Total, 75)]
+    elif len(In):
+        return [float(In.max()), 0, float(Total.max()), _mean(In), 0, _mean(Total),
+                np.std(In), 0, np.std(Total), np.percentile(In, 75), 0, np.percentile(Total, 75)]
+    # the list based version fails on such a trace too
+    raise ValueError("need at least two packets in one direction")
+
+def time_percentile_stats(times, dirs):
+    stats = []
+    for t in (times[dirs == -1], times[dirs == 1], times):
+        if len(t):
+            stats.extend(np.percentile(t, q) for q in (25, 50, 75, 100))
+        else:
+            stats.extend([0]*4)
+    return stats
+
+def number_pkt_stats(dirs):
+    n_in = int(np.count_nonzero(dirs == -1))
+    n_out = int(np.count_nonzero(dirs == 1))
+    return n_in, n_out, len(dirs)
+
+def first_and_last_30_pkts_stats(dirs):
+    first30, last30 = dirs[:30], dirs[-30:]
+    return [int(np.count_nonzero(first30 == -1)), int(np.count_nonzero(first30 == 1)),
+            int(np.count_nonzero(last30 == -1)), int(np.count_nonzero(last30 == 1))]
+
+#concentration of outgoing packets in chunks of 20 packets
+def pkt_concentration_stats(dirs):
+    concentrations = np.add.reduceat((dirs == 1).astype(np.int64), np.arange(0, len(dirs), 20))
+    conc = concentrations.tolist()
+    return np.std(conc), sum(conc)/float(len(conc)), np.percentile(conc, 50), min(conc), max(conc), conc
+
+def per_second_diffs(times):
+    '''Packets added in every second i = 1 .. ceil(last packet time), counting
+    everything up to second 1 in the first bucket. A histogram of ceil(t): for an
+    integer i, t <= i exactly when ceil(t) <= i, so this is O(n) instead of
+    rescanning the trace once per second.'''
+    last_second = int(math.ceil(times[-1]))
+    if last_second < 1:
+        return np.zeros(0, dtype=np.int64)
+    secs = np.maximum(np.ceil(times), 1)
+    secs = secs[secs <= last_second].astype(np.int64)
+    return np.bincount(secs, minlength=last_second + 1)[1:]
+
+#Average number packets sent and received per second
+def number_per_sec(times):
+    l = per_second_diffs(times).tolist()
+    if len(l) == 0:
+        raise ValueError("trace shorter than one second")
+    avg_number_per_sec = sum(l)/float(len(l))
+    return avg_number_per_sec, np.std(l), np.percentile(l, 50), min(l), max(l), l
+
+#Variant of packet ordering features from http://cacr.uwaterloo.ca/techreports/2014/cacr2014-05.pdf
+def avg_pkt_ordering_stats(dirs):
+    temp1 = np.flatnonzero(dirs == 1)
+    temp2 = np.flatnonzero(dirs == -1)
+    avg_in = int(temp1.sum())/float(len(temp1))
+    avg_out = int(temp2.sum())/float(len(temp2))
+    return avg_in, avg_out, np.std(temp1.tolist()), np.std(temp2.tolist())
+
+def perc_inc_out(dirs):
+    n_in, n_out, n_total = number_pkt_stats(dirs)
+    return n_in/float(n_total), n_out/float(n_total)
+
+def chunk_sums(seq, num):
+    '''[sum(x) for x in chunkIt(seq, num)] of the reference, without building the chunks.'''
+    avg = len(seq) / float(num)
+    bounds = []
+    last = 0.0
+    while last < len(seq):
+        bounds.append((int(last), int(last + avg)))
+        last += avg
+    if not bounds:
+        return []
+    cs = np.concatenate(([0], np.cumsum(seq, dtype=np.int64)))
+    lo, hi = np.minimum(np.array(bounds), len(seq)).T
+    return (cs[hi] - cs[np.minimum(lo, hi)]).tolist()
+
+
+def total_features(times, dirs, max_size=175):
+    '''All k-FP features of a trace given as (relative times, directions).'''
+    ALL_FEATURES = []
+
+    # ------TIME--------
+    intertimestats = interarrival_maxminmeansd_stats(times, dirs)
+    timestats = time_percentile_stats(times, dirs)
+    number_pkts = list(number_pkt_stats(dirs))
+    thirtypkts = first_and_last_30_pkts_stats(dirs)
+    stdconc, avgconc, medconc, minconc, maxconc, conc = pkt_concentration_stats(dirs)
+    avg_per_sec, std_per_sec, med_per_sec, min_per_sec, max_per_sec, per_sec = number_per_sec(times)
+    avg_order_in, avg_order_out, std_order_in, std_order_out = avg_pkt_ordering_stats(dirs)
+    perc_in, perc_out = perc_inc_out(dirs)
+
+    altconc = chunk_sums(conc, 70)
+    alt_per_sec = chunk_sums(per_sec, 20)
+    if len(altconc) == 70:
+        altconc.append(0)
+    if len(alt_per_sec) == 20:
+        alt_per_sec.append(0)
+
+    # TIME Features
+    ALL_FEATURES.extend(intertimestats)
+    ALL_FEATURES.extend(timestats)
+    ALL_FEATURES.extend(number_pkts)
+    ALL_FEATURES.extend(thirtypkts)
+    ALL_FEATURES.append(stdconc)
+    ALL_FEATURES.append(avgconc)
+    ALL_FEATURES.append(avg_per_sec)
+    ALL_FEATURES.append(std_per_sec)
+    ALL_FEATURES.append(avg_order_in)
+    ALL_FEATURES.append(avg_order_out)
+    ALL_FEATURES.append(std_order_in)
+    ALL_FEATURES.append(std_order_out)
+    ALL_FEATURES.append(medconc)
+    ALL_FEATURES.append(med_per_sec)
+    ALL_FEATURES.append(min_per_sec)
+    ALL_FEATURES.append(max_per_sec)
+    ALL_FEATURES.append(maxconc)
+    ALL_FEATURES.append(perc_in)
+    ALL_FEATURES.append(perc_out)
+    ALL_FEATURES.extend(altconc)
+    ALL_FEATURES.extend(alt_per_sec)
+    ALL_FEATURES.append(sum(altconc))
+    ALL_FEATURES.append(sum(alt_per_sec))
+    ALL_FEATURES.append(sum(intertimestats))
+    ALL_FEATURES.append(sum(timestats))
+    ALL_FEATURES.append(sum(number_pkts))
+
+    ALL_FEATURES.extend(conc)
+    ALL_FEATURES.extend(per_sec)
+
+    while len(ALL_FEATURES) < max_size:
+        ALL_FEATURES.append(0)
+    return ALL_FEATURES[:max_size]
+
+def TOTAL_FEATURES(trace_data, max_size=175):
+    '''Same interface as extract.TOTAL_FEATURES: raw trace lines in, feature list out.'''
+    times, dirs = parse_trace(trace_data)
+    return total_features(times, dirs, max_size)
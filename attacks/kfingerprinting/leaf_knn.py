@@ -0,0 +1,94 @@
+#Hamming distance k nearest neighbours over random forest leaves.
+#Distances are computed for a block of test rows against a tile of train rows at
+#a time, so the temporaries never exceed `mem_mb`, and only the K smallest of
+#each row are kept (argpartition, not a full argsort). Worker processes get the
+#train leaves once, when the pool starts, and then only receive test row ranges.
+#Leaves can be raw model.apply() matrices or leaf_signature.LeafSignatures.
+import multiprocessing as mp
+import numpy as np
+
+MEM_MB = 256
+
+_train = None
+_test = None
+_K = None
+_mem = None
+
+
+def block_sizes(n_train, row_bytes, mem_mb=MEM_MB):
+    '''(test rows per block, train rows per tile) that fit in mem_mb.'''
+    budget = max(1, int(mem_mb * 2**20))
+    # the int32 distance rows of a block take at most half of the budget
+    test_rows = max(1, min(1024, budget // 2 // (4 * max(1, n_train))))
+    # the (test rows, train rows, row_bytes) comparison takes the other half
+    train_rows = max(1, budget // 2 // (test_rows * max(1, row_bytes)))
+    return test_rows, min(train_rows, max(1, n_train))
+
+def topk(dists, K):
+    '''Indices of the K smallest distances of every row, closest first.
+    Ties are broken by the lower train index, i.e. as argsort(kind='stable')[:, :K].'''
+    n = dists.shape[1]
+    if K >= n:
+        return np.argsort(dists, axis=1, kind='stable')
+    kth = np.partition(dists, K - 1, axis=1)[:, K - 1:K]
+    out = np.empty((dists.shape[0], K), dtype=np.int64)
+    for i in range(dists.shape[0]):
+        cand = np.flatnonzero(dists[i] <= kth[i])
+        out[i] = cand[np.argsort(dists[i, cand], kind='stable')[:K]]
+    return out
+
+def _as_leaves(leaf):
+    return leaf if hasattr(leaf, 'pairwise') else np.ascontiguousarray(leaf)
+
+def _row_bytes(leaf):
+    return leaf.row_bytes if hasattr(leaf, 'pairwise') else leaf.shape[1]
+
+def _pairwise(block, tile, out):
+    if hasattr(block, 'pairwise'):
+        block.pairwise(tile, out)
+    else:
+        np.sum(block[:, None, :] != tile[None, :, :], axis=2, dtype=np.int32, out=out)
+
+def hamming_topk(train_leaf, test_leaf, K, mem_mb=MEM_MB):
+    '''Train indices of the K nearest train rows (Hamming distance) of every test row.'''
+    train_leaf = _as_leaves(train_leaf)
+    test_leaf = _as_leaves(test_leaf)
+    n_train = len(train_leaf)
+    test_rows, train_rows = block_sizes(n_train, _row_bytes(train_leaf), mem_mb)
+    out = np.empty((len(test_leaf), min(K, n_train)), dtype=np.int64)
+    dists = np.empty((test_rows, n_train), dtype=np.int32)
+    for a in range(0, len(test_leaf), test_rows):
+        block = test_leaf[a:a + test_rows]
+        d = dists[:len(block)]
+        for t in range(0, n_train, train_rows):
+            tile = train_leaf[t:t + train_rows]
+            _pairwise(block, tile, d[:, t:t + len(tile)])
+        out[a:a + len(block)] = topk(d, K)
+    return out
+
+
+def _init_worker(train_leaf, test_leaf, K, mem_mb):
+    global _train, _test, _K, _mem
+    _train, _test, _K, _mem = train_leaf, test_leaf, K, mem_mb
+
+def _work(span):
+    return hamming_topk(_train, _test[span[0]:span[1]], _K, _mem)
+
+def neighbor_indices(train_leaf, test_leaf, K, n_jobs=1, mem_mb=MEM_MB):
+    '''hamming_topk spread over n_jobs processes, each with mem_mb of temporaries.'''
+    train_leaf = _as_leaves(train_leaf)
+    test_leaf = _as_leaves(test_leaf)
+    if n_jobs <= 1 or len(test_leaf) < 2:
+        return hamming_topk(train_leaf, test_leaf, K, mem_mb)
+    step = max(1, -(-len(test_leaf) // (n_jobs * 4)))
+    spans = [(a, min(a + step, len(test_leaf))) for a in range(0, len(test_leaf), step)]
+    pool = mp.Pool(n_jobs, initializer=_init_worker, initargs=(train_leaf, test_leaf, K, mem_mb))
+    try:
+        return np.concatenate(pool.map(_work, spans))
+    finally:
+        pool.close()
+        pool.join()
+
+def neighbor_labels(train_leaf, test_leaf, y_train, K, n_jobs=1, mem_mb=MEM_MB):
+    '''Labels of the K nearest train rows of every test row, shape (n_test, K).'''
+    return np.asarray(y_train)[neighbor_indices(train_leaf, test_leaf, K, n_jobs, mem_mb)]
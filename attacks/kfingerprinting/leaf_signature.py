@@ -0,0 +1,144 @@
+#Compact leaf signatures for k-FP fingerprint matching.
+#model.apply() gives an int64 node id per tree, 8 KB per trace for 1000 trees.
+#Only equality of leaves matters for the Hamming distance, so every tree's leaves
+#are renumbered 0..n_leaves-1 and stored in the smallest unsigned dtype that
+#holds them (trees are grouped by dtype). Distances on this form are exact.
+#With `bits` set, each leaf is instead hashed to `bits` bits and the codes are
+#packed into bytes; two different leaves then collide with probability 2**-bits,
+#which can only make a distance smaller.
+import numpy as np
+
+DTYPES = [np.uint8, np.uint16, np.uint32]
+HASH_BITS = (1, 2, 4, 8)
+
+
+def _nonzero_groups_lut(bits):
+    '''Number of non-zero `bits`-wide groups in every byte value.'''
+    mask = (1 << bits) - 1
+    lut = np.zeros(256, dtype=np.uint8)
+    for v in range(256):
+        lut[v] = sum(1 for s in range(0, 8, bits) if (v >> s) & mask)
+    return lut
+
+def _hash(leaf, bits):
+    '''Deterministic `bits`-bit hash of (tree, leaf id), splitmix64 finalizer.'''
+    trees = np.arange(leaf.shape[1], dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        x = leaf.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + trees * np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(64 - bits)).astype(np.uint8)
+
+
+class LeafSignatures(object):
+    '''A block of encoded leaf rows. Exact mode keeps one matrix per dtype
+    group, hashed mode one packed uint8 matrix.'''
+
+    def __init__(self, parts, bits=None):
+        self.parts = parts
+        self.bits = bits
+
+    def __len__(self):
+        return len(self.parts[0])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("LeafSignatures only supports row slices")
+        return LeafSignatures([p[key] for p in self.parts], self.bits)
+
+    @property
+    def nbytes(self):
+        return sum(p.nbytes for p in self.parts)
+
+    @property
+    def row_bytes(self):
+        '''Bytes of the temporaries a pairwise comparison needs per (test, train) pair:
+        the bool mask per column in exact mode, the xor and its looked-up counts
+        (both uint8) per packed column in hashed mode.'''
+        cols = sum(p.shape[1] for p in self.parts)
+        return cols if self.bits is None else 2 * cols
+
+    def pairwise(self, other, out):
+        '''out[i, j] = distance between row i of self and row j of other.'''
+        out[...] = 0
+        if self.bits is None:
+            for a, b in zip(self.parts, other.parts):
+                out += np.sum(a[:, None, :] != b[None, :, :], axis=2, dtype=np.int32)
+        else:
+            lut = _nonzero_groups_lut(self.bits)
+            x = np.bitwise_xor(self.parts[0][:, None, :], other.parts[0][None, :, :])
+            out += lut[x].sum(axis=2, dtype=np.int32)
+        return out
+
+
+class LeafEncoder(object):
+    '''Maps raw leaf matrices (n, n_trees) of one forest to LeafSignatures.'''
+
+    def __init__(self, bits=None):
+        if bits is not None and bits not in HASH_BITS:
+            raise ValueError("bits must be one of {}".format(HASH_BITS))
+        self.bits = bits
+        self.codebooks = None
+
+    def fit_forest(self, model):
+        '''Codebooks from the tree structures: every leaf of every tree.'''
+        self.codebooks = [np.flatnonzero(est.tree_.children_left == -1) for est in model.estimators_]
+        return self._group()
+
+    def fit(self, leaf):
+        '''Codebooks from observed (training) leaves. Leaves never seen here are
+        all mapped to one extra code, which never equals a fitted leaf.'''
+        leaf = np.asarray(leaf)
+        self.codebooks = [np.unique(leaf[:, j]) for j in range(leaf.shape[1])]
+        return self._group()
+
+    def _group(self):
+        # +1 for the code of unseen leaves
+        sizes = np.array([len(c) + 1 for c in self.codebooks])
+        self.groups = []
+        lo = 0
+        for dtype in DTYPES:
+            cols = np.flatnonzero((sizes <= np.iinfo(dtype).max + 1) & (sizes > lo))
+            if len(cols):
+                self.groups.append((cols, dtype))
+            lo = np.iinfo(dtype).max + 1
+        return self
+
+    def transform(self, leaf):
+        leaf = np.asarray(leaf)
+        if self.bits is not None:
+            codes = _hash(leaf, self.bits)
+            per_byte = 8 // self.bits
+            pad = -leaf.shape[1] % per_byte
+            codes = np.pad(codes, ((0, 0), (0, pad))).reshape(len(leaf), -1, per_byte)
+            shifts = np.arange(per_byte, dtype=np.uint8) * np.uint8(self.bits)
+            packed = np.bitwise_or.reduce(codes << shifts, axis=2).astype(np.uint8)
+            return LeafSignatures([packed], self.bits)
+        if self.codebooks is None:
+            raise ValueError("LeafEncoder must be fitted first in exact mode")
+        parts = []
+        for cols, dtype in self.groups:
+            part = np.empty((len(leaf), len(cols)), dtype=dtype)
+            for k, j in enumerate(cols):
+                book = self.codebooks[j]
+                pos = np.searchsorted(book, leaf[:, j])
+                hit = pos < len(book)
+                hit[hit] = book[pos[hit]] == leaf[hit, j]
+                part[:, k] = np.where(hit, pos, len(book))
+            parts.append(part)
+        return LeafSignatures(parts)
+
+    def fit_transform(self, leaf):
+        if self.bits is None:
+            self.fit(leaf)
+        return self.transform(leaf)
+
+
+def apply_encoded(model, X, encoder, chunk=10000):
+    '''model.apply in chunks, encoding each chunk, so the int64 leaf matrix of
+    the whole X never exists at once.'''
+    blocks = [encoder.transform(model.apply(X[a:a + chunk])) for a in range(0, len(X), chunk)]
+    return LeafSignatures([np.concatenate(p) for p in zip(*[b.parts for b in blocks])], encoder.bits)
@@ -7,9 +7,15 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import StratifiedShuffleSplit
 import const
+import leaf_knn
+import leaf_signature
 import multiprocessing as mp
 import random
 import time
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import model_cache
 
 random.seed(1123)
 np.random.seed(1123)
@@ -81,10 +87,15 @@ def open_world_acc(neighbors, y_test,MON_SITE_NUM):
 
     return tp,wp,fp,p,n
     
-def kfingerprinting(X_train,X_test,y_train,y_test):
+RF_PARAMS = dict(n_jobs=-1, n_estimators=1000, oob_score=True)
+
+def kfingerprinting(X_train,X_test,y_train,y_test,bits=None,key=None):
     # logger.info('training...')
-    model = RandomForestClassifier(n_jobs=-1, n_estimators=1000, oob_score=True)
-    model.fit(X_train, y_train)
+    model = RandomForestClassifier(**RF_PARAMS)
+    if key is None:
+        model.fit(X_train, y_train)
+    else:
+        model = model_cache.default_cache().fit(key, lambda: model.fit(X_train, y_train))
 #    M = model.predict(X_test)
     # for i in range(0,len(M)):
     #     x = M[i]
@@ -92,26 +103,16 @@ def kfingerprinting(X_train,X_test,y_train,y_test):
     #     logger.info('%s: %s'%(str(label), str(x)))
     acc = model.score(X_test, y_test)
     #logger.info('Accuracy = %.4f'%acc)
-    train_leaf = model.apply(X_train)
-    test_leaf = model.apply(X_test)
+    # leaves are stored as compact signatures, see leaf_signature.py
+    encoder = leaf_signature.LeafEncoder(bits).fit_forest(model)
+    train_leaf = leaf_signature.apply_encoded(model, X_train, encoder)
+    test_leaf = leaf_signature.apply_encoded(model, X_test, encoder)
     # print(model.feature_importances_)
 #    joblib.dump(model, 'dirty-trained-kf.pkl')
     return train_leaf, test_leaf
 
-def get_neighbor(params):
-    train_leaf, test_leaf, y_train, K = params[0],params[1], params[2], params[3]
-    atile = np.tile(test_leaf, (train_leaf.shape[0],1))
-    dists = np.sum(atile != train_leaf, axis = 1)
-    k_neighbors = y_train[np.argsort(dists)[:K]]
-    return k_neighbors
-
 def parallel(train_leaf, test_leaf, y_train, K = 1, n_jobs = 10):
-    train_leaves = [train_leaf]*len(test_leaf)
-    y_train = [y_train]*len(test_leaf)
-    Ks = [K] * len(test_leaf)
-    pool = mp.Pool(n_jobs)
-    neighbors = pool.map(get_neighbor, zip(train_leaves, test_leaf, y_train,Ks))
-    return np.array(neighbors)
+    return leaf_knn.neighbor_labels(train_leaf, test_leaf, y_train, K, n_jobs = n_jobs)
 
 if __name__ == '__main__':
     global MON_SITE_NUM
@@ -122,6 +123,11 @@ if __name__ == '__main__':
     parser.add_argument('feature_path',
                         metavar='<feature path>',
                         help='Path to the directory of the extracted features')
+    parser.add_argument('-bits',
+                        type=int,
+                        default=None,
+                        choices=leaf_signature.HASH_BITS,
+                        help='Hash every leaf to this many bits (approximate). Default: exact leaf ids.')
     args = parser.parse_args()
     
     '''read config file'''
@@ -164,7 +170,8 @@ if __name__ == '__main__':
         X_train, X_test = X[train_index], X[test_index]
         y_train, y_test = y[train_index], y[test_index]
         Y_train, Y_test = Y[train_index], Y[test_index]  
-        train_leaf, test_leaf = kfingerprinting(X_train,X_test,y_train, y_test)
+        key = model_cache.cache_key('kfp', args.feature_path, train_index, dict(RF_PARAMS, open_world = OPEN_WORLD, mon_site_num = MON_SITE_NUM))
+        train_leaf, test_leaf = kfingerprinting(X_train,X_test,y_train, y_test, args.bits, key)
         neighbors  = parallel(train_leaf, test_leaf, y_train, 3)
         if OPEN_WORLD:
             tp,wp,fp,p,n = open_world_acc(neighbors,y_test,MON_SITE_NUM)
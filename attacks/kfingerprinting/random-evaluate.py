@@ -10,9 +10,10 @@ import const as ct
 import logging
 import glob
 import multiprocessing as mp
-from extract import TOTAL_FEATURES
+from kfp_features import TOTAL_FEATURES
+import leaf_knn
 logger = logging.getLogger('kf')
-global trainleaves
+global trainleaf, trainlabel
 global model
 import  os
 
@@ -96,20 +97,16 @@ def read_conf(file):
 #         return 100
 
 
-def get_single_neighbor(testleaf):
-    global trainleaves, MON_SITE_NUM
+def get_neighbors(testleaves):
+    global trainleaf, trainlabel, MON_SITE_NUM
     K = 3
-    # print(trainleaves[:2])
-    trainleaf, trainlabel = list(zip(*trainleaves))[0], list(zip(*trainleaves))[1]
-    trainleaf = np.array(trainleaf)
-    trainlabel = np.array(trainlabel)
-    atile = np.tile(testleaf, (trainleaf.shape[0],1))
-    dists = np.sum(atile != trainleaf, axis = 1)
-    k_neighbors = trainlabel[np.argsort(dists)[:K]]
-    if len(set(k_neighbors)) == 1:
-        return k_neighbors[0]
-    else:
-        return MON_SITE_NUM
+    preds = []
+    for k_neighbors in leaf_knn.neighbor_labels(trainleaf, testleaves, trainlabel, K):
+        if len(set(k_neighbors)) == 1:
+            preds.append(k_neighbors[0])
+        else:
+            preds.append(MON_SITE_NUM)
+    return preds
 
 def extractfeature(f):
     global MON_SITE_NUM
@@ -137,7 +134,7 @@ def pred_sing_trace(fdir):
     y_pred = []
     [X_test.append(extractfeature(f)[0]) for f in y_dirs]
     testleaves= model.apply(X_test)
-    [y_pred.append(get_single_neighbor(testleaf)) for testleaf in testleaves]
+    y_pred = get_neighbors(testleaves)
 
 
     outputdir = os.path.join(ct.randomdir, fdir.split('/')[-3], fdir.split('/')[-2])
@@ -151,7 +148,7 @@ def parallel(fdirs,n_jobs = 20):
     pool.map(pred_sing_trace, fdirs)    
 
 if __name__ == '__main__':   
-    global trainleaves, model, MON_SITE_NUM
+    global trainleaf, trainlabel, model, MON_SITE_NUM
     init_logger()
     args = parse_arguments()
     logger.info("Arguments: %s" % (args))
@@ -160,7 +157,8 @@ if __name__ == '__main__':
     logger.info('loading model...')
     model =  joblib.load(args.m)
     train_leaf = np.load(args.o, allow_pickle = True).item()
-    trainleaves = list(train_leaf)
+    trainleaf, trainlabel = zip(*train_leaf)
+    trainleaf, trainlabel = np.array(trainleaf), np.array(trainlabel)
 
 
     testfolder = args.p
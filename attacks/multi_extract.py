@@ -0,0 +1,327 @@
+##Extract features for several attacks in one pass over a dataset
+#Each trace is loaded once and every requested feature family is computed from it.
+#Outputs are written where the single-attack extractors write theirs, e.g.
+#   python3 multi_extract.py ../data/front/ -families kfp cumul df
+import argparse
+import configparser
+import importlib.util
+import logging
+import multiprocessing as mp
+import os
+import sys
+from os.path import join, abspath, dirname
+
+import numpy as np
+
+BASE_DIR = abspath(dirname(__file__))
+sys.path.append(join(dirname(BASE_DIR), 'utils'))
+import trace_store
+
+logger = logging.getLogger('multi-extract')
+LOG_FORMAT = "%(asctime)s %(name)-12s %(levelname)-8s %(message)s"
+confdir = join(BASE_DIR, 'conf.ini')
+
+DF_LENGTH = 10000
+FAMILIES = ['kfp', 'cumul', 'df', 'knn', 'decision']
+
+
+def load_attack_module(folder, fname, alias):
+    '''Import an attack's extractor by path. Attack folders each ship their own
+    const/constants module, so those are dropped from the cache afterwards.'''
+    folder = join(BASE_DIR, folder)
+    sys.path.insert(0, folder)
+    try:
+        spec = importlib.util.spec_from_file_location(alias, join(folder, fname))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(folder)
+        for name in ('const', 'constants'):
+            sys.modules.pop(name, None)
+    return module
+
+kfp = load_attack_module('kfingerprinting', 'extract.py', 'kfp_extract')
+cumul = load_attack_module('cumul', 'extract.py', 'cumul_extract')
+decision = load_attack_module('decision', 'extract.py', 'decision_extract')
+
+
+def config_logger(args):
+    # Set file
+    log_file = sys.stdout
+    if args.log != 'stdout':
+        log_file = open(args.log, 'w')
+    ch = logging.StreamHandler(log_file)
+
+    # Set logging format
+    ch.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(ch)
+
+    # Set level format
+    logger.setLevel(logging.INFO)
+
+def read_conf(file):
+    cf = configparser.ConfigParser()
+    cf.read(file)
+    return dict(cf['default'])
+
+def parse_arguments():
+
+    parser = argparse.ArgumentParser(description='Extract features of several WF attacks in one pass.')
+
+    parser.add_argument('traces_path',
+                        metavar='<traces path>',
+                        help='Path to the directory with the traffic traces.')
+    parser.add_argument('-families',
+                        nargs='+',
+                        choices=FAMILIES,
+                        default=['kfp', 'cumul', 'df'],
+                        help='Feature families to extract.')
+    parser.add_argument('-format',
+                        metavar='<file suffix>',
+                        default=None,
+                        help='suffix of the trace files (default: .merge for decision, .cell otherwise).')
+    parser.add_argument('-num',
+                        type=int,
+                        default=None,
+                        metavar='<num of the traces in a l-trace>',
+                        help='decision only: label of every trace, num.npy of the folder is used otherwise.')
+    parser.add_argument('-j',
+                        type=int,
+                        dest='n_jobs',
+                        default=20,
+                        help='Number of worker processes.')
+    parser.add_argument('--log',
+                        type=str,
+                        dest="log",
+                        metavar='<log path>',
+                        default='stdout',
+                        help='path to the log file. It will print to stdout by default.')
+
+    args = parser.parse_args()
+    if 'decision' in args.families and len(args.families) > 1:
+        #decision reads merged *.merge traces, the other families single traces
+        parser.error('decision must be extracted on its own')
+    if args.format is None:
+        args.format = '.merge' if args.families == ['decision'] else '.cell'
+    config_logger(args)
+    return args
+
+
+############### FEATURE FAMILIES #####################
+#Each family takes the (times, lengths) arrays of one trace and returns its
+#feature vector, or None when the single-attack extractor would drop the trace.
+
+def kfp_feature(times, lengths):
+    if len(times) < 50:
+        return None
+    try:
+        return kfp.kfp_features.total_features(*kfp.kfp_features.from_arrays(times, lengths))
+    except Exception:
+        return None
+
+def cumul_feature(times, lengths):
+    try:
+        return cumul.extract((-lengths).tolist())
+    except Exception:
+        return None
+
+def df_feature(times, lengths):
+    if len(lengths) < 50:
+        return None
+    # post padding / truncating with 0, as pad_sequences does in df/makedata.py
+    feature = np.zeros(DF_LENGTH, dtype=int)
+    n = min(len(lengths), DF_LENGTH)
+    feature[:n] = lengths[:n]
+    return feature
+
+def decision_feature(times, lengths):
+    return decision.extract(np.asarray(times, dtype=float), np.sign(lengths).astype('int'))
+
+def knn_feature(times, lengths):
+    '''Python 3 port of extract() in knn/fextractor.py, "X" already mapped to -1.'''
+    times = times.tolist()
+    sizes = lengths.tolist()
+    features = []
+
+    #Transmission size features
+    features.append(len(sizes))
+    count = sum(1 for x in sizes if x > 0)
+    features.append(count)
+    features.append(len(times)-count)
+    features.append(times[-1] - times[0])
+
+    #Transpositions (similar to good distance scheme)
+    count = 0
+    for i in range(0, len(sizes)):
+        if sizes[i] > 0:
+            count += 1
+            features.append(i)
+        if count == 500:
+            break
+    features.extend(["X"] * (500 - count))
+
+    count = 0
+    prevloc = 0
+    for i in range(0, len(sizes)):
+        if sizes[i] > 0:
+            count += 1
+            features.append(i - prevloc)
+            prevloc = i
+        if count == 500:
+            break
+    features.extend(["X"] * (500 - count))
+
+    #Packet distributions (where are the outgoing packets concentrated)
+    count = 0
+    for i in range(0, min(len(sizes), 3000)):
+        if i % 30 != 29:
+            if sizes[i] > 0:
+                count += 1
+        else:
+            features.append(count)
+            count = 0
+    for i in range(len(sizes)//30, 100):
+        features.append(0)
+
+    #Bursts
+    bursts = []
+    curburst = 0
+    consnegs = 0
+    for x in sizes:
+        if x < 0:
+            consnegs += 1
+            if (consnegs == 2):
+                bursts.append(curburst)
+                curburst = 0
+                consnegs = 0
+        if x > 0:
+            consnegs = 0
+            curburst += x
+    if curburst > 0:
+        bursts.append(curburst)
+    if (len(bursts) > 0):
+        features.append(max(bursts))
+        features.append(float(np.mean(bursts)))
+        features.append(len(bursts))
+    else:
+        features.extend(["X"] * 3)
+    for limit in [2, 5, 10, 15, 20, 50]:
+        features.append(sum(1 for x in bursts if x > limit))
+    for i in range(0, 100):
+        features.append(bursts[i] if i < len(bursts) else "X")
+
+    for i in range(0, 10):
+        features.append(sizes[i] + 1500 if i < len(sizes) else "X")
+
+    itimes = [times[i] - times[i-1] for i in range(1, len(sizes))]
+    if len(itimes) > 0:
+        features.append(float(np.mean(itimes)))
+        features.append(float(np.std(itimes)))
+    else:
+        features.extend(["X"] * 2)
+    return [-1 if x == "X" else x for x in features]
+
+EXTRACTORS = {
+    'kfp': kfp_feature,
+    'cumul': cumul_feature,
+    'df': df_feature,
+    'knn': knn_feature,
+    'decision': decision_feature,
+}
+
+
+def init_worker(fams):
+    global families
+    families = fams
+
+def work(f):
+    global families
+    times, lengths = trace_store.load(f)
+    res = {}
+    for family in families:
+        try:
+            res[family] = EXTRACTORS[family](times, lengths) if len(times) else None
+        except Exception as e:
+            logger.warning("%s failed on %s: %s", family, f, e)
+            res[family] = None
+    return res
+
+def parallel(flist, fams, n_jobs = 20):
+    pool = mp.Pool(n_jobs, initializer=init_worker, initargs=(fams,))
+    try:
+        return pool.map(work, flist, chunksize=max(1, len(flist) // (n_jobs * 8)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def list_traces(traces_path, suffix):
+    '''Monitored "X-Y" traces first (by site, instance), then open-world "Z" traces.'''
+    flist = [join(traces_path, f) for f in os.listdir(traces_path) if f.endswith(suffix)]
+    def order(f):
+        site, inst = trace_store.name_to_label(os.path.basename(f))
+        return (site < 0, site, inst)
+    flist.sort(key=order)
+    return flist
+
+
+def save_family(family, flist, feats, args, cf):
+    MON_SITE_NUM = int(cf['monitored_site_num'])
+    data_name = args.traces_path.rstrip('/').split('/')[-1]
+    idx = [i for i, x in enumerate(feats) if x is not None]
+    kept = [(flist[i], feats[i]) for i in idx]
+    logger.info("%s: %d/%d traces kept", family, len(kept), len(flist))
+    if not kept:
+        return
+    names = [os.path.basename(f) for f, _ in kept]
+    labels = [trace_store.name_to_label(n) for n in names]
+
+    if family == 'knn':
+        #flearner reads one .cellkNN file per trace
+        path = join(BASE_DIR, 'knn/output', data_name)
+        os.makedirs(path, exist_ok=True)
+        for name, (_, x) in zip(names, kept):
+            with open(join(path, name.split('.')[0] + '.cellkNN'), 'w') as fout:
+                fout.write("\n".join(repr(v) for v in x))
+        logger.info('Save to %s'%path)
+        return
+
+    data_dict = {'feature':[],'label':[]}
+    data_dict['feature'] = [x for _, x in kept]
+    if family == 'kfp':
+        data_dict['label'] = [(s, i) if s >= 0 else (MON_SITE_NUM, i) for s, i in labels]
+        outputdir = join(BASE_DIR, 'kfingerprinting/results', data_name)
+    elif family == 'cumul':
+        data_dict['label'] = [s if s >= 0 else MON_SITE_NUM for s, _ in labels]
+        outputdir = join(BASE_DIR, 'cumul/results', data_name)
+    elif family == 'df':
+        num_class = MON_SITE_NUM + (1 if cf['open_world'] == '1' else 0)
+        label = [s if s >= 0 else MON_SITE_NUM for s, _ in labels]
+        data_dict['feature'] = np.array(data_dict['feature'])
+        data_dict['label'] = np.eye(num_class, dtype='float32')[label]
+        outputdir = join(BASE_DIR, 'df/results', data_name)
+    elif family == 'decision':
+        if args.num is None:
+            #num.npy has one entry per merged trace, in file order: keep those of the kept traces
+            num = np.load(join(args.traces_path, 'num.npy'), allow_pickle = True)
+            if len(num) != len(flist):
+                raise ValueError("num.npy has %d entries for %d traces" % (len(num), len(flist)))
+            data_dict['label'] = num[idx] - 2
+        else:
+            data_dict['label'] = np.ones(len(data_dict['feature'])) * (args.num - 2)
+        outputdir = join(BASE_DIR, 'decision/features', data_name)
+    os.makedirs(dirname(outputdir), exist_ok=True)
+    np.save(outputdir, data_dict)
+    logger.info('Save to %s.npy'%outputdir)
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    logger.info("Arguments: %s" % (args))
+    cf = read_conf(confdir)
+
+    flist = list_traces(args.traces_path, args.format)
+    logger.info("Found %d traces", len(flist))
+    res = parallel(flist, args.families, n_jobs = args.n_jobs)
+    for family in args.families:
+        save_family(family, flist, [r[family] for r in res], args, cf)
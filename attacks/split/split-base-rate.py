@@ -9,6 +9,8 @@ import constants as ct
 import pandas as pd
 import multiprocessing as mp
 import time
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import trace_store
 
 logger = logging.getLogger('Split')
 def parse_arguments():
@@ -73,11 +75,8 @@ def readfilename(fname):
     return np.array(filelist)
 
 def readtrace(fname):
-    with open(fname, 'r') as f:
-        tmp = f.readlines()
-        trace = pd.Series(tmp).str.slice(0,-1).str.split('\t',expand = True).astype(float)
-        trace.columns = ['timestamp','direction']
-        trace.iloc[:,1] /= abs(trace.iloc[:,1])
+    times, lengths = trace_store.load(fname)
+    trace = pd.DataFrame({'timestamp': times, 'direction': np.sign(lengths).astype(float)})
     return trace 
 
 
@@ -18,6 +18,8 @@ from os import makedirs
 import constants as ct
 from xgboost import XGBClassifier
 import joblib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import model_cache
 
 
 
@@ -81,7 +83,7 @@ if __name__ == '__main__':
         t = time.time()
         
         model = XGBClassifier()
-        model.fit(X,y)
+        model = model_cache.cached_fit('xgboost', args.t, lambda: model.fit(X,y), params = model.get_params())
         logger.debug("trainin time is {:.4f} s".format((time.time()-t)))
         logger.debug(model)
         model_path = os.path.join( ct.modeldir, args.t.split('/')[-1].split('.')[0]) +'.pkl'
@@ -10,17 +10,19 @@ import random
 NUM_RUNS = 20
 CONFIGS = ['default', 't1'] # default=Low Overhead, t1=High Overhead
 
-def run_strategy(strategy, input_dir, base_dir, log_file, seed, config):
+def run_strategy(strategy, input_dir, base_dir, log_file, seeds, config):
+    """One FRONT run whose transport simulation is repeated for every seed; returns the stats of each run."""
     cmd = [
         "python3", "defenses/front/main.py",
         input_dir,
         "-format", ".cell",
         "--fec-strategy", strategy,
-        "--loss-rate", "0.05",
+        "--loss-rates", "0.05",
         "--rtt", "0.1",
         "--max-inflight", "5", # Fix congestion to High for this test
         "--config", config,
-        "--seed", str(seed),
+        "--seed", str(seeds[0]),
+        "--sim-seeds"] + [str(seed) for seed in seeds] + [
         "--log", log_file
     ]
     try:
@@ -28,34 +30,36 @@ def run_strategy(strategy, input_dir, base_dir, log_file, seed, config):
         return parse_stats(output)
     except subprocess.CalledProcessError as e:
         print(f"Strategy {strategy} failed: {e.output.decode()}")
-        return None
+        return []
 
 def parse_stats(output):
-    stats = {
-        'total_real': 0,
-        'total_fec': 0,
-        'total_dummy': 0,
-        'lost_real': 0,
-        'recovered_real': 0,
-        'retransmitted_real': 0,
-        'fct': 0.0,
-        'avg_latency': 0.0
-    }
+    """Stats per seed of a --loss-rates sweep, summed over the traces of each seed."""
+    runs = {}
     
-    pattern = r"\[TransportSimulator\] Stats: Total Real=(\d+), FEC=(\d+), Dummy=(\d+), Lost=(\d+), Recovered=(\d+), Retransmitted=(\d+), FCT=([\d\.]+), AvgLatency=([\d\.]+)"
+    pattern = r"\[TransportSimulator\] Stats\(Loss=[\d\.]+, Seed=([-\w]+)\): Total Real=(\d+), FEC=(\d+), Dummy=(\d+), Lost=(\d+), Recovered=(\d+), Retransmitted=(\d+), FCT=([\d\.]+), AvgLatency=([\d\.]+)"
     matches = re.findall(pattern, output)
     
     for match in matches:
-        stats['total_real'] += int(match[0])
-        stats['total_fec'] += int(match[1])
-        stats['total_dummy'] += int(match[2])
-        stats['lost_real'] += int(match[3])
-        stats['recovered_real'] += int(match[4])
-        stats['retransmitted_real'] += int(match[5])
-        stats['fct'] = float(match[6])
-        stats['avg_latency'] = float(match[7])
+        stats = runs.setdefault(match[0], {
+            'total_real': 0,
+            'total_fec': 0,
+            'total_dummy': 0,
+            'lost_real': 0,
+            'recovered_real': 0,
+            'retransmitted_real': 0,
+            'fct': 0.0,
+            'avg_latency': 0.0
+        })
+        stats['total_real'] += int(match[1])
+        stats['total_fec'] += int(match[2])
+        stats['total_dummy'] += int(match[3])
+        stats['lost_real'] += int(match[4])
+        stats['recovered_real'] += int(match[5])
+        stats['retransmitted_real'] += int(match[6])
+        stats['fct'] = float(match[7])
+        stats['avg_latency'] = float(match[8])
         
-    return stats
+    return list(runs.values())
 
 def run_comparison():
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -75,16 +79,14 @@ def run_comparison():
     with tempfile.TemporaryDirectory() as temp_input_dir:
         shutil.copy(test_trace_path, temp_input_dir)
         
-        for i in range(NUM_RUNS):
-            print(f"Run {i+1}/{NUM_RUNS}...", end='\r', flush=True)
-            # Generate a random seed for this run
-            run_seed = random.randint(0, 1000000)
-            
-            for cfg in CONFIGS:
-                for s in strategies:
-                    res = run_strategy(s, temp_input_dir, base_dir, f"front_{s.lower()}_{cfg}.log", run_seed, cfg)
-                    if res:
-                        all_results[cfg][s].append(res)
+        # Random seeds of the runs; FRONT pads the trace once per strategy and
+        # the transport simulation is repeated for every seed in that process
+        run_seeds = random.sample(range(1000001), NUM_RUNS)
+        
+        for cfg in CONFIGS:
+            for s in strategies:
+                print(f"Config {cfg}, strategy {s}...", end='\r', flush=True)
+                all_results[cfg][s].extend(run_strategy(s, temp_input_dir, base_dir, f"front_{s.lower()}_{cfg}.log", run_seeds, cfg))
         print("\nRuns completed.")
 
     # Process and Print Results for each Config
@@ -27,15 +27,16 @@ STRATEGIES = ['A', 'B', 'C', 'D', 'O10', 'O30', 'O50']
 MAX_INFLIGHT_VALUES = [5, 20]
 LOSS_RATES = [0.02, 0.05, 0.10, 0.20]
 
-# Regex for parsing stats
+# Regex for parsing stats: one tagged line per (loss rate, seed) of a --loss-rates sweep
 STATS_PATTERN = re.compile(
-    r"\[TransportSimulator\] Stats: Total Real=(\d+), FEC=(\d+), Dummy=(\d+), Lost=(\d+), Recovered=(\d+), Retransmitted=(\d+), FCT=([\d\.]+), AvgLatency=([\d\.]+)"
+    r"\[TransportSimulator\] Stats\(Loss=([\d\.]+), Seed=([-\w]+)\): Total Real=(\d+), FEC=(\d+), Dummy=(\d+), Lost=(\d+), Recovered=(\d+), Retransmitted=(\d+), FCT=([\d\.]+), AvgLatency=([\d\.]+)"
 )
 
 def run_simulation(params):
-    defense, strategy, inflight, loss_rate, trace_file, seed = params
+    """Runs the defense once for all loss rates and returns one result dict per loss rate."""
+    defense, strategy, inflight, loss_rates, trace_file, seed = params
     
-    log_file = os.path.join(LOG_DIR, f"{defense['name']}_{strategy}_inf{inflight}_loss{loss_rate}_{os.path.basename(trace_file)}.log")
+    log_file = os.path.join(LOG_DIR, f"{defense['name']}_{strategy}_inf{inflight}_{os.path.basename(trace_file)}.log")
     
     fec_strategy = strategy
     external_fec_rate = 0.0
@@ -47,140 +48,87 @@ def run_simulation(params):
             external_fec_rate = rate_percent / 100.0
         except ValueError:
             print(f"Invalid strategy format: {strategy}")
-            return None
+            return []
 
+    # The defense runs once per trace; the transport simulator sweeps every loss
+    # rate over the same defended trace and prints a tagged stats line for each.
     cmd = [
         "python3", defense['cmd'],
         trace_file, # Always pass the full path (DATA_DIR)
         "--fec-strategy", fec_strategy,
         "--external-fec-rate", str(external_fec_rate),
         "--max-inflight", str(inflight),
-        "--loss-rate", str(loss_rate),
+        "--loss-rates"] + [str(l) for l in loss_rates] + [
         "--seed", str(seed),
         "--log", log_file
     ] + defense['args']
     
-    # Special handling for Glue which iterates directory internally or takes specific args
-    # For simplicity, we assume Glue runs on the dir passed.
-    # But wait, Glue script takes 'traces_path' and runs on all files in it or random selection.
-    # To make it comparable, we might need to restrict Glue to specific files or just let it run its batch.
-    # Given the user said "All Cell Traffic", running on the directory is fine.
-    # However, other scripts like FRONT/WTF-PAD/Tamaraw also take a directory and iterate.
-    # So we should pass the directory to all of them, and they will process all files.
-    
-    # Adjust command for directory processing
-    # if 'glue' not in defense['name']:
-    #      cmd[2] = DATA_DIR # Point to data dir instead of single file
-    
     try:
         # Run command
         # We use a timeout to prevent hangs
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-        
-        # Parse output
-        # Since they process multiple files, we'll get multiple stats lines.
-        # We need to aggregate them.
-        
-        total_real = 0
-        total_fec = 0
-        total_dummy = 0
-        total_lost = 0
-        total_recovered = 0
-        total_retransmitted = 0
-        total_fct = 0.0
-        total_latency = 0.0
-        count = 0
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600 * len(loss_rates))
         
         # Parse output from stdout (TransportSimulator prints to stdout)
-        content = result.stdout
-        matches = STATS_PATTERN.findall(content)
+        matches = STATS_PATTERN.findall(result.stdout)
         
-        # Also check stderr just in case
+        # Also check stderr and the main log file just in case
         if not matches:
              matches = STATS_PATTERN.findall(result.stderr)
-             
-        # If still no matches, check log file for "Traces are dumped to" and read debug logs
         if not matches and os.path.exists(log_file):
             with open(log_file, 'r') as f:
-                log_content = f.read()
-                
-            # Try to find output directory
-            out_dir_match = re.search(r"Traces are dumped to (.+)", log_content)
-            if out_dir_match:
-                out_dir = out_dir_match.group(1).strip()
-                if os.path.exists(out_dir):
-                    print(f"  -> Found output dir: {out_dir}")
-                    # Read all .debug.log files
-                    import glob
-                    debug_logs = glob.glob(os.path.join(out_dir, "*.debug.log"))
-                    for dlog in debug_logs:
-                        with open(dlog, 'r') as df:
-                            dcontent = df.read()
-                            dmatches = STATS_PATTERN.findall(dcontent)
-                            matches.extend(dmatches)
-            
-            # Also check the main log file itself for stats (some defenses might log there)
-            matches.extend(STATS_PATTERN.findall(log_content))
+                matches = STATS_PATTERN.findall(f.read())
 
+        # Aggregate per loss rate, as the defenses process multiple files
+        totals = {}
         for match in matches:
-            total_real += int(match[0])
-            total_fec += int(match[1])
-            total_dummy += int(match[2])
-            total_lost += int(match[3])
-            total_recovered += int(match[4])
-            total_retransmitted += int(match[5])
-            total_fct += float(match[6])
-            total_latency += float(match[7])
-            count += 1
+            t = totals.setdefault(float(match[0]), {
+                'real': 0, 'fec': 0, 'dummy': 0, 'lost': 0, 'recovered': 0,
+                'retransmitted': 0, 'fct': 0.0, 'latency': 0.0, 'count': 0})
+            t['real'] += int(match[2])
+            t['fec'] += int(match[3])
+            t['dummy'] += int(match[4])
+            t['lost'] += int(match[5])
+            t['recovered'] += int(match[6])
+            t['retransmitted'] += int(match[7])
+            t['fct'] += float(match[8])
+            t['latency'] += float(match[9])
+            t['count'] += 1
         
-        if count == 0:
+        if not totals:
             # Debug: print stdout/stderr snippet
             print(f"  -> No stats found. Stdout snippet: {result.stdout[:200]}...")
             print(f"  -> Stderr snippet: {result.stderr[:200]}...")
             if os.path.exists(log_file):
                  print(f"  -> Log file exists: {log_file}")
-            return None
-            
-        # Cleanup debug logs to save space
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            out_dir_match = re.search(r"Traces are dumped to (.+)", log_content)
-            if out_dir_match:
-                out_dir = out_dir_match.group(1).strip()
-                if os.path.exists(out_dir):
-                    # print(f"  -> Cleaning up debug logs in {out_dir}")
-                    import glob
-                    debug_logs = glob.glob(os.path.join(out_dir, "*.debug.log"))
-                    for dlog in debug_logs:
-                        try:
-                            os.remove(dlog)
-                        except OSError:
-                            pass
-                    # Optional: remove the directory if empty or if we want to save even more space
-                    # But we might want to keep the traces for manual inspection if needed.
-                    # Given the user's request "accumulate too many logs", deleting debug logs is sufficient.
+            return []
 
-        return {
-            'Defense': defense['name'],
-            'Strategy': strategy,
-            'MaxInflight': inflight,
-            'LossRate': loss_rate,
-            'AvgRecovered': total_recovered / count,
-            'AvgRetransmitted': total_retransmitted / count,
-            'AvgFCT': total_fct / count,
-            'AvgLatency': total_latency / count,
-            'TotalFEC': total_fec,
-            'TotalDummy': total_dummy,
-            'Count': count
-        }
+        results = []
+        for loss_rate in loss_rates:
+            t = totals.get(float(loss_rate))
+            if t is None:
+                print(f"  -> No stats for Loss={loss_rate}")
+                continue
+            results.append({
+                'Defense': defense['name'],
+                'Strategy': strategy,
+                'MaxInflight': inflight,
+                'LossRate': loss_rate,
+                'AvgRecovered': t['recovered'] / t['count'],
+                'AvgRetransmitted': t['retransmitted'] / t['count'],
+                'AvgFCT': t['fct'] / t['count'],
+                'AvgLatency': t['latency'] / t['count'],
+                'TotalFEC': t['fec'],
+                'TotalDummy': t['dummy'],
+                'Count': t['count']
+            })
+        return results
 
     except subprocess.TimeoutExpired:
-        print(f"Timeout: {defense['name']} {strategy} {inflight} {loss_rate}")
-        return None
+        print(f"Timeout: {defense['name']} {strategy} {inflight}")
+        return []
     except Exception as e:
         print(f"Error: {e}")
-        return None
+        return []
 
 def prepare_sample_data(source_dir, target_dir, sample_size=100):
     """
@@ -252,16 +200,15 @@ def main():
     tasks = []
     seed = 12345 # Fixed seed for reproducibility across runs
     
-    # We run on the whole directory, so trace_file argument is just a placeholder or the dir itself
-    # But wait, if we run on the whole directory, we only need ONE task per configuration.
+    # We run on the whole directory, so we only need ONE task per configuration,
+    # and all loss rates of a configuration share one run of the defense.
     
     print("Generating tasks for 6 defenses, 4 strategies, 2 inflight values, 4 loss rates...")
     
     for defense in DEFENSES:
         for strategy in STRATEGIES:
             for inflight in MAX_INFLIGHT_VALUES:
-                for loss_rate in LOSS_RATES:
-                    tasks.append((defense, strategy, inflight, loss_rate, DATA_DIR, seed))
+                tasks.append((defense, strategy, inflight, LOSS_RATES, DATA_DIR, seed))
     
     print(f"Total tasks: {len(tasks)}")
     
@@ -287,24 +234,24 @@ def main():
             defense_name = task[0]['name']
             strategy = task[1]
             inflight = task[2]
-            loss_rate = task[3]
             
-            print(f"Processing {i+1}/{total}: {defense_name} | {strategy} | Inf={inflight} | Loss={loss_rate}")
+            print(f"Processing {i+1}/{total}: {defense_name} | {strategy} | Inf={inflight} | Loss={LOSS_RATES}")
             
-            # Check if result already exists
-            key = (defense_name, strategy, inflight, loss_rate)
-            if key in existing_results:
+            # Check if results already exist
+            keys = [(defense_name, strategy, inflight, loss_rate) for loss_rate in LOSS_RATES]
+            if all(key in existing_results for key in keys):
                 print("  -> Skipping... found existing results")
-                writer.writerow(existing_results[key])
+                for key in keys:
+                    writer.writerow(existing_results[key])
+                    results.append(existing_results[key])
                 csvfile.flush()
-                results.append(existing_results[key])
                 continue
 
             res = run_simulation(task)
             if res:
-                writer.writerow(res)
+                writer.writerows(res)
                 csvfile.flush() # Ensure data is written
-                results.append(res)
+                results.extend(res)
             else:
                 print("  -> Failed or No Data")
 
@@ -2,7 +2,6 @@ import numpy as np
 import argparse
 import logging
 import sys
-import pandas as pd
 import os
 from os.path import join
 from os import makedirs
@@ -12,14 +11,18 @@ from time import strftime
 import multiprocessing as mp
 import configparser
 import time
-import datetime
 from pprint import pprint
 import json
+from typing import List, NamedTuple, Optional
+from functools import partial
 
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
 from fec_injector import FECInjector
 from transport_simulator import TransportSimulator
+import trace_store
+import pipeline
+import seeding
 
 logger = logging.getLogger('ranpad2')
 def init_directories():
@@ -110,7 +113,7 @@ def parse_arguments():
                         dest="seed",
                         metavar='<seed>',
                         default=None,
-                        help='Random seed for deterministic simulation')
+                        help='Master seed: every trace gets its own streams spawned from it by trace index (default: fresh, logged)')
 
     parser.add_argument('--external-fec-rate',
                         type=float,
@@ -119,6 +122,48 @@ def parse_arguments():
                         default=0.0,
                         help='External FEC rate (0.0 - 1.0)')
 
+    parser.add_argument('--loss-rates',
+                        type=float,
+                        nargs='+',
+                        dest="loss_rates",
+                        metavar='<loss_rate>',
+                        default=None,
+                        help='Sweep these loss rates in one pass: a tagged stats line per loss rate and seed, no traces are dumped')
+
+    parser.add_argument('--sim-seeds',
+                        type=int,
+                        nargs='+',
+                        dest="sim_seeds",
+                        metavar='<seed>',
+                        default=None,
+                        help='Transport seeds of the --loss-rates sweep (default: the transport stream of each trace)')
+
+    parser.add_argument('--features',
+                        type=str,
+                        dest="features",
+                        metavar='<npy path>',
+                        default=None,
+                        help='Extract k-FP features of the defended traces in-process and save them here (as kfingerprinting/extract.py does)')
+
+    parser.add_argument('--no-dump',
+                        action='store_true',
+                        dest="no_dump",
+                        help='Do not write the defended traces to the results directory')
+
+    parser.add_argument('--batch',
+                        type=int,
+                        dest="batch",
+                        metavar='<n>',
+                        default=0,
+                        help='Draw the padding of n traces at a time from one random stream per batch (statistically, not bitwise, equal to the per-trace mode)')
+
+    parser.add_argument('--jobs',
+                        type=int,
+                        dest="jobs",
+                        metavar='<n>',
+                        default=None,
+                        help='Number of worker processes (default: the available CPUs)')
+
     args = parser.parse_args()
     # config = dict(conf_parser._sections[args.section])
     config = dict(conf_parser[args.section])
@@ -126,13 +171,20 @@ def parse_arguments():
     return args,config
 
 def load_trace(fdir):
-    with open(fdir,'r') as f:
-        tmp = f.readlines()
-    t = pd.Series(tmp).str.slice(0,-1).str.split('\t',expand = True).astype('float')
-    return np.array(t)
+    return trace_store.load_trace(fdir)
+
+def load_defendable(fdir):
+    '''The trace at fdir, or None when the file is missing or the trace has no
+    incoming packet to start the server padding from.'''
+    if not os.path.exists(fdir):
+        return None
+    trace = load_trace(fdir)
+    if not np.any(trace[:, 1] < 0):
+        logger.warning("{} has no incoming packet, skipped".format(fdir.split('/')[-1]))
+        return None
+    return trace
 
-def dump(trace, fname, metadata_list=None):
-    global output_dir
+def dump(output_dir, trace, fname, metadata_list=None):
     with open(join(output_dir,fname), 'w') as fo:
         for i, packet in enumerate(trace):
             # Packet format in trace: [time, length, metadata] (if processed by TransportSimulator)
@@ -153,209 +205,187 @@ def dump(trace, fname, metadata_list=None):
                  line += '\t' + json.dumps(meta)
             fo.write(line + ct.NL)
 
-# Add global variable
-fec_strategy = 'A'
-loss_rate = 0.0
-rtt = 0.1
-max_inflight = 20
-seed = None
-external_fec_rate = 0.0
-
-def init_worker(args_fec, c_min, s_min, c_dummy, s_dummy, start_time, max_w, min_w, out_dir, l_rate, r_time, m_inflight, s_seed, ext_fec_rate):
-    global fec_strategy
-    global client_min_dummy_pkt_num
-    global server_min_dummy_pkt_num
-    global client_dummy_pkt_num
-    global server_dummy_pkt_num
-    global start_padding_time
-    global max_wnd
-    global min_wnd
-    global output_dir
-    global loss_rate
-    global rtt
-    global max_inflight
-    global seed
-    global external_fec_rate
-    
-    fec_strategy = args_fec
-    client_min_dummy_pkt_num = c_min
-    server_min_dummy_pkt_num = s_min
-    client_dummy_pkt_num = c_dummy
-    server_dummy_pkt_num = s_dummy
-    start_padding_time = start_time
-    max_wnd = max_w
-    min_wnd = min_w
-    output_dir = out_dir
-    loss_rate = l_rate
-    rtt = r_time
-    max_inflight = m_inflight
-    seed = s_seed
-    external_fec_rate = ext_fec_rate
-
-def simulate(fdir):
-    global fec_strategy
-    global loss_rate
-    global rtt
-    global max_inflight
-    global seed
-    global output_dir
-    
-    if not os.path.exists(fdir):
-        return
+class FrontConfig(NamedTuple):
+    '''Settings of one FRONT run, handed once to every worker. seed is the entropy
+    of the run's master SeedSequence (--seed, or fresh).'''
+    fec_strategy: str
+    client_min_dummy_pkt_num: int
+    server_min_dummy_pkt_num: int
+    client_dummy_pkt_num: int
+    server_dummy_pkt_num: int
+    start_padding_time: int
+    max_wnd: float
+    min_wnd: float
+    output_dir: str
+    loss_rate: float
+    rtt: float
+    max_inflight: int
+    seed: Optional[int]
+    external_fec_rate: float
+    loss_rates: Optional[List[float]]
+    sim_seeds: Optional[List[int]]
+
+    @classmethod
+    def from_args(cls, args, config, output_dir):
+        return cls(fec_strategy=args.fec_strategy,
+                   client_min_dummy_pkt_num=int(config.get('client_min_dummy_pkt_num', 100)),
+                   server_min_dummy_pkt_num=int(config.get('server_min_dummy_pkt_num', 100)),
+                   client_dummy_pkt_num=int(config.get('client_dummy_pkt_num', 300)),
+                   server_dummy_pkt_num=int(config.get('server_dummy_pkt_num', 300)),
+                   start_padding_time=int(config.get('start_padding_time', 0)),
+                   max_wnd=float(config.get('max_wnd', 10)),
+                   min_wnd=float(config.get('min_wnd', 10)),
+                   output_dir=output_dir,
+                   loss_rate=args.loss_rate,
+                   rtt=args.rtt,
+                   max_inflight=args.max_inflight,
+                   seed=seeding.master(args.seed).entropy,
+                   external_fec_rate=args.external_fec_rate,
+                   loss_rates=args.loss_rates,
+                   sim_seeds=args.sim_seeds)
+
+def defend(cfg, index, fdir):
+    '''(file name, defended trace) of the index-th input trace; None in sweep mode
+    or when the trace cannot be defended.'''
+    trace = load_defendable(fdir)
+    if trace is None:
+        return None
     # logger.debug("Simulating trace {}".format(fdir))
     
-    # Use provided seed or random
-    if seed is not None:
-        np.random.seed(seed)
-    else:
-        np.random.seed(datetime.datetime.now().microsecond)
-        
-    trace = load_trace(fdir)
-    
-    # Initialize FEC Injector
-    injector_client = FECInjector(fec_strategy) # OUT
-    injector_server = FECInjector(fec_strategy) # IN
-    
-    noisy_trace = RP(trace)
+    # the trace's own streams: the same whatever worker runs it
+    rng, transport_rng = seeding.trace_rngs(seeding.master(cfg.seed), index)
     
-    # Post-process to apply FEC logic and generate metadata
+    noisy_trace = RP(cfg, trace, rng)
+    lengths = noisy_trace[:, 1].astype(int)
+    return transport(cfg, fdir.split('/')[-1], noisy_trace[:, 0], lengths, np.abs(lengths) == 888, rng, transport_rng)
+
+def defend_batch(cfg, chunk):
+    '''defend() for (index of the first file, file paths): the padding of the whole
+    chunk is drawn at once from the BATCH stream of its first trace, the rest from
+    the streams of each trace.'''
+    start, fdirs = chunk
+    master = seeding.master(cfg.seed)
+    traces = [(start + j, fdir.split('/')[-1], load_defendable(fdir)) for j, fdir in enumerate(fdirs)]
+    traces = [t for t in traces if t[2] is not None]
+    client, server = padding_times(cfg, seeding.stream(master, start, seeding.BATCH), len(traces))
+    results = []
+    for (index, fname, trace), client_times, server_times in zip(traces, client, server):
+        times, lengths, is_dummy = merge_padding(trace, client_times, server_times, cfg.start_padding_time)
+        results.append(transport(cfg, fname, times, lengths.astype(int), is_dummy, *seeding.trace_rngs(master, index)))
+    return results
+
+def transport(cfg, fname, times, lengths, is_dummy, rng, transport_rng):
+    '''FEC annotation and transport simulation of a padded trace, with the
+    trace's defense and transport random streams.'''
+    # Apply FEC logic and generate metadata for the whole trace at once
+    # (one injector per direction)
     # We construct a list of [time, length, metadata] to pass to TransportSimulator
-    processed_trace = []
-    
-    # Counters for packet IDs
-    real_client_id = 0
-    real_server_id = 0
-    
-    for packet in noisy_trace:
-        ts = packet[0]
-        length = int(packet[1])
-        meta = {}
-        
-        is_dummy_client = (length == 888)
-        is_dummy_server = (length == -888)
-        
-        if is_dummy_client:
-            meta = injector_client.generate_dummy_content()
-        elif is_dummy_server:
-            meta = injector_server.generate_dummy_content()
-        else:
-            # Real packet
-            if length > 0: # Client -> Server
-                real_client_id += 1
-                injector_client.process_real_packet(real_client_id)
-            else: # Server -> Client
-                real_server_id += 1
-                injector_server.process_real_packet(real_server_id)
-        
-        processed_trace.append([ts, length, meta])
+    table = FECInjector(cfg.fec_strategy, rng=rng).annotate(times, lengths, is_dummy)
+    processed_trace = table.packets()
 
     # Generate Debug Log Path
-    fname = fdir.split('/')[-1]
-    debug_log_path = join(output_dir, fname + '.debug.log')
+    debug_log_path = join(cfg.output_dir, fname + '.debug.log')
 
     # Simulate Transport (Loss & Retransmission)
-    tsim = TransportSimulator(loss_rate, rtt, max_inflight=max_inflight, seed=seed, debug_log_path=debug_log_path, external_fec_rate=external_fec_rate)
+    tsim = TransportSimulator(cfg.loss_rate, cfg.rtt, max_inflight=cfg.max_inflight, debug_log_path=debug_log_path, external_fec_rate=cfg.external_fec_rate, rng=transport_rng)
+    if cfg.loss_rates:
+        # sweep: the defended trace is simulated for every loss rate and seed, only stats are printed
+        tsim.simulate_many(processed_trace, cfg.loss_rates, cfg.sim_seeds)
+        return None
     final_trace = tsim.simulate(processed_trace)
+    return fname, final_trace
 
-    dump(final_trace, fname)
-
-def RP(trace):
+def RP(cfg, trace, rng):
     # format: [[time, pkt],[...]]
-    # trace, cpkt_num, spkt_num, cwnd, swnd
-    global client_dummy_pkt_num 
-    global server_dummy_pkt_num 
-    global min_wnd 
-    global max_wnd 
-    global start_padding_time
-    global client_min_dummy_pkt_num
-    global server_min_dummy_pkt_num
-    
-    client_wnd = np.random.uniform(min_wnd, max_wnd)
-    server_wnd = np.random.uniform(min_wnd, max_wnd)
-    if client_min_dummy_pkt_num != client_dummy_pkt_num:
-        client_dummy_pkt = np.random.randint(client_min_dummy_pkt_num,client_dummy_pkt_num)
+    client, server = padding_times(cfg, rng, 1)
+    times, lengths, _ = merge_padding(trace, client[0], server[0], cfg.start_padding_time)
+    return np.column_stack((times, lengths))
+
+def padding_times(cfg, rng, n):
+    '''Sorted client and server dummy timestamps of n traces, drawn as RP does for
+    one trace: both windows, both counts, then the client and server rayleigh draws.
+    rng is a numpy Generator.'''
+    client_wnd = rng.uniform(cfg.min_wnd, cfg.max_wnd, n)
+    server_wnd = rng.uniform(cfg.min_wnd, cfg.max_wnd, n)
+    if cfg.client_min_dummy_pkt_num != cfg.client_dummy_pkt_num:
+        client_dummy_pkt = rng.integers(cfg.client_min_dummy_pkt_num, cfg.client_dummy_pkt_num, n)
     else:
-        client_dummy_pkt = client_dummy_pkt_num
-    if server_min_dummy_pkt_num != server_dummy_pkt_num:
-        server_dummy_pkt = np.random.randint(server_min_dummy_pkt_num,server_dummy_pkt_num)
+        client_dummy_pkt = np.full(n, cfg.client_dummy_pkt_num)
+    if cfg.server_min_dummy_pkt_num != cfg.server_dummy_pkt_num:
+        server_dummy_pkt = rng.integers(cfg.server_min_dummy_pkt_num, cfg.server_dummy_pkt_num, n)
     else:
-        server_dummy_pkt = server_dummy_pkt_num
-    logger.debug("client_wnd:",client_wnd)
-    logger.debug("server_wnd:",server_wnd)
-    logger.debug("client pkt:", client_dummy_pkt)
-    logger.debug("server pkt:", server_dummy_pkt)
-
-
+        server_dummy_pkt = np.full(n, cfg.server_dummy_pkt_num)
+    logger.debug("client_wnd: %s, server_wnd: %s", client_wnd, server_wnd)
+    logger.debug("client pkt: %s, server pkt: %s", client_dummy_pkt, server_dummy_pkt)
+    return getTimestamps(rng, client_wnd, client_dummy_pkt), getTimestamps(rng, server_wnd, server_dummy_pkt)
+
+def merge_padding(trace, client_times, server_times, start_padding_time=0):
+    '''(times, lengths, is_dummy) of trace with the +888 client and -888 server dummies
+    merged in, in the order of a stable sort of trace, client, server. Server times
+    are relative to the first incoming packet; dummies after the last packet are dropped.'''
     first_incoming_pkt_time = trace[np.where(trace[:,1] <0)][0][0]
-    last_pkt_time = trace[-1][0]    
-    
-    client_timetable = getTimestamps(client_wnd, client_dummy_pkt)
-    client_timetable = client_timetable[np.where(start_padding_time+client_timetable[:,0] <= last_pkt_time)]
-
-    server_timetable = getTimestamps(server_wnd, server_dummy_pkt)
-    server_timetable[:,0] += first_incoming_pkt_time
-    server_timetable = server_timetable[np.where(start_padding_time+server_timetable[:,0] <= last_pkt_time)]
-
-    
-    # print("client_timetable")
-    # print(client_timetable[:10])
-    client_pkts = np.concatenate((client_timetable, 888*np.ones((len(client_timetable),1))),axis = 1)
-    server_pkts = np.concatenate((server_timetable, -888*np.ones((len(server_timetable),1))),axis = 1)
-
-
-    noisy_trace = np.concatenate( (trace, client_pkts, server_pkts), axis = 0)
-    noisy_trace = noisy_trace[ noisy_trace[:, 0].argsort(kind = 'mergesort')]
-    return noisy_trace
-
-def getTimestamps(wnd, num):
+    last_pkt_time = trace[-1][0]
+
+    client_times = client_times[start_padding_time + client_times <= last_pkt_time]
+    server_times = server_times + first_incoming_pkt_time
+    server_times = server_times[start_padding_time + server_times <= last_pkt_time]
+
+    t = trace[:, 0]
+    if np.any(t[1:] < t[:-1]):
+        # unsorted input: fall back to the sort
+        times = np.concatenate((t, client_times, server_times))
+        order = times.argsort(kind='mergesort')
+        lengths = np.concatenate((trace[:, 1], np.full(len(client_times), 888.0), np.full(len(server_times), -888.0)))
+        return times[order], lengths[order], order >= len(t)
+
+    # final position of each element: its rank within its own array plus the
+    # elements of the other two that sort before it (ties: trace < client < server)
+    pos_t = np.arange(len(t)) + np.searchsorted(client_times, t, 'left') + np.searchsorted(server_times, t, 'left')
+    pos_c = np.arange(len(client_times)) + np.searchsorted(t, client_times, 'right') + np.searchsorted(server_times, client_times, 'left')
+    pos_s = np.arange(len(server_times)) + np.searchsorted(t, server_times, 'right') + np.searchsorted(client_times, server_times, 'right')
+
+    n = len(t) + len(client_times) + len(server_times)
+    times = np.empty(n)
+    lengths = np.empty(n)
+    is_dummy = np.ones(n, dtype=bool)
+    times[pos_t], times[pos_c], times[pos_s] = t, client_times, server_times
+    lengths[pos_t], lengths[pos_c], lengths[pos_s] = trace[:, 1], 888, -888
+    is_dummy[pos_t] = False
+    return times, lengths, is_dummy
+
+def getTimestamps(rng, wnd, num):
+    '''Sorted rayleigh timestamps, num[i] of scale wnd[i] for every trace i.'''
     # timestamps = sorted(np.random.exponential(wnd/2.0, num))   
-    # print(wnd, num)
     # timestamps = sorted(abs(np.random.normal(0, wnd, num)))
-    timestamps = sorted(np.random.rayleigh(wnd,num))
-    # print(timestamps[:5])
-    # timestamps = np.fromiter(map(lambda x: x if x <= wnd else wnd, timestamps),dtype = float)
-    return np.reshape(timestamps, (len(timestamps),1))
+    timestamps = rng.rayleigh(np.repeat(wnd, num))
+    owner = np.repeat(np.arange(len(num)), num)
+    timestamps = timestamps[np.lexsort((timestamps, owner))]
+    return np.split(timestamps, np.cumsum(num)[:-1])
 
 
-def parallel(flist, init_args, n_jobs = 20):
-    pool = mp.Pool(n_jobs, initializer=init_worker, initargs=init_args)
-    pool.map(simulate, flist)
+def parallel(flist, cfg, consumers, n_jobs = None, batch = 0):
+    # the config reaches every worker once, bound to the defense function
+    if batch > 0:
+        return pipeline.run(flist, partial(defend_batch, cfg), consumers, n_jobs, batch=batch)
+    return pipeline.run(flist, partial(defend, cfg), consumers, n_jobs, indexed=True)
 
 
 if __name__ == '__main__':
-    # global client_dummy_pkt_num 
-    # global server_dummy_pkt_num 
-    # global client_min_dummy_pkt_num
-    # global server_min_dummy_pkt_num
-    # global max_wnd
-    # global min_wnd 
-    # global start_padding_time
-    # global fec_strategy
-    
     args, config = parse_arguments()
     logger.info(args)
-    
-    fec_strategy = args.fec_strategy
-    loss_rate = args.loss_rate
-    rtt = args.rtt
-    max_inflight = args.max_inflight
-    seed = args.seed
-
-    client_min_dummy_pkt_num = int(config.get('client_min_dummy_pkt_num',100))
-    server_min_dummy_pkt_num = int(config.get('server_min_dummy_pkt_num',100))
-    client_dummy_pkt_num = int(config.get('client_dummy_pkt_num',300))
-    server_dummy_pkt_num = int(config.get('server_dummy_pkt_num',300))
-    start_padding_time = int(config.get('start_padding_time', 0))
-    max_wnd = float(config.get('max_wnd',10))
-    min_wnd = float(config.get('min_wnd',10))
+
+    # Init run directories
+    output_dir = init_directories()
+    cfg = FrontConfig.from_args(args, config, output_dir)
+    logger.info("Master seed: {} (--seed {} reproduces this run)".format(cfg.seed, cfg.seed))
     MON_SITE_NUM = int(config.get('mon_site_num', 10))
     MON_INST_NUM = int(config.get('mon_inst_num', 10))
     UNMON_SITE_NUM = int(config.get('unmon_site_num', 100))
-    print("client_min_dummy_pkt_num:{}".format(client_min_dummy_pkt_num))
-    print("server_min_dummy_pkt_num:{}".format(server_min_dummy_pkt_num))
-    print("client_dummy_pkt_num: {}\nserver_dummy_pkt_num: {}".format(client_dummy_pkt_num,server_dummy_pkt_num))
-    print("max_wnd: {}\nmin_wnd: {}".format(max_wnd,min_wnd))
-    print("start_padding_time:", start_padding_time)
+    print("client_min_dummy_pkt_num:{}".format(cfg.client_min_dummy_pkt_num))
+    print("server_min_dummy_pkt_num:{}".format(cfg.server_min_dummy_pkt_num))
+    print("client_dummy_pkt_num: {}\nserver_dummy_pkt_num: {}".format(cfg.client_dummy_pkt_num,cfg.server_dummy_pkt_num))
+    print("max_wnd: {}\nmin_wnd: {}".format(cfg.max_wnd,cfg.min_wnd))
+    print("start_padding_time:", cfg.start_padding_time)
     # flist  = []
     # for i in range(MON_SITE_NUM):
     #     for j in range(MON_INST_NUM):
@@ -365,20 +395,28 @@ if __name__ == '__main__':
     
     # Iterate over all files in the directory
     import glob
-    flist = glob.glob(join(args.p, '*' + args.format))
+    # sorted: a trace's random streams follow its index in this list
+    flist = sorted(glob.glob(join(args.p, '*' + args.format)))
     logger.info(f"Found {len(flist)} files to process.")
 
-    # Init run directories
-    output_dir = init_directories()
     logger.info("Traces are dumped to {}".format(output_dir))
     start = time.time()
-    # for i,f in enumerate(flist):
-    #     logger.debug('Simulating {}'.format(f))
-    #     if i %2000 == 0:
-    #         print(r"Done for inst ",i,flush = True)
-    #     simulate(f)
-
-    init_args = (fec_strategy, client_min_dummy_pkt_num, server_min_dummy_pkt_num, 
-                 client_dummy_pkt_num, server_dummy_pkt_num, start_padding_time, max_wnd, min_wnd, output_dir, loss_rate, rtt, max_inflight, seed, args.external_fec_rate)
-    parallel(flist, init_args)
+
+    # defended traces go straight to the consumers; writing them is optional
+    consumers = [pipeline.Overhead(), pipeline.Timing()]
+    if not args.no_dump:
+        consumers.append(pipeline.Dump(partial(dump, output_dir)))
+    if args.features:
+        consumers.append(pipeline.KfpFeatures(MON_SITE_NUM))
+    n_jobs = args.jobs or pipeline.cpu_count()
+    logger.info("{} workers".format(n_jobs))
+    results = parallel(flist, cfg, consumers, n_jobs, batch=args.batch)
+    logger.info("Overhead: {}".format(results[0]))
+    timing = results[1]
+    logger.info("Per-trace time: mean {:.4f}s, max {:.4f}s over {} traces".format(timing['mean'], timing['max'], timing['traces']))
+    for pid, (n, mean) in sorted(timing['workers'].items()):
+        logger.info("worker {}: {} traces, {:.4f}s per trace".format(pid, n, mean))
+    if args.features:
+        np.save(args.features, results[-1])
+        logger.info("k-FP features of {} traces saved to {}".format(len(results[-1]['label']), args.features))
     logger.info("Time: {}".format(time.time()-start))
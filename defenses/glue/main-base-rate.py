@@ -1,4 +1,3 @@
-import random
 import constants as ct
 
 import sys
@@ -16,12 +15,12 @@ import json
 import configparser
 import argparse
 import logging
-import datetime
 
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
-from fec_injector import FECInjector
+from fec_injector import FECInjector, FEC
 from transport_simulator import TransportSimulator
+import seeding
 
 logger = logging.getLogger('mergepad')
 
@@ -61,8 +60,8 @@ def load_trace(fname, t = 999, noise = False):
 
 def weibull(k = 0.75):
     return np.random.weibull(0.75)
-def uniform():
-    return np.random.uniform(1,10)
+def uniform(rng=np.random):
+    return rng.uniform(1,10)
 
 def dump(trace, fpath, metadata_list=None):
     '''Write trace packet into file `fpath`.'''
@@ -100,24 +99,26 @@ def merge(this, other, start, cnt = 1):
     return this
     
 
-def est_iat(trace):
+def est_iat(trace, rng=np.random):
     trace_1 = np.concatenate((trace[1:], trace[0:1]),axis=0)
     itas = trace_1[:-1,0] - trace[:-1,0]
-    return np.random.uniform(np.percentile(itas,20), np.percentile(itas,80))
+    return rng.uniform(np.percentile(itas,20), np.percentile(itas,80))
 
 
-def choose_site():
+def choose_site(rng=np.random):
     # global list_names
     # list_names = glob.glob(join(args.traces_path,'*-*'))
     # with open("goodfile.txt","r") as f:
     with open("nonsens.txt","r") as f:
         list_names = list(pd.Series(f.readlines()).str.slice(0,-1))
-    noise_site = np.random.choice(list_names,1)[0]
+    noise_site = rng.choice(list_names,1)[0]
     return noise_site
         
-def MergePad2(output_dir, outputname ,noise, mergelist = None, waiting_time = 10, fec_strategy='A', loss_rate=0.0, rtt=0.1, max_inflight=20, seed=None, external_fec_rate=0.0):
+def MergePad2(output_dir, outputname ,noise, mergelist = None, waiting_time = 10, fec_strategy='A', loss_rate=0.0, rtt=0.1, max_inflight=20, seed=None, external_fec_rate=0.0, loss_rates=None, sim_seeds=None, rng=None, transport_rng=None):
     '''mergelist is a list of file names'''
     '''write in 2 files: the merged trace; the merged trace's name'''
+    '''rng and transport_rng: the trace's numpy Generators (seeding.trace_rngs); np.random and seed otherwise'''
+    rng = np.random if rng is None else rng
     labels = ""
     this = None
     start = 0.0 
@@ -129,66 +130,62 @@ def MergePad2(output_dir, outputname ,noise, mergelist = None, waiting_time = 10
         start = this[-1][0]
         '''pad noise or not'''
         if noise:
-            noise_fname = choose_site()
+            noise_fname = choose_site(rng)
             if cnt == len(mergelist)-1:
                 ###This is a param in mergepadding###
-                t = np.random.uniform(waiting_time, waiting_time+5)  
+                t = rng.uniform(waiting_time, waiting_time+5)  
             else:
-                t = uniform()
-            small_time = est_iat(trace)
+                t = uniform(rng)
+            small_time = est_iat(trace, rng)
             logger.debug("Delta t is %.5f seconds"%(small_time))
             _, noise_site = load_trace(noise_fname, max(t - small_time, 0),True)
             this = merge(this, noise_site,start+small_time, cnt = 999)
             # logger.info("Dwell time is %.2f seconds"%(t))
             start = start + t
         else:
-            t = uniform()
+            t = uniform(rng)
             start = start + t
 
     if noise:
         this = this[this[:,0].argsort(kind = "mergesort")]
         
     # Apply FEC
-    injector_snd = FECInjector(fec_strategy) # OUT
-    injector_rcv = FECInjector(fec_strategy) # IN
-    
-    final_trace_list = []
-    
-    real_snd_id = 0
-    real_rcv_id = 0
-    
     # Sort by time just in case
     this = this[this[:,0].argsort(kind = "mergesort")]
     
-    for packet in this:
+    # After every real packet both injectors are asked for a repair symbol: annotate
+    # the sequence real, client candidate, server candidate of every packet at once
+    n = len(this)
+    lengths = np.empty(3 * n, dtype=int)
+    lengths[0::3] = this[:, 1].astype(int)
+    lengths[1::3] = 1
+    lengths[2::3] = -1
+    is_dummy = np.ones(3 * n, dtype=bool)
+    is_dummy[0::3] = False
+    table = FECInjector(fec_strategy, rng=None if rng is np.random else rng).annotate(np.repeat(this[:, 0], 3), lengths, is_dummy)
+    
+    final_trace_list = []
+    for i, packet in enumerate(this):
         ts = packet[0]
-        length = int(packet[1])
-        
-        # Process Real Packet
-        if length > 0: # Client -> Server
-            real_snd_id += 1
-            injector_snd.process_real_packet(real_snd_id)
-        else: # Server -> Client
-            real_rcv_id += 1
-            injector_rcv.process_real_packet(real_rcv_id)
-            
-        final_trace_list.append([ts, length, {}])
+        final_trace_list.append([ts, int(lengths[3 * i]), {}])
         
         # Check for FEC injection
         # Client FEC
-        meta_snd = injector_snd.generate_dummy_content()
-        if meta_snd and meta_snd.get("type") != "DUMMY":
-             final_trace_list.append([ts + 0.0001, 512, meta_snd])
+        if table.kind[3 * i + 1] == FEC:
+             final_trace_list.append([ts + 0.0001, 512, table.metadata(3 * i + 1)])
              
         # Server FEC
-        meta_rcv = injector_rcv.generate_dummy_content()
-        if meta_rcv and meta_rcv.get("type") != "DUMMY":
-             final_trace_list.append([ts + 0.0001, -512, meta_rcv])
+        if table.kind[3 * i + 2] == FEC:
+             final_trace_list.append([ts + 0.0001, -512, table.metadata(3 * i + 2)])
 
     # Apply Transport Simulation
     # Apply Transport Simulation
     debug_log_path = join(output_dir, outputname+'.debug.log')
-    tsim = TransportSimulator(loss_rate, rtt, max_inflight=max_inflight, seed=seed, debug_log_path=debug_log_path, external_fec_rate=external_fec_rate)
+    tsim = TransportSimulator(loss_rate, rtt, max_inflight=max_inflight, seed=seed, debug_log_path=debug_log_path, external_fec_rate=external_fec_rate, rng=transport_rng)
+    if loss_rates:
+        # sweep: only stats for every loss rate and seed, no trace is dumped
+        tsim.simulate_many(final_trace_list, loss_rates, sim_seeds)
+        return labels
     final_trace = tsim.simulate(final_trace_list)
 
     dump(final_trace, join(output_dir, outputname+'.merge'))
@@ -354,7 +351,7 @@ def parse_arguments():
                         dest="seed",
                         metavar='<seed>',
                         default=None,
-                        help='Random seed')
+                        help='Master seed: every trace gets its own streams spawned from it by trace index (default: fresh, logged)')
 
     parser.add_argument('--external-fec-rate',
                         type=float,
@@ -363,6 +360,22 @@ def parse_arguments():
                         default=0.0,
                         help='External FEC rate (0.0 - 1.0)')
 
+    parser.add_argument('--loss-rates',
+                        type=float,
+                        nargs='+',
+                        dest="loss_rates",
+                        metavar='<loss_rate>',
+                        default=None,
+                        help='Sweep these loss rates in one pass: a tagged stats line per loss rate and seed, no traces are dumped')
+
+    parser.add_argument('--sim-seeds',
+                        type=int,
+                        nargs='+',
+                        dest="sim_seeds",
+                        metavar='<seed>',
+                        default=None,
+                        help='Transport seeds of the --loss-rates sweep (default: the transport stream of each trace)')
+
     args = parser.parse_args()
     config = dict(conf_parser._sections[args.section])
     config_logger(args)
@@ -371,69 +384,59 @@ def parse_arguments():
 
  
 
-def CreateMergedTrace(traces_path, list_names, N, M, BaseRate):
+def CreateMergedTrace(traces_path, list_names, N, M, BaseRate, rng=np.random):
     '''generate length-N merged trace'''
     '''with prob baserate/(baserate+1) a nonsensitive trace is chosen'''
     '''with prob 1/(baserate+1) a sensitive trace is chosen'''
-    list_sensitive = glob.glob(join(traces_path, '*-*'))
-    list_nonsensitive = list(set(list_names) - set(list_sensitive))
+    list_sensitive = sorted(glob.glob(join(traces_path, '*-*')))
+    list_nonsensitive = sorted(set(list_names) - set(list_sensitive))
     
     s1 = len(list_sensitive)
     s2 = len(list_nonsensitive)
     
     mergedTrace = np.array([])
     for i in range(N):
-        mergedTrace = np.append(mergedTrace,np.random.choice(list_sensitive+list_nonsensitive, M, replace = False,\
+        mergedTrace = np.append(mergedTrace,rng.choice(list_sensitive+list_nonsensitive, M, replace = False,\
                                   p = [1.0/(s1*(BaseRate+1))]*s1 + [BaseRate /(s2*(BaseRate+1))]*s2))
     mergedTrace = mergedTrace.reshape((N,M))
 
     return mergedTrace
 
 
-def CreateRandomMergedTrace(traces_path, list_names, N, M,BaseRate):
+def CreateRandomMergedTrace(traces_path, list_names, N, M,BaseRate, rng=np.random):
     '''generate random-length merged trace'''
     '''with prob baserate/(baserate+1) a nonsensitive trace is chosen'''
     '''with prob 1/(baserate+1) a sensitive trace is chosen'''
-    list_sensitive = glob.glob(join(traces_path, '*-*'))
-    list_nonsensitive = list(set(list_names) - set(list_sensitive))
+    list_sensitive = sorted(glob.glob(join(traces_path, '*-*')))
+    list_nonsensitive = sorted(set(list_names) - set(list_sensitive))
     
     s1 = len(list_sensitive)
     s2 = len(list_nonsensitive)
     
     mergedTrace = []
-    nums = np.random.choice(range(2,M+1),N)
+    nums = rng.choice(range(2,M+1),N)
     for i,num in enumerate(nums):
-        mergedTrace.append(np.random.choice(list_sensitive+list_nonsensitive, num, replace = False,\
+        mergedTrace.append(rng.choice(list_sensitive+list_nonsensitive, num, replace = False,\
                                   p = [1.0/(s1*(BaseRate+1))]*s1 + [BaseRate /(s2*(BaseRate+1))]*s2))
     return mergedTrace, nums
 
 
-def parallel(output_dir, noise, mergedTrace, fec_strategy, loss_rate, rtt, max_inflight, seed, external_fec_rate, n_jobs = 20): 
+def parallel(output_dir, noise, mergedTrace, fec_strategy, loss_rate, rtt, max_inflight, seed, external_fec_rate, n_jobs = 20, loss_rates=None, sim_seeds=None): 
     cnt = range(len(mergedTrace))
     l = len(cnt)
     
-    # Generate deterministic seeds if a master seed is provided
-    if seed is not None:
-        seeds = [seed + i for i in range(l)]
-    else:
-        seeds = [None] * l
-        
-    param_dict = zip([output_dir]*l, cnt, [noise]*l, mergedTrace, [fec_strategy]*l, [loss_rate]*l, [rtt]*l, [max_inflight]*l, seeds, [external_fec_rate]*l)
+    # seed: entropy of the master SeedSequence; merged trace i uses its i-th streams
+    param_dict = zip([output_dir]*l, cnt, [noise]*l, mergedTrace, [fec_strategy]*l, [loss_rate]*l, [rtt]*l, [max_inflight]*l, [seed]*l, [external_fec_rate]*l, [loss_rates]*l, [sim_seeds]*l)
     pool = mp.Pool(n_jobs)
     l  = pool.map(work, param_dict)
     return l
 
 
 def work(param):
-    output_dir, cnt, noise, T, fec_strategy, loss_rate, rtt, max_inflight, seed, external_fec_rate = param
+    output_dir, cnt, noise, T, fec_strategy, loss_rate, rtt, max_inflight, seed, external_fec_rate, loss_rates, sim_seeds = param
     
-    if seed is not None:
-        np.random.seed(seed)
-        random.seed(seed)
-    else:
-        np.random.seed(datetime.datetime.now().microsecond)
-        
-    return MergePad2(output_dir, str(cnt), noise, T, waiting_time=10, fec_strategy=fec_strategy, loss_rate=loss_rate, rtt=rtt, max_inflight=max_inflight, seed=seed, external_fec_rate=external_fec_rate)
+    rng, transport_rng = seeding.trace_rngs(seeding.master(seed), cnt)
+    return MergePad2(output_dir, str(cnt), noise, T, waiting_time=10, fec_strategy=fec_strategy, loss_rate=loss_rate, rtt=rtt, max_inflight=max_inflight, external_fec_rate=external_fec_rate, loss_rates=loss_rates, sim_seeds=sim_seeds, rng=rng, transport_rng=transport_rng)
 
 if __name__ == '__main__':
     # global list_names
@@ -441,15 +444,16 @@ if __name__ == '__main__':
     args,config = parse_arguments()
     logger.info("Arguments: %s" % (args))
 
-    if args.seed is not None:
-        np.random.seed(args.seed)
-        random.seed(args.seed)
+    # one master seed: the merge lists come from its own stream, merged trace i from its i-th streams
+    master = seeding.master(args.seed)
+    logger.info("Master seed: %d (--seed %d reproduces this run)" % (master.entropy, master.entropy))
+    rng = np.random.default_rng(master)
     
-    list_names = glob.glob(join(args.traces_path,'*'))
+    list_names = sorted(glob.glob(join(args.traces_path,'*')))
     if args.mode == 'fix':
-        mergedTrace = CreateMergedTrace(args.traces_path, list_names, args.n, args.m,args.b)
+        mergedTrace = CreateMergedTrace(args.traces_path, list_names, args.n, args.m,args.b, rng)
     elif args.mode == 'random':
-        mergedTrace, nums = CreateRandomMergedTrace(args.traces_path, list_names, args.n, args.m, args.b)
+        mergedTrace, nums = CreateRandomMergedTrace(args.traces_path, list_names, args.n, args.m, args.b, rng)
     else:
         logger.error("Wrong mode :{}".format(args.mode))
 
@@ -458,7 +462,8 @@ if __name__ == '__main__':
     if args.mode == 'random':
         np.save(join(output_dir,'num.npy'),nums)
 
-    l = parallel(output_dir, eval(args.noise), mergedTrace, args.fec_strategy, args.loss_rate, args.rtt, args.max_inflight, args.seed, args.external_fec_rate, 20)
+    l = parallel(output_dir, eval(args.noise), mergedTrace, args.fec_strategy, args.loss_rate, args.rtt, args.max_inflight, master.entropy, args.external_fec_rate, 20,
+                 args.loss_rates, args.sim_seeds)
     # l = []
     # cnt = 0
     # for T in mergedTrace:
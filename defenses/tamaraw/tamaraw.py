@@ -22,6 +22,8 @@ import os
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
 from fec_injector import FECInjector
 from transport_simulator import TransportSimulator
+import trace_store
+import seeding
 
 
 logger = logging.getLogger('tamaraw')
@@ -76,7 +78,7 @@ def AnoaTime(parameters):
 
         
 
-def AnoaPad(list1, list2, padL, method, injector_snd, injector_rcv):
+def AnoaPad(list1, list2, padL, method, injector_snd, injector_rcv, rng=random):
     lengths = [0, 0]
     times = [0, 0]
     for x in list1:
@@ -92,7 +94,7 @@ def AnoaPad(list1, list2, padL, method, injector_snd, injector_rcv):
 
     for j in range(0, 2):
         curtime = times[j]
-        topad = -int(math.log(random.uniform(0.00001, 1), 2) - 1) #1/2 1, 1/4 2, 1/8 3, ... #check this
+        topad = -int(math.log(rng.uniform(0.00001, 1), 2) - 1) #1/2 1, 1/4 2, 1/8 3, ... #check this
         if (method == 0):
             if padL == 0:
                 topad = 0
@@ -254,7 +256,7 @@ def parse_arguments():
                         dest="seed",
                         metavar='<seed>',
                         default=None,
-                        help='Random seed')
+                        help='Master seed: every trace gets its own streams spawned from it by trace index (default: fresh, logged)')
 
     parser.add_argument('--external-fec-rate',
                         type=float,
@@ -263,6 +265,22 @@ def parse_arguments():
                         default=0.0,
                         help='External FEC rate (0.0 - 1.0)')
 
+    parser.add_argument('--loss-rates',
+                        type=float,
+                        nargs='+',
+                        dest="loss_rates",
+                        metavar='<loss_rate>',
+                        default=None,
+                        help='Sweep these loss rates in one pass: a tagged stats line per loss rate and seed, no traces are dumped')
+
+    parser.add_argument('--sim-seeds',
+                        type=int,
+                        nargs='+',
+                        dest="sim_seeds",
+                        metavar='<seed>',
+                        default=None,
+                        help='Transport seeds of the --loss-rates sweep (default: the transport stream of each trace)')
+
     args = parser.parse_args()
     #config = dict(conf_parser._sections[args.section])
     config_logger(args)
@@ -304,23 +322,23 @@ if __name__ == '__main__':
 
     # Iterate over all files in the directory
     import glob
-    files = glob.glob(os.path.join(args.traces_path, '*.cell'))
+    # sorted: a trace's random streams follow its index in this list
+    files = sorted(glob.glob(os.path.join(args.traces_path, '*.cell')))
     logger.info(f"Found {len(files)} files to process.")
+    master = seeding.master(args.seed)
+    logger.info("Master seed: %d (--seed %d reproduces this run)" % (master.entropy, master.entropy))
 
-    for file_path in files:
+    for index, file_path in enumerate(files):
         fname = os.path.basename(file_path)
         logger.info('Simulating %s...'%fname)
-        packets = []
-        with open(file_path, "r") as f:
-            lines = f.readlines()
-            starttime = float(lines[0].split("\t")[0])
-            for x in lines:
-                x = x.split("\t")
-                packets.append([float(x[0]) - starttime, int(x[1])])
+        times, lengths = trace_store.load(file_path)
+        packets = [[t, l] for t, l in zip((times - times[0]).tolist(), lengths.tolist())]
         
+        rng, transport_rng = seeding.trace_rngs(master, index)
+
         # Initialize injectors
-        injector_snd = FECInjector(args.fec_strategy)
-        injector_rcv = FECInjector(args.fec_strategy)
+        injector_snd = FECInjector(args.fec_strategy, rng=rng)
+        injector_rcv = FECInjector(args.fec_strategy, rng=rng)
         
         list2 = [packets[0]]
         parameters = [""]
@@ -332,20 +350,24 @@ if __name__ == '__main__':
         list3 = []
         
         # Run Tamaraw
-        AnoaPad(list2, list3, args.padl, 0, injector_snd, injector_rcv)
+        AnoaPad(list2, list3, args.padl, 0, injector_snd, injector_rcv, rng)
 
         # Simulate Transport (Loss & Retransmission)
         debug_log_path = os.path.join(foldout, fname + '.debug.log')
-        tsim = TransportSimulator(args.loss_rate, args.rtt, max_inflight=args.max_inflight, seed=args.seed, debug_log_path=debug_log_path, external_fec_rate=args.external_fec_rate)
-        final_trace = tsim.simulate(list3)
-
-        fout = open(os.path.join(foldout,fname), "w")
-        for x in final_trace:
-            line = "{:.4f}\t{:d}".format(x[0],x[1])
-            if len(x) > 2 and x[2]: # If metadata exists
-                    line += "\t" + json.dumps(x[2])
-            fout.write(line + "\n")
-        fout.close()
+        tsim = TransportSimulator(args.loss_rate, args.rtt, max_inflight=args.max_inflight, debug_log_path=debug_log_path, external_fec_rate=args.external_fec_rate, rng=transport_rng)
+        if args.loss_rates:
+            # sweep: only stats for every loss rate and seed, no trace is dumped
+            tsim.simulate_many(list3, args.loss_rates, args.sim_seeds)
+        else:
+            final_trace = tsim.simulate(list3)
+
+            fout = open(os.path.join(foldout,fname), "w")
+            for x in final_trace:
+                line = "{:.4f}\t{:d}".format(x[0],x[1])
+                if len(x) > 2 and x[2]: # If metadata exists
+                        line += "\t" + json.dumps(x[2])
+                fout.write(line + "\n")
+            fout.close()
 
         #latency:
         old = packets[-1][0] - packets[0][0]
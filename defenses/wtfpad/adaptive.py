@@ -5,6 +5,7 @@ import os
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
 from fec_injector import FECInjector
+import seeding
 
 import numpy as np
 from math import sqrt, pi, ceil
@@ -32,7 +33,12 @@ ht = histo.Histogram
 class AdaptiveSimulator(object):
     """Simulates adaptive padding's original design on real web data."""
 
-    def __init__(self, config):
+    def __init__(self, config, rng=None):
+        # rng: the trace's numpy Generator (seeding.trace_rngs); the global
+        # random states when None
+        self.rng = rng
+        self.py_rng = None if rng is None else seeding.py_random(rng)
+
         # parse arguments
         self.interpolate = bool(config.get('interpolate', True))
         self.remove_tokens = config.get('remove_tokens', True)
@@ -42,15 +48,15 @@ class AdaptiveSimulator(object):
         # FEC Configuration
         self.fec_strategy = config.get('fec_strategy', 'A')
         # Initialize FEC Injectors for both directions
-        self.injector_snd = FECInjector(self.fec_strategy)
-        self.injector_rcv = FECInjector(self.fec_strategy)
+        self.injector_snd = FECInjector(self.fec_strategy, rng=rng)
+        self.injector_rcv = FECInjector(self.fec_strategy, rng=rng)
         
         # Real packet counters
         self.real_snd_id = 0
         self.real_rcv_id = 0
 
         # the distribution of packet lengths is fixed in Tor
-        self.length_distrib = histo.uniform(ct.MTU)
+        self.length_distrib = histo.uniform(ct.MTU, rng=self.py_rng)
 
         # initialize dictionary of distributions
         distributions = {k: v for k, v in config.items() if 'dist' in k}
@@ -207,7 +213,7 @@ class AdaptiveSimulator(object):
             sigma_prime = 1 / (sqrt(2 * pi) * pdf_mu_prime)
         else:
             raise ValueError("Skewing distrib toward longer inter-arrival times makes fake bursts distinguishable from real.")
-        return ht.dict_from_distr(fit_distr, (mu_prime, sigma_prime), bin_size=30)
+        return ht.dict_from_distr(fit_distr, (mu_prime, sigma_prime), bin_size=30, rng=self.rng)
 
     def init_distrib(self, name, config_dist, drop=0, skew=0):
         # parse distributions parameters
@@ -223,7 +229,7 @@ class AdaptiveSimulator(object):
             inf_config, dist_params = params.split(',', 1)
             inf_config = float(inf_config.strip())
             dist_params = map(float, [x.strip() for x in dist_params.split(',')])
-            d = ht.dict_from_distr(name=dist, params=dist_params, bin_size=30)
+            d = ht.dict_from_distr(name=dist, params=dist_params, bin_size=30, rng=self.rng)
             d = self.set_infinity_bin(d, name, inf_config)
 
         # drop first `drop` bins
@@ -244,7 +250,7 @@ class AdaptiveSimulator(object):
             endpoint, on, mode, _ = k.split('_')
             s = ct.MODE2STATE[mode]
             d = ct.EP2DIRS[endpoint]
-            hist[s][d][on] = histo.new(self.init_distrib(k, v), self.interpolate, self.remove_tokens, name=k)
+            hist[s][d][on] = histo.new(self.init_distrib(k, v), self.interpolate, self.remove_tokens, name=k, rng=self.py_rng)
         return hist
 
     def set_infinity_bin(self, distrib, name, inf_config):
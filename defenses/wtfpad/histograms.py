@@ -5,7 +5,6 @@ distributions represented as histograms.
 import math
 import operator
 import random
-from random import randint
 from bisect import bisect_right
 
 import constants as ct
@@ -22,7 +21,7 @@ logger = logging.getLogger('wtfpad')
 class Histogram:
     """Provides methods to generate and sample histograms of prob distributions."""
 
-    def __init__(self, hist, interpolate=True, remove_tokens=False, decay_by=0, name=''):
+    def __init__(self, hist, interpolate=True, remove_tokens=False, decay_by=0, name='', rng=None):
         """Initialize an histogram.
 
         `hist` is a dictionary. The keys are labels of an histogram. They represent
@@ -63,8 +62,11 @@ class Histogram:
         are floats that have been truncated up to some number of decimals. Normally, the
         labels will be seconds and since we want a precision of milliseconds, the float
         is truncated up to the 3rd decimal position with for example round(x_i, 3).
+
+        `rng` is the random.Random samples are drawn from (the random module by default).
         """
         self.name = name
+        self.rng = random if rng is None else rng
         self.hist = hist
         self.inf = False
         self.interpolate = interpolate
@@ -168,7 +170,7 @@ class Histogram:
         total_tokens = int(sum(self.hist.values()))
         if total_tokens == 0:
             return ct.INF
-        prob = randint(1, total_tokens) if total_tokens > 0 else 0
+        prob = self.rng.randint(1, total_tokens) if total_tokens > 0 else 0
         for i, label_i in enumerate(self.labels):
             prob -= self.hist[label_i]
             if prob > 0:
@@ -178,7 +180,7 @@ class Histogram:
             label_i_1 = 0 if i == 0 else self.labels[i - 1]
             if label_i == ct.INF:
                 return ct.INF
-            p = label_i + (label_i_1 - label_i) * random.random()
+            p = label_i + (label_i_1 - label_i) * self.rng.random()
             return p
         logger.exception("[histo - sample] Tokens = %s, prob = %s", sum(self.hist.values()), prob)
         raise ValueError("In `histo.random_sample`: probability is larger than range of counts!")
@@ -246,43 +248,45 @@ class Histogram:
         return d
 
     @classmethod
-    def dict_from_distr(self, name, params, scale=1.0, num_samples=10000, bin_size=50):
+    def dict_from_distr(self, name, params, scale=1.0, num_samples=10000, bin_size=50, rng=None):
         import numpy as np
         counts, bins = [], []
+        # samples from rng, a numpy Generator, or the global numpy random state
+        rng = np.random if rng is None else rng
 
         if name == "weibull":
             shape = params
-            counts, bins = np.histogram(np.random.weibull(shape, num_samples) * scale,
+            counts, bins = np.histogram(rng.weibull(shape, num_samples) * scale,
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "beta":
             a, b = params
-            counts, bins = np.histogram(np.random.beta(a, b, num_samples) * scale,
+            counts, bins = np.histogram(rng.beta(a, b, num_samples) * scale,
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "logis":
             location, scale = params
-            counts, bins = np.histogram(np.random.logistic(location, scale, num_samples),
+            counts, bins = np.histogram(rng.logistic(location, scale, num_samples),
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "lnorm":
             mu, sigma = params
-            counts, bins = np.histogram(np.random.lognormal(mu, sigma, num_samples),
+            counts, bins = np.histogram(rng.lognormal(mu, sigma, num_samples),
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "norm":
             mu, sigma = params
-            counts, bins = np.histogram([s for s in np.random.normal(mu, sigma, num_samples) if s > 0],
+            counts, bins = np.histogram([s for s in rng.normal(mu, sigma, num_samples) if s > 0],
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "gamma":
             shape, scale = params
-            counts, bins = np.histogram(np.random.gamma(shape, scale, num_samples),
+            counts, bins = np.histogram(rng.gamma(shape, scale, num_samples),
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "pareto":
             shape, scale = params
-            counts, bins = np.histogram(genpareto.rvs(shape, scale=scale, size=num_samples),
+            counts, bins = np.histogram(genpareto.rvs(shape, scale=scale, size=num_samples, random_state=None if rng is np.random else rng),
                                         bins=self.create_exponential_bins(a=0, b=10, n=bin_size))
 
         elif name == "empty":
@@ -318,8 +322,8 @@ class Histogram:
         return h
 
 
-def uniform(x):
-    return new({x: 1}, interpolate=False, remove_tokens=False)
+def uniform(x, rng=None):
+    return new({x: 1}, interpolate=False, remove_tokens=False, rng=rng)
 
 
 # Alias class name in order to provide a more intuitive API.
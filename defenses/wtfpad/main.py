@@ -12,6 +12,7 @@ from pparser import parse
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
 from transport_simulator import TransportSimulator
+import seeding
 
 logger = logging.getLogger('wtfpad')
 
@@ -63,7 +64,7 @@ def parse_arguments():
                         dest="seed",
                         metavar='<seed>',
                         default=None,
-                        help='Random seed')
+                        help='Master seed: every trace gets its own streams spawned from it by trace index (default: fresh, logged)')
 
     parser.add_argument('--external-fec-rate',
                         type=float,
@@ -72,6 +73,22 @@ def parse_arguments():
                         default=0.0,
                         help='External FEC rate (0.0 - 1.0)')
 
+    parser.add_argument('--loss-rates',
+                        type=float,
+                        nargs='+',
+                        dest="loss_rates",
+                        metavar='<loss_rate>',
+                        default=None,
+                        help='Sweep these loss rates in one pass: a tagged stats line per loss rate and seed, no traces are dumped')
+
+    parser.add_argument('--sim-seeds',
+                        type=int,
+                        nargs='+',
+                        dest="sim_seeds",
+                        metavar='<seed>',
+                        default=None,
+                        help='Transport seeds of the --loss-rates sweep (default: the transport stream of each trace)')
+
     args = parser.parse_args()
     # config = dict(conf_parser._sections[args.section])
     config = dict(conf_parser[args.section])
@@ -81,8 +98,11 @@ def parse_arguments():
     config['loss_rate'] = args.loss_rate
     config['rtt'] = args.rtt
     config['max_inflight'] = args.max_inflight
-    config['seed'] = args.seed
+    # entropy of the run's master SeedSequence: trace i uses its i-th streams
+    config['seed'] = seeding.master(args.seed).entropy
     config['external_fec_rate'] = args.external_fec_rate
+    config['loss_rates'] = args.loss_rates
+    config['sim_seeds'] = args.sim_seeds
     
     return args, config
 
@@ -95,25 +115,23 @@ def config_logger(args):
     logger.addHandler(ch)
     logger.setLevel(logging.INFO)
 
-def process_trace(file_path, config, output_dir):
+def process_trace(index, file_path, config, output_dir):
     try:
         fname = os.path.basename(file_path)
         # logger.info(f"Processing {fname}")
+        rng, transport_rng = seeding.trace_rngs(seeding.master(config['seed']), index)
         
         # Parse trace
         trace = parse(file_path)
         
         # Simulate
-        simulator = AdaptiveSimulator(config)
+        simulator = AdaptiveSimulator(config, rng)
         noisy_trace = simulator.simulate(trace)
         
         # Apply Transport Simulation (Loss & Retransmission)
         loss_rate = float(config.get('loss_rate', 0.0))
         rtt = float(config.get('rtt', 0.1))
         max_inflight = int(config.get('max_inflight', 20))
-        seed = config.get('seed')
-        if seed is not None:
-             seed = int(seed)
         
         # Convert Packet objects to list format for TransportSimulator
         # [time, length, metadata]
@@ -124,7 +142,11 @@ def process_trace(file_path, config, output_dir):
         # Debug log path
         debug_log_path = os.path.join(output_dir, fname + '.debug.log')
         external_fec_rate = float(config.get('external_fec_rate', 0.0))
-        tsim = TransportSimulator(loss_rate, rtt, max_inflight=max_inflight, seed=seed, debug_log_path=debug_log_path, external_fec_rate=external_fec_rate)
+        tsim = TransportSimulator(loss_rate, rtt, max_inflight=max_inflight, debug_log_path=debug_log_path, external_fec_rate=external_fec_rate, rng=transport_rng)
+        if config.get('loss_rates'):
+            # sweep: only stats for every loss rate and seed, no trace is dumped
+            tsim.simulate_many(processed_trace, config['loss_rates'], config.get('sim_seeds'))
+            return
         final_trace = tsim.simulate(processed_trace)
         
         # Dump
@@ -151,6 +173,7 @@ def main():
     
     logger.info(f"Arguments: {args}")
     logger.info(f"Configuration: {config}")
+    logger.info(f"Master seed: {config['seed']} (--seed {config['seed']} reproduces this run)")
 
     # Output directory
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -167,7 +190,8 @@ def main():
 
     # Get list of files
     if os.path.isdir(args.traces_path):
-        files = [os.path.join(args.traces_path, f) for f in os.listdir(args.traces_path) if f.endswith('.cell')]
+        # sorted: a trace's random streams follow its index in this list
+        files = sorted(os.path.join(args.traces_path, f) for f in os.listdir(args.traces_path) if f.endswith('.cell'))
     else:
         files = [args.traces_path]
         
@@ -175,8 +199,8 @@ def main():
     pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
     
     tasks = []
-    for f in files:
-        tasks.append((f, config, output_dir))
+    for i, f in enumerate(files):
+        tasks.append((i, f, config, output_dir))
         
     pool.starmap(process_trace, tasks)
     pool.close()
@@ -3,6 +3,11 @@ from constants import IN, OUT, TOR_CELL_SIZE
 
 import logging
 import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'utils'))
+import trace_store
 
 logger = logging.getLogger('ranpad')
 
@@ -10,6 +15,15 @@ logger = logging.getLogger('ranpad')
 def parse(fpath):
     '''Parse a file assuming Tao's format.'''
     t = Trace()
+    store = trace_store.open_store(os.path.dirname(os.path.abspath(fpath)))
+    name = os.path.basename(fpath)
+    if store is not None and name in store:
+        times, lengths = store.get(name)
+        for timestamp, length in zip(times.tolist(), lengths.tolist()):
+            if length == 0:
+                continue
+            t.append(Packet(timestamp, 1 if length > 0 else -1, abs(length)))
+        return t
     for line in open(fpath):
         try:    
             timestamp, length = line.strip().split(ct.TRACE_SEP)
@@ -58,6 +72,10 @@ class Trace(list):
     _index = 0
 
     def __init__(self,  list_packets=None):
+        # per direction: [i, j] of the last get_next_by_direction(i, direction) = j,
+        # valid while the trace has _length packets (see insert)
+        self._cursors = {}
+        self._length = 0
         if list_packets:
             for p in list_packets:
                 self.append(p)
@@ -76,14 +94,45 @@ class Trace(list):
         return Trace(list.__mul__(self, other))
 
     def get_next_by_direction(self, i, direction):
-        # print(i,direction, len(self))
-        flag = 0
-        for j, p in enumerate(self[i + 1:]):
-            if p.direction == direction:
-                flag = 1
-                return i + j + 1
-        if flag == 0:
-            return -1
+        """Index of the first packet after i in `direction`, -1 if there is none.
+
+        Queries for a non-decreasing i, as AdaptiveSimulator makes them, resume from
+        the previous answer of that direction, which no packet of the direction
+        precedes: the scans of a whole simulation add up to one pass per direction.
+        insert() (which insort_left uses to add dummies) keeps the answers in place;
+        any other change of length restarts the scans.
+        """
+        n = len(self)
+        if self._length != n:
+            self._cursors = {}
+            self._length = n
+        cursor = self._cursors.get(direction)
+        j = i + 1
+        if cursor is not None and cursor[0] <= i:
+            j = max(j, cursor[1])
+        while j < n and self[j].direction != direction:
+            j += 1
+        self._cursors[direction] = [i, j]
+        return j if j < n else -1
+
+    def insert(self, k, packet):
+        n = len(self)
+        k = min(max(k + n, 0) if k < 0 else k, n)
+        list.insert(self, k, packet)
+        if self._length != n:
+            self._cursors = {}
+            return
+        self._length = n + 1
+        for direction, cursor in self._cursors.items():
+            i, j = cursor
+            if k <= i:
+                cursor[0] = i + 1
+            if k <= j:
+                cursor[1] = k if k > cursor[0] and packet.direction == direction else j + 1
+
+    def sort(self, *args, **kwargs):
+        self._cursors = {}
+        list.sort(self, *args, **kwargs)
 
     def next(self):
         try:
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add df to path, only for this import: df has its own extract.py
+DF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../attacks/df')
+sys.path.append(DF_DIR)
+import dfdata
+import dfstore
+sys.path.remove(DF_DIR)
+
+def make_row(i):
+    return dfstore.direction_row(np.where(np.arange(10 + i) % (i + 2) == 0, 1, -1), 16), i % 3
+
+class TestDFData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = os.path.join(self.tmp, 'tor' + dfstore.STORE_SUFFIX)
+        dfstore.build(list(range(12)), self.store, make_row, 16, 3, n_jobs=1)
+        self.X = np.array([make_row(i)[0] for i in range(12)])
+        self.y = np.array([i % 3 for i in range(12)])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_open_data(self):
+        X, y = dfdata.open_data(self.store)
+        self.assertIsInstance(X, np.memmap)
+        np.testing.assert_array_equal(X, self.X)
+        np.testing.assert_array_equal(y, self.y)
+        # pickled dict with one-hot labels and a trailing channel axis
+        npy = os.path.join(self.tmp, 'tor.npy')
+        np.save(npy, {'feature': self.X[:, :, np.newaxis], 'label': np.eye(3)[self.y]})
+        X, y = dfdata.open_data(npy)
+        np.testing.assert_array_equal(X, self.X)
+        np.testing.assert_array_equal(y, self.y)
+        self.assertEqual(y.dtype, np.int64)
+
+    def test_gather(self):
+        X, _ = dfdata.open_data(self.store)
+        rows = [7, 2, 11, 2]
+        out = dfdata.gather(X, rows)
+        self.assertEqual(out.dtype, np.float32)
+        np.testing.assert_array_equal(out, self.X[rows])
+        np.testing.assert_array_equal(dfdata.gather(X, rows, 20)[:, :16], self.X[rows])
+        np.testing.assert_array_equal(dfdata.gather(X, rows, 8), self.X[rows, :8])
+
+    def test_dataset(self):
+        X, y = dfdata.open_data(self.store)
+        index = np.array([10, 3, 5, 0])
+        ds = dfdata.TraceDataset(X, y, index)
+        self.assertEqual(len(ds), 4)
+        x, yb = ds[[0, 2]]
+        self.assertEqual(x.shape, (2, 1, 16))
+        np.testing.assert_array_equal(x[:, 0], self.X[[10, 5]])
+        np.testing.assert_array_equal(yb, self.y[[10, 5]])
+        x, label = ds[1]
+        self.assertEqual(x.shape, (1, 16))
+        self.assertEqual(label, self.y[3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add df to path, only for this import: df has its own extract.py
+DF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../attacks/df')
+sys.path.append(DF_DIR)
+import dfstore
+sys.path.remove(DF_DIR)
+
+LENGTH = 20
+
+def make_row(f):
+    # f is (label, number of packets); short traces are dropped
+    label, n = f
+    if n < 3:
+        return None
+    feature = np.where(np.arange(n) % 3 == 0, 888, -1)
+    return dfstore.direction_row(feature, LENGTH), label
+
+class TestDFStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'tor' + dfstore.STORE_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_direction_row(self):
+        np.testing.assert_array_equal(dfstore.direction_row([3, -1, 999], 5), [1, -1, 1, 0, 0])
+        np.testing.assert_array_equal(dfstore.direction_row([1, -1, -1], 2), [1, -1])
+        self.assertEqual(dfstore.direction_row([1], 4).dtype, np.int8)
+
+    def test_build(self):
+        flist = [(i % 4, n) for i, n in enumerate([5, 1, 30, 20, 2, 7, 19])]
+        dfstore.build(flist, self.path, make_row, LENGTH, 5, n_jobs=2)
+        X, y = dfstore.open_store(self.path)
+        kept = [f for f in flist if f[1] >= 3]
+        self.assertEqual(X.shape, (len(kept), LENGTH))
+        self.assertEqual(X.dtype, np.int8)
+        np.testing.assert_array_equal(y, [f[0] for f in kept])
+        for row, f in zip(X, kept):
+            np.testing.assert_array_equal(row, make_row(f)[0])
+        self.assertEqual(dfstore.num_classes(self.path), 5)
+        self.assertEqual(os.path.getsize(self.path), dfstore._align(dfstore.HEADER + X.size) + 8 * len(kept))
+
+    def test_empty(self):
+        dfstore.build([(0, 1)], self.path, make_row, LENGTH, 5, n_jobs=1)
+        X, y = dfstore.open_store(self.path)
+        self.assertEqual(X.shape, (0, LENGTH))
+        self.assertEqual(len(y), 0)
+
+if __name__ == '__main__':
+    unittest.main()
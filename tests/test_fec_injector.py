@@ -2,10 +2,11 @@ import unittest
 import sys
 import os
 import json
+import random
 
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
-from fec_injector import FECInjector
+from fec_injector import FECInjector, IdHistory
 
 class TestFECInjector(unittest.TestCase):
     def test_strategy_A(self):
@@ -70,5 +71,42 @@ class TestFECInjector(unittest.TestCase):
         self.assertEqual(meta['start_id'], 5)
         self.assertEqual(meta['end_id'], 9)
 
+    def test_id_history(self):
+        rng = random.Random(1)
+        for ids in [list(range(1, 200)), [rng.randint(0, 50) for _ in range(500)]]:
+            history = IdHistory(7)
+            window = []
+            for packet_id in ids:
+                history.push(packet_id)
+                window.append(packet_id)
+                if len(window) > 7:
+                    window.pop(0)
+                self.assertEqual(list(history), window)
+                self.assertEqual((history.min(), history.max()), (min(window), max(window)))
+
+    def test_annotate(self):
+        rng = random.Random(2)
+        lengths = [rng.choice([1, -1, 888, -888]) for _ in range(300)]
+        times = [0.01 * i for i in range(300)]
+        is_dummy = [abs(l) == 888 for l in lengths]
+        for strategy in 'ABCD':
+            random.seed(5)
+            injectors = {1: FECInjector(strategy, window_size=8, block_size=4),
+                         -1: FECInjector(strategy, window_size=8, block_size=4)}
+            ids = {1: 0, -1: 0}
+            expected = []
+            for t, l, dummy in zip(times, lengths, is_dummy):
+                d = 1 if l > 0 else -1
+                if dummy:
+                    expected.append([t, l, injectors[d].generate_dummy_content()])
+                else:
+                    ids[d] += 1
+                    injectors[d].process_real_packet(ids[d])
+                    expected.append([t, l, {}])
+            random.seed(5)
+            table = FECInjector(strategy, window_size=8, block_size=4).annotate(times, lengths, is_dummy)
+            # same dicts, keys in the same order
+            self.assertEqual(json.dumps(table.packets()), json.dumps(expected))
+
 if __name__ == '__main__':
     unittest.main()
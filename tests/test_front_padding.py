@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import importlib.util
+import io
+import contextlib
+import tempfile
+from functools import partial
+
+import numpy as np
+
+# Load defenses/front/main.py (its constants module lives next to it)
+FRONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../defenses/front')
+sys.path.insert(0, FRONT_DIR)
+spec = importlib.util.spec_from_file_location('front_main', os.path.join(FRONT_DIR, 'main.py'))
+front = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(front)
+sys.path.remove(FRONT_DIR)
+
+CFG = front.FrontConfig(fec_strategy='A', client_min_dummy_pkt_num=50, server_min_dummy_pkt_num=100,
+                        client_dummy_pkt_num=300, server_dummy_pkt_num=100, start_padding_time=0,
+                        max_wnd=10.0, min_wnd=2.0, output_dir='.', loss_rate=0.0, rtt=0.1, max_inflight=20,
+                        seed=None, external_fec_rate=0.0, loss_rates=None, sim_seeds=None)
+
+
+def sorted_merge(trace, client_times, server_times):
+    '''The concatenate + mergesort merge RP used to do.'''
+    client_pkts = np.column_stack((client_times, np.full(len(client_times), 888.0)))
+    server_pkts = np.column_stack((server_times, np.full(len(server_times), -888.0)))
+    noisy_trace = np.concatenate((trace, client_pkts, server_pkts), axis=0)
+    return noisy_trace[noisy_trace[:, 0].argsort(kind='mergesort')]
+
+
+class Packets(front.pipeline.Consumer):
+    def __init__(self):
+        self.traces = {}
+
+    def map(self, trace):
+        return [(p[0], int(p[1]), p[2]) for p in trace.packets]
+
+    def reduce(self, name, value):
+        self.traces[name] = value
+
+    def result(self):
+        return self.traces
+
+
+class TestFrontPadding(unittest.TestCase):
+    def test_merge_padding(self):
+        rng = np.random.default_rng(0)
+        for trial in range(50):
+            n = rng.integers(2, 300)
+            # coarse times so that dummies tie with real packets
+            t = np.sort(np.round(rng.exponential(0.05, n).cumsum(), 1))
+            l = rng.choice([1.0, -1.0], n)
+            l[-1] = -1.0
+            trace = np.column_stack((t, l))
+            client, server = front.padding_times(CFG, rng, 1)
+            client, server = np.round(client[0], 1), np.round(server[0], 1)
+            times, lengths, is_dummy = front.merge_padding(trace, client, server)
+
+            first_incoming = t[l < 0][0]
+            expected = sorted_merge(trace, client[client <= t[-1]], (server + first_incoming)[server + first_incoming <= t[-1]])
+            np.testing.assert_array_equal(np.column_stack((times, lengths)), expected)
+            np.testing.assert_array_equal(is_dummy, np.abs(lengths) == 888)
+
+    def test_padding_times(self):
+        client, server = front.padding_times(CFG, np.random.default_rng(1), 2000)
+        self.assertEqual(len(client), 2000)
+        counts = np.array([len(c) for c in client])
+        self.assertTrue(np.all((counts >= 50) & (counts < 300)))
+        self.assertTrue(all(len(s) == 100 for s in server))
+        self.assertTrue(all(np.all(np.diff(c) >= 0) for c in client))
+        # rayleigh of a uniform(2, 10) scale: mean 6 * sqrt(pi / 2)
+        self.assertAlmostEqual(np.concatenate(server).mean() / (6 * np.sqrt(np.pi / 2)), 1.0, places=1)
+
+    def test_pool_size(self):
+        rng = np.random.default_rng(7)
+        with tempfile.TemporaryDirectory() as tmp:
+            flist = []
+            for i in range(6):
+                path = os.path.join(tmp, '{}-0.cell'.format(i))
+                t = np.cumsum(rng.exponential(0.02, 150))
+                np.savetxt(path, np.column_stack((t, rng.choice([1, -1], 150))), fmt=['%.6f', '%d'], delimiter='\t')
+                flist.append(path)
+            cfg = CFG._replace(fec_strategy='C', loss_rate=0.1, seed=1234, output_dir=tmp)
+            runs = []
+            for n_jobs in [1, 3]:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    runs.append(front.pipeline.run(flist, partial(front.defend, cfg), [Packets()], n_jobs, indexed=True)[0])
+            self.assertEqual(len(runs[0]), 6)
+            self.assertEqual(runs[0], runs[1])
+
+    def test_no_incoming(self):
+        rng = np.random.default_rng(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            flist = []
+            for i, dirs in enumerate([[1, -1], [1], [1, -1]]):
+                path = os.path.join(tmp, '{}-0.cell'.format(i))
+                t = np.cumsum(rng.exponential(0.02, 100))
+                np.savetxt(path, np.column_stack((t, rng.choice(dirs, 100))), fmt=['%.6f', '%d'], delimiter='\t')
+                flist.append(path)
+            cfg = CFG._replace(seed=5, output_dir=tmp)
+            # both modes skip the outgoing-only trace instead of failing
+            for batch in [0, 2]:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    traces = front.parallel(flist, cfg, [Packets()], 2, batch=batch)[0]
+                self.assertEqual(sorted(traces), ['0-0.cell', '2-0.cell'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import random
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+from gf2_decoder import GF2Decoder
+
+def rebuild_add(basis, unknowns):
+    '''The from-scratch elimination TransportSimulator._process_fec used to run.'''
+    current_basis = basis + [set(unknowns)]
+    new_basis = []
+    current_basis.sort(key=lambda x: min(x) if x else float('inf'))
+    for row in current_basis:
+        while row:
+            pivot = min(row)
+            collision = None
+            for b_row in new_basis:
+                if min(b_row) == pivot:
+                    collision = b_row
+                    break
+            if collision:
+                row = row.symmetric_difference(collision)
+            else:
+                new_basis.append(row)
+                new_basis.sort(key=lambda x: min(x))
+                break
+    for i in range(len(new_basis) - 1, -1, -1):
+        row = new_basis[i]
+        pivot = min(row)
+        for j in range(i):
+            if pivot in new_basis[j]:
+                new_basis[j] = new_basis[j].symmetric_difference(row)
+    solved = []
+    progress = True
+    while progress:
+        progress = False
+        solved_vars = set()
+        for eq in new_basis:
+            if len(eq) == 1:
+                solved_var = list(eq)[0]
+                if solved_var not in solved_vars:
+                    solved_vars.add(solved_var)
+                    solved.append(solved_var)
+                    progress = True
+        if solved_vars:
+            for eq in new_basis:
+                eq.difference_update(solved_vars)
+            new_basis = [eq for eq in new_basis if eq]
+    return new_basis, solved
+
+def rebuild_remove(basis, sim_id):
+    for eq in basis:
+        eq.discard(sim_id)
+    return [eq for eq in basis if eq]
+
+class TestGF2Decoder(unittest.TestCase):
+    def test_small(self):
+        dec = GF2Decoder()
+        self.assertEqual(dec.add([3, 5]), [])
+        self.assertEqual(dec.add([5, 7]), [])
+        self.assertEqual(dec.add([3, 7]), [])  # dependent
+        self.assertEqual(dec.equations(), [{3, 7}, {5, 7}])
+        self.assertEqual(dec.add([7]), [3, 5, 7])
+        self.assertEqual(len(dec), 0)
+
+    def test_remove_reports_on_next_add(self):
+        dec = GF2Decoder()
+        dec.add([2, 4])
+        dec.add([4, 9, 11])
+        dec.remove(2)
+        self.assertEqual(dec.equations(), [{4}, {9, 11}])
+        self.assertEqual(dec.add([11, 12]), [4])
+
+    def test_matches_rebuild(self):
+        rng = random.Random(1123)
+        for trial in range(60):
+            dec = GF2Decoder()
+            basis = []
+            lost = set()
+            for step in range(150):
+                lost.add(rng.randint(1, 80))
+                if rng.random() < 0.3 and lost:
+                    # retransmission arrived
+                    sim_id = rng.choice(sorted(lost))
+                    lost.discard(sim_id)
+                    basis = rebuild_remove(basis, sim_id)
+                    dec.remove(sim_id)
+                else:
+                    unknowns = set(rng.sample(sorted(lost), rng.randint(1, min(len(lost), 6))))
+                    basis, expected = rebuild_add(basis, unknowns)
+                    self.assertEqual(dec.add(unknowns), sorted(expected))
+                    for sim_id in expected:
+                        lost.discard(sim_id)
+                        basis = rebuild_remove(basis, sim_id)
+                        dec.remove(sim_id)
+                self.assertEqual(dec.equations(), basis)
+                # reverse index: id -> pivots of the rows holding it
+                cols = {}
+                for eq in basis:
+                    for i in eq:
+                        cols.setdefault(i, set()).add(min(eq))
+                self.assertEqual(dec.cols, cols)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add kfingerprinting to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../attacks/kfingerprinting'))
+import leaf_knn
+
+def naive_neighbors(train_leaf, test_leaf, K):
+    out = []
+    for leaf in test_leaf:
+        dists = np.sum(np.tile(leaf, (train_leaf.shape[0], 1)) != train_leaf, axis=1)
+        out.append(np.argsort(dists, kind='stable')[:K])
+    return np.array(out)
+
+class TestLeafKNN(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        # few distinct leaves per tree so there are plenty of distance ties
+        self.train = rng.randint(0, 4, size=(300, 50))
+        self.test = rng.randint(0, 4, size=(37, 50))
+        self.y = rng.randint(0, 10, size=300)
+
+    def test_matches_full_sort(self):
+        expected = naive_neighbors(self.train, self.test, 3)
+        np.testing.assert_array_equal(leaf_knn.hamming_topk(self.train, self.test, 3), expected)
+
+    def test_small_memory_cap(self):
+        self.assertEqual(leaf_knn.block_sizes(300, 50, mem_mb=0)[0], 1)
+        expected = naive_neighbors(self.train, self.test, 5)
+        np.testing.assert_array_equal(leaf_knn.hamming_topk(self.train, self.test, 5, mem_mb=0), expected)
+
+    def test_parallel_labels(self):
+        expected = self.y[naive_neighbors(self.train, self.test, 3)]
+        labels = leaf_knn.neighbor_labels(self.train, self.test, self.y, 3, n_jobs=2)
+        np.testing.assert_array_equal(labels, expected)
+
+    def test_k_larger_than_train(self):
+        expected = naive_neighbors(self.train[:4], self.test, 10)
+        np.testing.assert_array_equal(leaf_knn.hamming_topk(self.train[:4], self.test, 10), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Add kfingerprinting to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../attacks/kfingerprinting'))
+import leaf_knn
+import leaf_signature
+
+def hamming(a, b):
+    return np.sum(a[:, None, :] != b[None, :, :], axis=2)
+
+def pairwise(a, b):
+    out = np.empty((len(a), len(b)), dtype=np.int32)
+    return a.pairwise(b, out)
+
+class TestLeafSignature(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        # tree 0 has many leaves (uint16), the others few (uint8)
+        self.train = rng.randint(0, 4, size=(400, 30))
+        self.train[:, 0] = rng.permutation(1000)[:400]
+        self.test = rng.randint(0, 6, size=(40, 30))
+        self.test[:, 0] = rng.randint(0, 1000, size=40)
+
+    def test_exact_distances(self):
+        enc = leaf_signature.LeafEncoder()
+        train = enc.fit_transform(self.train)
+        test = enc.transform(self.test)
+        self.assertEqual([p.dtype for p in train.parts], [np.uint8, np.uint16])
+        self.assertLess(train.nbytes, self.train.nbytes // 4)
+        np.testing.assert_array_equal(pairwise(train, train), hamming(self.train, self.train))
+        # test rows contain leaves never seen in training
+        np.testing.assert_array_equal(pairwise(test, train), hamming(self.test, self.train))
+
+    def test_hashed_lower_bound(self):
+        exact = hamming(self.test, self.train)
+        for bits in leaf_signature.HASH_BITS:
+            enc = leaf_signature.LeafEncoder(bits)
+            d = pairwise(enc.transform(self.test), enc.transform(self.train))
+            self.assertTrue(np.all(d <= exact))
+            self.assertTrue(np.all(d[exact == 0] == 0))
+        # xor and lut counts, one uint8 each per packed column
+        sig = leaf_signature.LeafEncoder(2).transform(self.train)
+        self.assertEqual(sig.row_bytes, 2 * sig.parts[0].shape[1])
+        with self.assertRaises(ValueError):
+            leaf_signature.LeafEncoder(3)
+
+    def test_knn_on_signatures(self):
+        enc = leaf_signature.LeafEncoder()
+        train = enc.fit_transform(self.train)
+        test = enc.transform(self.test)
+        expected = leaf_knn.hamming_topk(self.train, self.test, 3)
+        np.testing.assert_array_equal(leaf_knn.hamming_topk(train, test, 3, mem_mb=0), expected)
+        np.testing.assert_array_equal(leaf_knn.neighbor_indices(train, test, 3, n_jobs=2), expected)
+
+    def test_forest_codebooks(self):
+        rng = np.random.RandomState(1)
+        X = rng.rand(120, 5)
+        y = rng.randint(0, 3, size=120)
+        model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+        enc = leaf_signature.LeafEncoder().fit_forest(model)
+        sig = leaf_signature.apply_encoded(model, X, enc, chunk=50)
+        leaf = model.apply(X)
+        np.testing.assert_array_equal(pairwise(sig[:30], sig), hamming(leaf[:30], leaf))
+
+if __name__ == '__main__':
+    unittest.main()
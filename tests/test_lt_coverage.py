@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+import random
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+from lt_coverage import LTCoverage, draw
+from fec_injector import FECInjector
+
+class TestLTCoverage(unittest.TestCase):
+    def test_permutation(self):
+        for n in [1, 2, 3, 7, 64, 100, 1000]:
+            cov = LTCoverage(12345, n, 1, n)
+            self.assertEqual(sorted(cov._permute(x) for x in range(n)), list(range(n)))
+            self.assertEqual([cov._unpermute(cov._permute(x)) for x in range(n)], list(range(n)))
+
+    def test_covered_ids(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            min_id = rng.randint(1, 500)
+            max_id = min_id + rng.randint(0, 300)
+            seed, degree = draw(rng, max_id - min_id + 1)
+            cov = LTCoverage(seed, degree, min_id, max_id)
+            ids = cov.ids()
+            self.assertEqual(len(ids), degree)
+            self.assertEqual(ids, [i for i in range(min_id - 5, max_id + 5) if i in cov])
+            lost = sorted(rng.sample(range(min_id, max_id + 1), rng.randint(0, max_id - min_id + 1)))
+            self.assertEqual(cov.select(lost), [i for i in lost if i in ids])
+
+    def test_injector_meta(self):
+        injector = FECInjector('C')
+        for i in range(1, 40):
+            injector.process_real_packet(i)
+        random.seed(3)
+        meta = injector.generate_dummy_content()
+        random.seed(3)
+        seed, degree = draw(random, 39)
+        self.assertEqual((meta['seed'], meta['degree'], meta['min_id'], meta['max_id']), (seed, degree, 1, 39))
+        self.assertEqual(len(LTCoverage.from_meta(meta).ids()), degree)
+
+if __name__ == '__main__':
+    unittest.main()
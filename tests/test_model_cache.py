@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+import model_cache
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fp = os.path.join(self.tmp, 'front.npy')
+        np.save(self.fp, {'feature': np.arange(12).reshape(4, 3), 'label': np.arange(4)})
+        self.cache = model_cache.ModelCache(os.path.join(self.tmp, 'models'), max_mb=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_key(self):
+        key = model_cache.cache_key('kfp', self.fp, [0, 1], {'C': 8})
+        self.assertEqual(key, model_cache.cache_key('kfp', self.fp, np.array([0, 1]), {'C': 8}))
+        self.assertNotEqual(key, model_cache.cache_key('kfp', self.fp, [0, 2], {'C': 8}))
+        self.assertNotEqual(key, model_cache.cache_key('kfp', self.fp, [0, 1], {'C': 2}))
+        self.assertNotEqual(key, model_cache.cache_key('cumul', self.fp, [0, 1], {'C': 8}))
+        np.save(self.fp, {'feature': np.zeros((4, 3)), 'label': np.arange(4)})
+        self.assertNotEqual(key, model_cache.cache_key('kfp', self.fp, [0, 1], {'C': 8}))
+
+    def test_fit_once(self):
+        calls = []
+        def build():
+            calls.append(1)
+            return {'weights': np.ones(3)}
+        key = model_cache.cache_key('kfp', self.fp)
+        first = self.cache.fit(key, build)
+        second = self.cache.fit(key, build)
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_array_equal(first['weights'], second['weights'])
+
+    def test_lru_eviction(self):
+        blob = np.zeros(2**17)  # 1 MB
+        self.cache.max_bytes = int(3.5 * blob.nbytes)
+        for i, key in enumerate(['a', 'b', 'c']):
+            self.cache.put(key, blob)
+            os.utime(self.cache.path(key), (i, i))
+        self.cache.get('a')  # a is now the most recently used
+        self.cache.put('d', blob)
+        self.assertIsNone(self.cache.get('b'))
+        for key in ['a', 'c', 'd']:
+            self.assertIsNotNone(self.cache.get(key))
+
+    def test_disabled(self):
+        cache = model_cache.ModelCache(os.path.join(self.tmp, 'off'), max_mb=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(os.path.exists(cache.root))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import random
+import tempfile
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+import pipeline
+
+sys.path.append(pipeline.KFP_DIR)
+import kfp_features
+
+
+def pad(fpath):
+    '''Toy defense: one +-888 dummy after every third packet.'''
+    packets = []
+    with open(fpath) as f:
+        for i, line in enumerate(f):
+            t, l = line.split('\t')
+            packets.append([float(t), int(l), {}])
+            if i % 3 == 2:
+                packets.append([float(t) + 0.00003, 888 if int(l) > 0 else -888, {'type': 'DUMMY'}])
+    return os.path.basename(fpath), packets
+
+
+def write_to(out_dir):
+    def write(packets, name):
+        with open(os.path.join(out_dir, name), 'w') as fo:
+            for t, l, _ in packets:
+                fo.write("{:.4f}\t{}\n".format(t, l))
+    return write
+
+
+class TestPipeline(unittest.TestCase):
+    def test_run(self):
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            flist = []
+            for name, n in [('0-0.cell', 120), ('0-1.cell', 30), ('7.cell', 90)]:
+                path = os.path.join(tmp, name)
+                t = 0.0
+                with open(path, 'w') as fo:
+                    for _ in range(n):
+                        t += rng.expovariate(30)
+                        fo.write("{}\t{}\n".format(t, rng.choice([1, -1])))
+                flist.append(path)
+            out_dir = os.path.join(tmp, 'out')
+            os.mkdir(out_dir)
+
+            overhead, _, features, timing = pipeline.run(
+                flist, pad, [pipeline.Overhead(), pipeline.Dump(write_to(out_dir)), pipeline.KfpFeatures(50), pipeline.Timing()], n_jobs=2)
+
+            self.assertEqual(overhead['real'], 240)
+            self.assertEqual(overhead['padding'], 80 / 240)
+            self.assertEqual(sorted(os.listdir(out_dir)), ['0-0.cell', '0-1.cell', '7.cell'])
+            # 0-1 has fewer than 50 packets; features equal those of the dumped files
+            self.assertEqual(features['label'], ((0, 0), (50, 7)))
+            for feature, name in zip(features['feature'], ['0-0.cell', '7.cell']):
+                with open(os.path.join(out_dir, name)) as f:
+                    self.assertEqual(feature, kfp_features.TOTAL_FEATURES(f.readlines()))
+            self.assertEqual(timing['traces'], 3)
+            self.assertEqual(sum(n for n, _ in timing['workers'].values()), 3)
+
+    def test_kfp_skips_bad_traces(self):
+        rng = random.Random(1)
+        with tempfile.TemporaryDirectory() as tmp:
+            flist = []
+            # one direction only (extraction fails) and a name that is not a label
+            for name, dirs in [('1-0.cell', [1]), ('x.cell', [1, -1]), ('2-0.cell', [1, -1])]:
+                path = os.path.join(tmp, name)
+                t = 0.0
+                with open(path, 'w') as fo:
+                    for _ in range(60):
+                        t += rng.expovariate(30)
+                        fo.write("{}\t{}\n".format(t, rng.choice(dirs)))
+                flist.append(path)
+            features, = pipeline.run(flist, pad, [pipeline.KfpFeatures(50)], n_jobs=2)
+            self.assertEqual(features['label'], ((2, 0),))
+
+    def test_chunks_by_size(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            flist = []
+            for i, size in enumerate([10, 500, 20, 20, 480, 30, 5]):
+                path = os.path.join(tmp, str(i))
+                with open(path, 'w') as fo:
+                    fo.write('x' * size)
+                flist.append(path)
+            chunks = pipeline.chunks_by_size(flist + [os.path.join(tmp, 'missing')], 2, per_job=1)
+            self.assertEqual(sum(chunks, []), flist + [os.path.join(tmp, 'missing')])
+            self.assertEqual([len(c) for c in chunks], [4, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import random
+
+import numpy as np
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+import seeding
+from fec_injector import FECInjector
+from lt_coverage import draw
+
+class TestSeeding(unittest.TestCase):
+    def test_trace_streams(self):
+        children = seeding.master(2024).spawn(6)
+        for index in [0, 5]:
+            expected = [np.random.default_rng(s).random(4).tolist() for s in children[index].spawn(3)]
+            got = [seeding.stream(seeding.master(2024), index, which).random(4).tolist()
+                   for which in (seeding.DEFENSE, seeding.TRANSPORT, seeding.BATCH)]
+            self.assertEqual(got, expected)
+        defense, transport = seeding.trace_rngs(seeding.master(2024), 5)
+        self.assertEqual(defense.random(4).tolist(), expected[seeding.DEFENSE])
+        self.assertEqual(transport.random(4).tolist(), expected[seeding.TRANSPORT])
+
+    def test_master_entropy(self):
+        m = seeding.master()
+        self.assertEqual(seeding.stream(seeding.master(m.entropy), 3, 0).random(),
+                         seeding.stream(m, 3, 0).random())
+
+    def test_injector_rng(self):
+        times = np.arange(200) * 0.01
+        lengths = np.where(np.arange(200) % 3, 1, -1)
+        is_dummy = np.arange(200) % 4 == 0
+        state = random.getstate()
+        tables = [FECInjector('C', rng=np.random.default_rng(1)).annotate(times, lengths, is_dummy) for _ in range(2)]
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(tables[0].seed.tolist(), tables[1].seed.tolist())
+        self.assertEqual(tables[0].degree.tolist(), tables[1].degree.tolist())
+        rng = np.random.default_rng(4)
+        for window in [1, 2, 32]:
+            seed, degree = draw(rng, window)
+            self.assertTrue(1 <= degree <= window and 0 <= seed < 2 ** 32)
+
+if __name__ == '__main__':
+    unittest.main()
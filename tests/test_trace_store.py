@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+import trace_store
+
+class TestTraceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.traces_path = os.path.join(self.tmp, 'tor')
+        os.makedirs(self.traces_path)
+        self.traces = {
+            '0-1.cell': [(0.0, 1, None), (0.5, -1, None), (0.75, 888, {'type': 'FEC', 'block_id': 0})],
+            '3.cell': [(1.25, -1, None), (2.0, -888, {'type': 'DUMMY'})],
+        }
+        for name, pkts in self.traces.items():
+            with open(os.path.join(self.traces_path, name), 'w') as f:
+                for ts, length, meta in pkts:
+                    line = "{:.4f}\t{}".format(ts, length)
+                    if meta:
+                        line += '\t' + json.dumps(meta)
+                    f.write(line + '\n')
+        os.utime(self.traces_path, (0, 0))
+        trace_store.pack(self.traces_path, n_jobs=1)
+        trace_store._stores.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_roundtrip(self):
+        store = trace_store.open_store(self.traces_path)
+        self.assertEqual(len(store), 2)
+        for name, pkts in self.traces.items():
+            times, lengths = store.get(name)
+            self.assertEqual(times.dtype, np.float64)
+            self.assertEqual(lengths.dtype, np.int32)
+            self.assertEqual(times.tolist(), [p[0] for p in pkts])
+            self.assertEqual(lengths.tolist(), [p[1] for p in pkts])
+            self.assertEqual(store.metadata(name), {i: p[2] for i, p in enumerate(pkts) if p[2]})
+
+    def test_labels(self):
+        store = trace_store.open_store(self.traces_path)
+        self.assertEqual(store.label('0-1.cell'), (0, 1))
+        self.assertEqual(store.label('3.cell'), (-1, 3))
+
+    def test_load_matches_text(self):
+        fpath = os.path.join(self.traces_path, '0-1.cell')
+        trace = trace_store.load_trace(fpath)
+        self.assertEqual(trace.shape, (3, 2))
+        self.assertEqual(trace[:, 1].tolist(), [1.0, -1.0, 888.0])
+        # Slices come straight from the memory map
+        times, _ = trace_store.load(fpath)
+        self.assertIsInstance(times.base, np.ndarray)
+
+    def test_stale(self):
+        self.assertIsNotNone(trace_store.open_store(self.traces_path))
+        # rewriting a trace in place leaves the directory mtime alone
+        fpath = os.path.join(self.traces_path, '3.cell')
+        with open(fpath, 'a') as f:
+            f.write("3.0000\t1\n")
+        os.utime(self.traces_path, (0, 0))
+        trace_store._stores.clear()
+        self.assertIsNone(trace_store.open_store(self.traces_path))
+        self.assertEqual(trace_store.load(fpath)[1].tolist(), [-1, -888, 1])
+
+if __name__ == '__main__':
+    unittest.main()
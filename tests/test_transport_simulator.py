@@ -0,0 +1,134 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+import csv
+import tempfile
+
+# Add utils to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../utils'))
+from transport_simulator import TransportSimulator, LostPackets, format_stats, loss_generator
+
+def simulate(trace, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        final = TransportSimulator(**kwargs).simulate(trace)
+    return final, out.getvalue()
+
+class TestLostPackets(unittest.TestCase):
+    def test_range(self):
+        lost = LostPackets()
+        for sim_id in [3, 7, 8, 15, 5]:
+            lost[sim_id] = {'sim_id': sim_id}
+        lost[7] = {'sim_id': 7}  # lost again while retransmitting
+        self.assertEqual(lost.ids, [3, 5, 7, 8, 15])
+        self.assertEqual(lost.in_range(4, 8), [5, 7, 8])
+        self.assertEqual(lost.in_range(16, 20), [])
+        del lost[7]
+        self.assertEqual(lost.in_range(1, 100), [3, 5, 8, 15])
+        self.assertNotIn(7, lost)
+        self.assertEqual((len(lost), lost[15]), (4, {'sim_id': 15}))
+        # no dict methods that would bypass ids
+        self.assertFalse(hasattr(lost, 'pop'))
+
+class TestTransportSimulator(unittest.TestCase):
+    def test_lossless(self):
+        trace = [[0.1 * i, 1 if i % 3 else -1, {}] for i in range(50)]
+        final, out = simulate(trace, loss_rate=0.0, rtt=0.2, max_inflight=100, seed=1)
+        self.assertEqual([p[0] for p in final], [p[0] + 0.1 for p in trace])
+        self.assertIn("Lost=0, Recovered=0, Retransmitted=0", out)
+
+    def test_lossless_fast_path(self):
+        # window-bound and unbound traces must match the event loop
+        trace = [[0.02 * (i // 2), 1 if i % 4 else -1, {} if i % 5 else {'type': 'DUMMY'}] for i in range(200)]
+        for inflight in [2, 8, 9, 1000]:
+            sim = TransportSimulator(loss_rate=0.0, rtt=0.1, max_inflight=inflight, seed=1)
+            with contextlib.redirect_stdout(io.StringIO()) as fast:
+                fast_trace = sim.simulate(trace)
+            sim._run_lossless = lambda *args: None
+            with contextlib.redirect_stdout(io.StringIO()) as slow:
+                slow_trace = sim.simulate(trace)
+            self.assertEqual(fast_trace, slow_trace)
+            self.assertEqual(fast.getvalue(), slow.getvalue())
+
+    def test_block_recovery(self):
+        # every real packet is followed by a repair symbol of its block
+        trace = []
+        for i in range(40):
+            trace.append([0.01 * i, 1, {}])
+            trace.append([0.01 * i + 0.001, 1, {'type': 'FEC', 'block_id': i // 10,
+                                                 'protected_count': i % 10 + 1}])
+        final, out = simulate(trace, loss_rate=0.2, rtt=0.1, max_inflight=1000, seed=3)
+        self.assertEqual(sum(1 for p in final if not p[2]), 40)
+        self.assertNotIn("Recovered=0,", out)
+
+    def test_simulate_many(self):
+        trace = []
+        for i in range(300):
+            trace.append([0.01 * i, 1 if i % 3 else -1, {}])
+            if i % 5 == 4:
+                trace.append([0.01 * i + 0.001, 1, {'type': 'FEC', 'start_id': max(1, i // 3 - 8), 'end_id': i // 3 + 1}])
+        rates, seeds = [0.0, 0.1, 0.6], [1, 12345, 2 ** 40 + 3]
+        with contextlib.redirect_stdout(io.StringIO()):
+            many = TransportSimulator(rtt=0.1, max_inflight=5).simulate_many(trace, rates, seeds)
+        self.assertEqual([(r['seed'], r['loss_rate']) for r in many], [(s, l) for s in seeds for l in rates])
+        for r in many:
+            _, out = simulate(trace, loss_rate=r['loss_rate'], rtt=0.1, max_inflight=5, seed=r['seed'])
+            self.assertEqual(format_stats(r), out.strip())
+
+    def test_rng(self):
+        import random
+        import numpy as np
+        trace = [[0.01 * i, 1 if i % 3 else -1, {}] for i in range(200)]
+        state = random.getstate()
+        _, out = simulate(trace, loss_rate=0.2, rtt=0.1, max_inflight=5, rng=np.random.default_rng(9))
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(simulate(trace, loss_rate=0.2, rtt=0.1, max_inflight=5, rng=np.random.default_rng(9))[1], out)
+        with contextlib.redirect_stdout(io.StringIO()):
+            many = TransportSimulator(rtt=0.1, max_inflight=5, rng=np.random.default_rng(9)).simulate_many(trace, [0.2])
+        self.assertEqual(format_stats(many[0]), out.strip())
+        # a lossless run draws nothing from the stream
+        rng = np.random.default_rng(9)
+        state = rng.bit_generator.state
+        simulate(trace, loss_rate=0.0, rtt=0.1, max_inflight=100, rng=rng)
+        self.assertEqual(rng.bit_generator.state, state)
+
+    def test_loss_generator(self):
+        import random
+        for seed in [0, 7, 2 ** 32 + 1, -3]:
+            random.seed(seed)
+            self.assertEqual(loss_generator(seed).random_sample(100).tolist(),
+                             [random.random() for _ in range(100)])
+
+    def _debug_run(self, level):
+        trace = [[0.01 * i, 1 if i % 2 else -1, {}] for i in range(60)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sim.debug.log')
+            simulate(trace, loss_rate=0.2, rtt=0.1, max_inflight=20, seed=5,
+                     debug_log_path=path, debug_level=level)
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                return f.read().splitlines()
+
+    def test_debug_off(self):
+        self.assertIsNone(self._debug_run('off'))
+
+    def test_debug_summary(self):
+        lines = self._debug_run('summary')
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Lost=", lines[1])
+        counts = dict(kv.split('=') for kv in lines[2].split(': ', 1)[1].split(', '))
+        self.assertEqual(int(counts['PACKET_SEND']), 60)
+        self.assertGreater(int(counts['LOST_REAL']), 0)
+
+    def test_debug_events(self):
+        lines = self._debug_run('events')
+        rows = list(csv.reader(lines[2:-2]))
+        self.assertEqual(lines[1], 'event,dir,ts,sim_id,type,info')
+        counts = dict(kv.split('=') for kv in lines[-1].split(': ', 1)[1].split(', '))
+        self.assertEqual(len(rows), sum(int(c) for c in counts.values()))
+        self.assertEqual(sum(1 for r in rows if r[0] == 'PACKET_SEND'), 60)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import random
+from bisect import insort_left
+
+# Load defenses/wtfpad/pparser.py with its own constants module
+WTFPAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../defenses/wtfpad')
+saved = sys.modules.pop('constants', None)
+sys.path.insert(0, WTFPAD_DIR)
+from pparser import Trace, Packet
+sys.path.remove(WTFPAD_DIR)
+sys.modules.pop('constants', None)
+if saved is not None:
+    sys.modules['constants'] = saved
+
+
+def next_by_direction(trace, i, direction):
+    for j in range(i + 1, len(trace)):
+        if trace[j].direction == direction:
+            return j
+    return -1
+
+
+class TestTrace(unittest.TestCase):
+    def test_next_by_direction(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            t = 0.0
+            packets = []
+            for _ in range(rng.randint(1, 80)):
+                t += rng.choice([0.0, rng.random()])
+                packets.append(Packet(t, rng.choice([1, -1]), 512))
+            trace = Trace(packets)
+            # the simulation's access pattern: both directions for every i,
+            # dummies inserted in timestamp order as it goes
+            i = 0
+            while i < len(trace):
+                for direction in (1, -1):
+                    self.assertEqual(trace.get_next_by_direction(i, direction), next_by_direction(trace, i, direction))
+                    if rng.random() < 0.3:
+                        insort_left(trace, Packet(trace[i].timestamp + rng.choice([0.0, rng.random()]), rng.choice([1, -1]), 512, dummy=True))
+                if rng.random() < 0.05:
+                    trace.append(Packet(trace[-1].timestamp + 1, rng.choice([1, -1]), 512))
+                # occasionally go back
+                i = max(0, i - 3) if rng.random() < 0.05 else i + 1
+            for i in range(len(trace)):
+                self.assertEqual(trace.get_next_by_direction(i, 1), next_by_direction(trace, i, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,113 @@
 import random
 import json
 import logging
+from collections import deque
+
+import numpy as np
+
+import lt_coverage
+
+class IdHistory:
+    """
+    The last `size` packet ids pushed, with O(1) push and amortized O(1) min/max.
+    Besides the window itself it keeps the ids that can still become the minimum
+    (increasing) and the maximum (decreasing) of a later window; for the usual
+    increasing ids these are just the oldest and the newest id.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.ids = deque()
+        self._mins = deque()
+        self._maxs = deque()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def push(self, packet_id):
+        self.ids.append(packet_id)
+        while self._mins and self._mins[-1] > packet_id:
+            self._mins.pop()
+        self._mins.append(packet_id)
+        while self._maxs and self._maxs[-1] < packet_id:
+            self._maxs.pop()
+        self._maxs.append(packet_id)
+        if len(self.ids) > self.size:
+            old = self.ids.popleft()
+            if self._mins[0] == old:
+                self._mins.popleft()
+            if self._maxs[0] == old:
+                self._maxs.popleft()
+
+    def min(self):
+        return self._mins[0]
+
+    def max(self):
+        return self._maxs[0]
+
+
+# packet kinds and info strings of an FECTable
+REAL, DUMMY, FEC = 0, 1, 2
+INFOS = ['', 'Previous Block Repair', 'Empty Block', 'Empty Buffer', 'No Data Yet', 'Unknown Strategy']
+
+
+class FECTable:
+    """
+    Metadata of a whole trace as columns (see FECInjector.annotate). Row i holds
+    kind (REAL/DUMMY/FEC), an index into INFOS, and the strategy fields: a/b are
+    block_id/protected_count (B), min_id/max_id (C) or start_id/end_id (D);
+    C also fills buffer_size, seed and degree.
+    """
+    FIELDS = {'B': ('block_id', 'protected_count'), 'C': ('min_id', 'max_id'), 'D': ('start_id', 'end_id')}
+
+    def __init__(self, strategy, times, lengths, n):
+        self.strategy = strategy
+        self.times = times
+        self.lengths = lengths
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.info = np.zeros(n, dtype=np.int8)
+        self.a = np.zeros(n, dtype=np.int64)
+        self.b = np.zeros(n, dtype=np.int64)
+        self.buffer_size = np.zeros(n, dtype=np.int64)
+        self.seed = np.zeros(n, dtype=np.int64)
+        self.degree = np.zeros(n, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def metadata(self, i):
+        """The dict generate_dummy_content() returns for row i ({} for real packets)."""
+        kind = self.kind[i]
+        if kind == REAL:
+            return {}
+        meta = {"type": "FEC" if kind == FEC else "DUMMY", "strategy": self.strategy}
+        if kind == FEC:
+            fa, fb = self.FIELDS[self.strategy]
+            if self.strategy == 'C':
+                meta["seed"] = int(self.seed[i])
+                meta["degree"] = int(self.degree[i])
+            meta[fa] = int(self.a[i])
+            meta[fb] = int(self.b[i])
+            if self.strategy == 'C':
+                meta["buffer_size"] = int(self.buffer_size[i])
+        if self.info[i]:
+            meta["info"] = INFOS[self.info[i]]
+        return meta
+
+    def packets(self):
+        """[time, length, metadata] of every packet, as TransportSimulator takes them."""
+        return [[t, l, self.metadata(i)] for i, (t, l) in enumerate(zip(self.times, self.lengths))]
+
 
 class FECInjector:
-    def __init__(self, strategy, window_size=32, block_size=10):
+    def __init__(self, strategy, window_size=32, block_size=10, rng=None):
         self.strategy = strategy
+        # random draws of Strategy C: the random module unless a per-trace
+        # random.Random or numpy Generator is given
+        self.rng = random if rng is None else rng
         self.window_size = window_size
         self.block_size = block_size
         
@@ -17,7 +120,7 @@ class FECInjector:
         # Strategy C: LT-like Random Subset
         if self.strategy == 'C':
             self.window_size = 10000 # Large window for "Global Scope"
-        self.history_buffer = [] # Stores packet IDs
+        self.history_buffer = IdHistory(self.window_size) # Stores packet IDs
         
         # Strategy D: Smart Sliding Window RLNC
         self.head_id = -1
@@ -40,9 +143,7 @@ class FECInjector:
                 self.packets_in_current_block = 0
                 
         elif self.strategy == 'C':
-            self.history_buffer.append(packet_id)
-            if len(self.history_buffer) > self.window_size:
-                self.history_buffer.pop(0)
+            self.history_buffer.push(packet_id)
                 
         elif self.strategy == 'D':
             self.head_id = packet_id
@@ -53,6 +154,70 @@ class FECInjector:
             # We assume packet_id starts at 1.
             self.first_missing_id = max(1, self.head_id - self.window_size + 1)
 
+    def annotate(self, times, lengths, is_dummy):
+        """
+        Metadata of a whole trace at once, as an FECTable. The packets are taken in
+        the given order, with one fresh injector of this strategy per direction
+        (length > 0 or not), real packet ids counting from 1 in each direction, and
+        generate_dummy_content() called for every dummy: the rows agree with that
+        streaming use, including the random draws of Strategy C, made in the same order.
+        """
+        lengths = np.asarray(lengths)
+        is_dummy = np.asarray(is_dummy, dtype=bool)
+        table = FECTable(self.strategy, times, lengths.tolist(), len(lengths))
+        table.kind[is_dummy] = DUMMY
+        out = lengths > 0
+        real = ~is_dummy
+        # real packets of the packet's direction up to it: the id of the last one
+        count = np.where(out, np.cumsum(real & out), np.cumsum(real & ~out))
+        count = count[is_dummy]
+        kind = np.full(len(count), DUMMY, dtype=np.int8)
+        info = np.zeros(len(count), dtype=np.int8)
+        a = np.zeros(len(count), dtype=np.int64)
+        b = np.zeros(len(count), dtype=np.int64)
+
+        if self.strategy == 'A':
+            pass
+
+        elif self.strategy == 'B':
+            block, filled = np.divmod(count, self.block_size)
+            current = filled > 0
+            previous = ~current & (block > 0)
+            kind[current | previous] = FEC
+            a[current], b[current] = block[current], filled[current]
+            a[previous], b[previous] = block[previous] - 1, self.block_size
+            info[previous] = INFOS.index('Previous Block Repair')
+            info[~current & ~previous] = INFOS.index('Empty Block')
+
+        elif self.strategy == 'C':
+            fec = count > 0
+            kind[fec] = FEC
+            a[fec] = np.maximum(1, count[fec] - self.window_size + 1)
+            b[fec] = count[fec]
+            size = np.minimum(count, self.window_size)
+            info[~fec] = INFOS.index('Empty Buffer')
+            rows = np.flatnonzero(is_dummy)
+            table.buffer_size[rows] = size
+            for i, window in zip(rows[fec].tolist(), size[fec].tolist()):
+                table.seed[i], table.degree[i] = lt_coverage.draw(self.rng, window)
+
+        elif self.strategy == 'D':
+            fec = count > 0
+            kind[fec] = FEC
+            a[fec] = np.maximum(1, count[fec] - self.window_size + 1)
+            b[fec] = count[fec]
+            info[~fec] = INFOS.index('No Data Yet')
+
+        else:
+            self.logger.warning(f"Unknown strategy: {self.strategy}")
+            info[:] = INFOS.index('Unknown Strategy')
+
+        table.kind[is_dummy] = kind
+        table.info[is_dummy] = info
+        table.a[is_dummy] = a
+        table.b[is_dummy] = b
+        return table
+
     def generate_dummy_content(self):
         """
         Returns a dictionary containing FEC metadata for a dummy packet.
@@ -95,16 +260,16 @@ class FECInjector:
                 return metadata
             
             # Seed-based Random Selection (LT-like)
-            degree = random.randint(1, len(self.history_buffer))
-            seed = random.randint(0, 2**32 - 1)
+            seed, degree = lt_coverage.draw(self.rng, len(self.history_buffer))
             
             # We don't send the full list of IDs, just the seed and range info.
             # Ideally, the receiver needs to know WHICH packets are in the history buffer.
             # To simplify, we assume the history buffer is a contiguous range of IDs [min_id, max_id].
             # This is a reasonable approximation if we assume the buffer stores the last N packets.
+            # The receiver rebuilds the covered ids with lt_coverage.LTCoverage.
             
-            min_id = min(self.history_buffer)
-            max_id = max(self.history_buffer)
+            min_id = self.history_buffer.min()
+            max_id = self.history_buffer.max()
             
             metadata["seed"] = seed
             metadata["degree"] = degree
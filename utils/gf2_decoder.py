@@ -0,0 +1,103 @@
+#incremental GF(2) decoder for the FEC equations of TransportSimulator#
+# An equation is the set of lost sim_ids XOR-ed into one FEC packet, stored as
+# a Python int bitset (bit i <-> sim_id i). The rows are kept in reduced row
+# echelon form, indexed by pivot (the lowest id of a row): every pivot occurs
+# in its own row only. A new equation then costs one reduction against the
+# pivots it contains plus one elimination of its own pivot, instead of
+# re-sorting and re-reducing the whole basis.
+# A reverse index (id -> pivots of the rows holding it) lets an id that becomes
+# known touch only the rows that contain it, and only rows changed since the
+# last add() are checked for single ids.
+# The reduced echelon form of a set of equations is unique, so the rows, and
+# hence which ids are solved and when, are the same as when the basis is
+# rebuilt from scratch on every FEC arrival.
+
+
+def _bits(row):
+    '''Set bits of row, lowest first.'''
+    while row:
+        low = row & -row
+        yield low.bit_length() - 1
+        row ^= low
+
+
+def _pivot(row):
+    return (row & -row).bit_length() - 1
+
+
+class GF2Decoder(object):
+
+    def __init__(self):
+        self.rows = {}
+        self.cols = {}
+        self._touched = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def equations(self):
+        '''The rows as sets of ids, in pivot order.'''
+        return [set(_bits(self.rows[p])) for p in sorted(self.rows)]
+
+    def _set(self, pivot, row):
+        '''Store row (non-zero, lowest id = pivot) and update the reverse index.'''
+        old = self.rows.get(pivot, 0)
+        for i in _bits(old ^ row):
+            if row >> i & 1:
+                self.cols.setdefault(i, set()).add(pivot)
+            else:
+                self._uncol(i, pivot)
+        self.rows[pivot] = row
+        self._touched.add(pivot)
+
+    def _uncol(self, i, pivot):
+        col = self.cols[i]
+        col.discard(pivot)
+        if not col:
+            del self.cols[i]
+
+    def _drop(self, pivot):
+        for i in _bits(self.rows.pop(pivot)):
+            self._uncol(i, pivot)
+        self._touched.discard(pivot)
+
+    def _insert(self, row):
+        '''Insert a non-zero row that contains no pivot and restore the reduced form.'''
+        pivot = _pivot(row)
+        # XOR-ing row into a row holding its pivot keeps that row's own (lower) pivot
+        for p in list(self.cols.get(pivot, ())):
+            self._set(p, self.rows[p] ^ row)
+        self._set(pivot, row)
+
+    def add(self, ids):
+        '''Add the equation XOR(ids) = known. Returns the ids that are solved
+        now (rows with a single id), in increasing order, and drops their rows.'''
+        row = 0
+        for i in ids:
+            row |= 1 << i
+        # every pivot in the new row is cancelled by its own row, which holds no other pivot
+        for p in [p for p in _bits(row) if p in self.rows]:
+            row ^= self.rows[p]
+        if row:
+            self._insert(row)
+        # rows not changed since the last add() hold more than one id
+        solved = sorted(p for p in self._touched if self.rows[p] & (self.rows[p] - 1) == 0)
+        self._touched.clear()
+        for p in solved:
+            self._drop(p)
+        return solved
+
+    def remove(self, sim_id):
+        '''sim_id became known (retransmitted or recovered): drop it from every row.
+        Rows left with a single id are only reported by the next add(), as before.'''
+        if sim_id not in self.cols:
+            return
+        bit = 1 << sim_id
+        row = self.rows.get(sim_id)
+        if row is not None:
+            self._drop(sim_id)
+        for p in list(self.cols.get(sim_id, ())):
+            self._set(p, self.rows[p] ^ bit)
+        if row is not None and row != bit:
+            # the row lost its pivot; its next id becomes a pivot
+            self._insert(row ^ bit)
@@ -0,0 +1,95 @@
+#coverage sets of Strategy C (LT-like) FEC packets#
+# A Strategy C repair symbol covers `degree` ids of the contiguous window
+# [min_id, max_id], chosen by its seed. Both ends derive the set from
+# (seed, degree, min_id, max_id): FECInjector draws seed and degree, and
+# TransportSimulator rebuilds the set when the packet arrives.
+# The set is the ids whose position in a seeded pseudo-random permutation of
+# the window is below degree. The permutation is a 4-round Feistel network on
+# the smallest even bit width covering the window, cycle-walked back into it,
+# so one id is tested in O(1) and the covered ids are listed in O(degree):
+# a decoder only touches the ids it actually needs, never the whole window.
+
+import numpy as np
+
+ROUNDS = 4
+MASK64 = (1 << 64) - 1
+
+
+def _mix(z):
+    '''splitmix64 finalizer.'''
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def draw(rng, window):
+    '''(seed, degree) of a new symbol over a window of `window` ids, drawn from rng:
+    the random module, a random.Random or a numpy Generator.'''
+    if isinstance(rng, np.random.Generator):
+        degree = int(rng.integers(1, window, endpoint=True))
+        seed = int(rng.integers(0, 2**32 - 1, endpoint=True))
+        return seed, degree
+    degree = rng.randint(1, window)
+    seed = rng.randint(0, 2**32 - 1)
+    return seed, degree
+
+
+class LTCoverage(object):
+
+    def __init__(self, seed, degree, min_id, max_id):
+        self.seed = seed
+        self.min_id = min_id
+        self.max_id = max_id
+        self.n = max(0, max_id - min_id + 1)
+        self.degree = min(degree, self.n)
+        half = max(1, ((self.n - 1).bit_length() + 1) // 2)
+        self._half = half
+        self._mask = (1 << half) - 1
+        self._keys = [_mix((seed << 8) | r) for r in range(ROUNDS)]
+
+    @classmethod
+    def from_meta(cls, meta):
+        return cls(meta['seed'], meta['degree'], meta['min_id'], meta['max_id'])
+
+    def _round(self, r, x):
+        return _mix(self._keys[r] ^ x) & self._mask
+
+    def _permute(self, x):
+        half, mask = self._half, self._mask
+        while True:
+            left, right = x >> half, x & mask
+            for r in range(ROUNDS):
+                left, right = right, left ^ self._round(r, right)
+            x = (left << half) | right
+            if x < self.n:
+                return x
+
+    def _unpermute(self, x):
+        half, mask = self._half, self._mask
+        while True:
+            left, right = x >> half, x & mask
+            for r in reversed(range(ROUNDS)):
+                left, right = right ^ self._round(r, left), left
+            x = (left << half) | right
+            if x < self.n:
+                return x
+
+    def __len__(self):
+        return self.degree
+
+    def __contains__(self, sim_id):
+        offset = sim_id - self.min_id
+        return 0 <= offset < self.n and self._permute(offset) < self.degree
+
+    def ids(self):
+        '''The covered ids, increasing.'''
+        return sorted(self.min_id + self._unpermute(j) for j in range(self.degree))
+
+    def select(self, ids):
+        '''The covered ones of ids (e.g. the lost ids of the window), at the cost
+        of min(len(ids), degree) tests.'''
+        if len(ids) <= self.degree:
+            return [i for i in ids if i in self]
+        wanted = set(ids)
+        return [i for i in self.ids() if i in wanted]
@@ -0,0 +1,166 @@
+#content-addressed cache of fitted models#
+# A model is stored under the sha1 of (kind, feature file content, training
+# row indices, hyperparameters), so the same defended dataset evaluated again
+# with the same folds and settings loads its models instead of refitting them.
+# Entries are joblib files in CACHE_DIR; once the directory grows over the size
+# limit, least recently used entries are evicted (every hit refreshes mtime).
+#   WF_MODEL_CACHE     cache directory (default: <repo>/cache/models)
+#   WF_MODEL_CACHE_MB  size limit in MB, 0 disables the cache (default: 4096)
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger('model_cache')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('WF_MODEL_CACHE', os.path.join(BASE_DIR, 'cache', 'models'))
+MAX_MB = float(os.environ.get('WF_MODEL_CACHE_MB', 4096))
+SUFFIX = '.pkl'
+
+_digests = {}
+
+
+def file_digest(fpath):
+    '''sha1 of a file's content, remembered per (path, size, mtime).'''
+    st = os.stat(fpath)
+    memo = (os.path.abspath(fpath), st.st_size, st.st_mtime_ns)
+    if memo not in _digests:
+        h = hashlib.sha1()
+        with open(fpath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        _digests[memo] = h.hexdigest()
+    return _digests[memo]
+
+
+def cache_key(kind, feature_path, index=None, params=None):
+    '''Key of a model fitted on rows `index` (all rows if None) of `feature_path`.'''
+    h = hashlib.sha1()
+    h.update(json.dumps([kind, file_digest(feature_path), params], sort_keys=True, default=repr).encode('utf-8'))
+    if index is not None:
+        h.update(np.ascontiguousarray(index, dtype=np.int64).tobytes())
+    return '{}-{}'.format(kind, h.hexdigest())
+
+
+class ModelCache(object):
+
+    def __init__(self, root=CACHE_DIR, max_mb=MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 2**20)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, key):
+        return os.path.join(self.root, key + SUFFIX)
+
+    def get(self, key):
+        '''The cached object, or None.'''
+        path = self.path(key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        try:
+            obj = joblib.load(path)
+        except Exception as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", path, e)
+            os.remove(path)
+            return None
+        os.utime(path)
+        return obj
+
+    def put(self, key, obj):
+        if not self.enabled:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        # write to a temporary file first so a reader never sees half a model
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(obj, tmp)
+            os.replace(tmp, self.path(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def fit(self, key, build):
+        '''Cached object for key, else build(), cached and returned.'''
+        obj = self.get(key)
+        if obj is not None:
+            logger.info("Loaded %s from the model cache", key)
+            return obj
+        obj = build()
+        self.put(key, obj)
+        return obj
+
+    def entries(self):
+        '''[(mtime, size, path)] of all entries, least recently used first.'''
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            if name.endswith(SUFFIX):
+                st = os.stat(os.path.join(self.root, name))
+                out.append((st.st_mtime, st.st_size, os.path.join(self.root, name)))
+        return sorted(out)
+
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logger.info("Evicted %s from the model cache", path)
+
+
+_default = None
+
+
+def default_cache():
+    global _default
+    if _default is None:
+        _default = ModelCache()
+    return _default
+
+
+def cached_fit(kind, feature_path, build, index=None, params=None):
+    '''build() through the default cache, keyed by cache_key(kind, feature_path, index, params).'''
+    return default_cache().fit(cache_key(kind, feature_path, index, params), build)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Inspect or shrink the fitted-model cache.')
+
+    parser.add_argument('-max_mb',
+                        type=float,
+                        default=None,
+                        help='Evict least recently used models until the cache is at most this size.')
+    parser.add_argument('-clear',
+                        action='store_true',
+                        help='Remove every cached model.')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    args = parse_arguments()
+    cache = default_cache()
+    if args.clear:
+        cache.evict(0)
+    elif args.max_mb is not None:
+        cache.evict(int(args.max_mb * 2**20))
+    entries = cache.entries()
+    print("{} models, {:.1f} MB in {}".format(len(entries), sum(e[1] for e in entries) / 2**20, cache.root))
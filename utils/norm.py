@@ -1,11 +1,11 @@
 #normalize trace pkd direction to be -1 and 1#
-import pandas as pd 
 import argparse
 import logging
 import os
 import numpy as np
 import multiprocessing as mp
 import glob 
+import trace_store
 logger = logging.getLogger('norm')
 
 def config_logger(args):
@@ -40,10 +40,7 @@ def parse_arguments():
     return args
 
 def load_trace(fdir):
-    with open(fdir,'r') as f:
-        tmp = f.readlines()
-    t = pd.Series(tmp).str.slice(0,-1).str.split('\t',expand = True).astype('float')
-    return np.array(t)
+    return trace_store.load_trace(fdir)
 
 def dump(trace, fdir):
     with open(fdir, 'w') as fo:
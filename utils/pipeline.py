@@ -0,0 +1,232 @@
+#in-process defense -> attack pipeline#
+# run() maps a defense function over trace files in a process pool and hands
+# every defended trace, as arrays, to a list of consumers inside the worker.
+# Only the consumers' small per-trace results go back to the parent, which
+# folds them in file order:
+#   KfpFeatures  k-FP features and labels, in the format of kfingerprinting/extract.py
+#   Overhead     dummy packet ratios, as utils/overhead.py computes them
+#   Dump         writes the defended trace files, now optional
+#   Timing       seconds each worker spent per trace
+# A FRONT -> k-FP evaluation thus runs in one process tree and never writes
+# and re-parses tens of thousands of text files.
+# A defense function takes a file path and returns (name, packets) with packets
+# a list of [time, length(, metadata)], or None to skip the file; with indexed=True
+# it takes (index of the file in flist, path), e.g. to pick the trace's random
+# streams (utils/seeding.py). With batch=n it takes (index of the first file,
+# n file paths) instead and returns a list of such results.
+# The pool has one worker per available CPU unless n_jobs is given, and files
+# are sent in contiguous tasks of about equal total size.
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+KFP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'attacks', 'kfingerprinting')
+
+
+class DefendedTrace(object):
+    __slots__ = ('name', 'times', 'lengths', 'packets', 'elapsed')
+
+    def __init__(self, name, packets, elapsed=0.0):
+        self.name = name
+        self.packets = packets
+        self.elapsed = elapsed
+        self.times = np.array([p[0] for p in packets], dtype=np.float64)
+        self.lengths = np.array([int(p[1]) for p in packets], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.packets)
+
+
+class Consumer(object):
+    '''map() runs in the worker on every DefendedTrace; reduce() gets its value
+    in the parent, in file order; result() is returned by run().'''
+
+    def map(self, trace):
+        return None
+
+    def reduce(self, name, value):
+        pass
+
+    def result(self):
+        return None
+
+
+class Dump(Consumer):
+    '''Writes each trace with the defense's own writer: write(packets, name).'''
+
+    def __init__(self, write):
+        self.write = write
+
+    def map(self, trace):
+        self.write(trace.packets, trace.name)
+
+
+class Overhead(Consumer):
+    '''Packet counts of the +-888 (padding) and +-999 (merge) noise against the real packets.'''
+
+    def __init__(self):
+        self.counts = np.zeros(3, dtype=np.int64)
+        self.n = 0
+
+    def map(self, trace):
+        size = np.abs(trace.lengths)
+        rpov, mpov = int(np.sum(size == 888)), int(np.sum(size == 999))
+        return rpov, mpov, len(size) - rpov - mpov
+
+    def reduce(self, name, value):
+        self.counts += value
+        self.n += 1
+
+    def result(self):
+        rpov, mpov, total = self.counts.tolist()
+        return {'traces': self.n, 'real': total,
+                'padding': rpov / total if total else 0.0,
+                'merge': mpov / total if total else 0.0}
+
+
+class Timing(Consumer):
+    '''Seconds spent defending each trace (in batch mode, its share of the batch), per worker.'''
+
+    def __init__(self):
+        self.workers = {}
+
+    def map(self, trace):
+        return os.getpid(), trace.elapsed
+
+    def reduce(self, name, value):
+        pid, elapsed = value
+        self.workers.setdefault(pid, []).append(elapsed)
+
+    def result(self):
+        '''{'traces', 'mean', 'max', 'workers': {pid: (traces, mean)}}'''
+        times = [t for ts in self.workers.values() for t in ts]
+        if not times:
+            return {'traces': 0, 'mean': 0.0, 'max': 0.0, 'workers': {}}
+        return {'traces': len(times), 'mean': sum(times) / len(times), 'max': max(times),
+                'workers': {pid: (len(ts), sum(ts) / len(ts)) for pid, ts in self.workers.items()}}
+
+
+class KfpFeatures(Consumer):
+    '''k-FP features of each trace and its label, as extract.py produces them from
+    the dumped files: times are taken at the 4 decimals the dumps keep, traces of
+    fewer than min_packets packets or failing extraction are dropped, and open-world "Z" is labelled
+    (mon_site_num, Z).'''
+
+    def __init__(self, mon_site_num, min_packets=50):
+        self.mon_site_num = mon_site_num
+        self.min_packets = min_packets
+        self.features = []
+        self.labels = []
+
+    def map(self, trace):
+        if KFP_DIR not in sys.path:
+            sys.path.append(KFP_DIR)
+        import kfp_features
+        if len(trace) < self.min_packets:
+            return None
+        # extract.py drops any trace it cannot label or featurize
+        try:
+            name = trace.name.split('.')[0]
+            if '-' in name:
+                site, inst = name.split('-')[:2]
+                label = (int(site), int(inst))
+            else:
+                label = (self.mon_site_num, int(name))
+            times = np.array(["{:.4f}".format(t) for t in trace.times.tolist()], dtype=np.float64)
+            return kfp_features.total_features(*kfp_features.from_arrays(times, trace.lengths)), label
+        except Exception:
+            return None
+
+    def reduce(self, name, value):
+        if value is not None:
+            self.features.append(value[0])
+            self.labels.append(value[1])
+
+    def result(self):
+        '''{'feature', 'label'}, the dict extract.py saves with np.save.'''
+        return {'feature': tuple(self.features), 'label': tuple(self.labels)}
+
+
+_defend = None
+_consumers = None
+_indexed = False
+
+
+def _init(defend, consumers, indexed, initializer, initargs):
+    global _defend, _consumers, _indexed
+    _defend, _consumers, _indexed = defend, consumers, indexed
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def cpu_count():
+    '''CPUs this process may run on.'''
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def chunks_by_size(flist, n_jobs, per_job=8):
+    '''flist cut, in order, into about n_jobs * per_job tasks of similar total file size.'''
+    sizes = [os.path.getsize(f) if os.path.exists(f) else 0 for f in flist]
+    target = sum(sizes) / float(n_jobs * per_job)
+    chunks, chunk, acc = [], [], 0
+    for fpath, size in zip(flist, sizes):
+        chunk.append(fpath)
+        acc += size
+        if acc >= target:
+            chunks.append(chunk)
+            chunk, acc = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _consume(res, elapsed):
+    trace = DefendedTrace(res[0], res[1], elapsed)
+    return trace.name, [c.map(trace) for c in _consumers]
+
+
+def _work(chunk):
+    out = []
+    for index, fpath in chunk:
+        start = time.time()
+        res = _defend(index, fpath) if _indexed else _defend(fpath)
+        if res is not None:
+            out.append(_consume(res, time.time() - start))
+    return out
+
+
+def _work_batch(chunk):
+    start = time.time()
+    results = [res for res in _defend(chunk) if res is not None]
+    elapsed = (time.time() - start) / max(1, len(results))
+    return [_consume(res, elapsed) for res in results]
+
+
+def run(flist, defend, consumers, n_jobs=None, initializer=None, initargs=(), batch=0, indexed=False):
+    '''Defend every file of flist and feed the traces to consumers; returns their results.
+    n_jobs defaults to cpu_count(). initializer(*initargs) runs first in every
+    worker, as for multiprocessing.Pool. With indexed=True defend gets
+    (index, path), with batch > 0 (index of the first file, paths) of batch files.'''
+    n_jobs = n_jobs or cpu_count()
+    pool = mp.Pool(n_jobs, initializer=_init, initargs=(defend, consumers, indexed, initializer, initargs))
+    try:
+        if batch > 0:
+            chunks = [(start, flist[start:start + batch]) for start in range(0, len(flist), batch)]
+            results = pool.imap(_work_batch, chunks)
+        else:
+            # the chunks are contiguous: number the files as they come
+            numbered = iter(enumerate(flist))
+            chunks = [[next(numbered) for _ in chunk] for chunk in chunks_by_size(flist, n_jobs)]
+            results = pool.imap(_work, chunks)
+        for name, values in (res for out in results for res in out):
+            for consumer, value in zip(consumers, values):
+                consumer.reduce(name, value)
+    finally:
+        pool.close()
+        pool.join()
+    return [consumer.result() for consumer in consumers]
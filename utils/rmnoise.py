@@ -1,5 +1,4 @@
 #get no noise l-trace from noisy l-trace
-import pandas as pd 
 import argparse
 import logging
 import os
@@ -8,6 +7,7 @@ import multiprocessing as mp
 import subprocess
 import glob
 import sys
+import trace_store
 
 logger = logging.getLogger('norm')
 
@@ -31,10 +31,7 @@ def parse_arguments():
     return args
 
 def load_trace(fdir):
-    with open(fdir,'r') as f:
-        tmp = f.readlines()
-    t = pd.Series(tmp).str.slice(0,-1).str.split('\t',expand = True).astype('float')
-    return np.array(t)
+    return trace_store.load_trace(fdir)
 
 def dump(trace, fdir):
     with open(fdir, 'w') as fo:
@@ -0,0 +1,41 @@
+#per-trace random streams#
+# A run has one master numpy SeedSequence, from --seed or fresh OS entropy.
+# Trace i of the run gets the child the master would give as its i-th spawn,
+# split again into one stream for the defense and one for the transport
+# simulator. The streams only depend on (master entropy, trace index, stream),
+# never on the pool size, the chunking or which worker runs the trace, so runs
+# can be cached, sharded across machines and merged.
+import random
+
+import numpy as np
+
+# streams of a trace; BATCH is the padding stream of a batch that starts at the trace
+DEFENSE, TRANSPORT, BATCH = 0, 1, 2
+
+
+def master(seed=None):
+    '''Master SeedSequence of a run; its entropy reproduces a run made without a seed.'''
+    return np.random.SeedSequence(seed)
+
+
+def trace_sequence(master_seq, index):
+    '''master_seq.spawn(index + 1)[index], without spawning the others.'''
+    return np.random.SeedSequence(master_seq.entropy, spawn_key=tuple(master_seq.spawn_key) + (index,),
+                                  pool_size=master_seq.pool_size)
+
+
+def stream(master_seq, index, which):
+    '''numpy Generator of stream `which` of trace `index`: trace_sequence(...).spawn(3)[which].'''
+    seq = trace_sequence(master_seq, index)
+    return np.random.default_rng(np.random.SeedSequence(seq.entropy, spawn_key=seq.spawn_key + (which,),
+                                                        pool_size=seq.pool_size))
+
+
+def trace_rngs(master_seq, index):
+    '''(defense, transport) numpy Generators of trace `index`.'''
+    return stream(master_seq, index, DEFENSE), stream(master_seq, index, TRANSPORT)
+
+
+def py_random(rng):
+    '''random.Random seeded from a numpy Generator, for code written against the random module.'''
+    return random.Random(int(rng.integers(0, 2**63)))
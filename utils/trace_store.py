@@ -0,0 +1,308 @@
+#pack a whole trace directory into one memory-mapped columnar file#
+# Layout of a store file:
+#   MAGIC | uint64 header length | json header | aligned sections
+# Sections (all 8-byte aligned, native little-endian):
+#   times        float64[n_packets]   timestamps of every packet, trace after trace
+#   lengths      int32[n_packets]     signed lengths (direction * size, or +-888/+-999 noise)
+#   offsets      int64[n_traces + 1]  trace i is packets offsets[i]:offsets[i+1]
+#   sites, insts int32[n_traces]      "X-Y" -> (X, Y); open-world "Z" -> (-1, Z)
+#   meta_index   int64[n_meta]        global packet position carrying a FEC metadata column
+#   meta_offsets int64[n_meta + 1]    byte ranges of each json record inside meta_blob
+#   meta_blob    uint8[...]           concatenated json metadata
+# A store for "data/tor/" lives next to it as "data/tor.wfts", so globbing the
+# dataset directory never picks it up. The header keeps the size and mtime of
+# every packed file, a store is only used while they all still match.
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger('trace_store')
+
+MAGIC = b'WFTRACE1'
+STORE_SUFFIX = '.wfts'
+ALIGN = 8
+
+SECTIONS = [
+    ('times', np.float64),
+    ('lengths', np.int32),
+    ('offsets', np.int64),
+    ('sites', np.int32),
+    ('insts', np.int32),
+    ('meta_index', np.int64),
+    ('meta_offsets', np.int64),
+    ('meta_blob', np.uint8),
+]
+
+
+def store_path_for(traces_path):
+    return os.path.abspath(traces_path).rstrip('/') + STORE_SUFFIX
+
+
+def name_to_label(name):
+    '''"0-1.cell" -> (0, 1); "100.cell" -> (-1, 100); anything else -> (-1, -1).'''
+    stem = name.split('.')[0]
+    try:
+        if '-' in stem:
+            site, inst = stem.split('-')[:2]
+            return int(site), int(inst)
+        return -1, int(stem)
+    except ValueError:
+        return -1, -1
+
+
+def parse_text(fpath):
+    '''Parse a "time\\tlength[\\tjson]" trace file.
+    Returns (times, lengths, metas) where metas is a list of (position, json string).'''
+    times = []
+    lengths = []
+    metas = []
+    with open(fpath, 'r') as f:
+        for line in f:
+            cols = line.rstrip('\n').split('\t', 2)
+            if len(cols) < 2:
+                continue
+            times.append(float(cols[0]))
+            lengths.append(int(float(cols[1])))
+            if len(cols) > 2 and cols[2]:
+                metas.append((len(lengths) - 1, cols[2]))
+    return np.array(times, dtype=np.float64), np.array(lengths, dtype=np.int32), metas
+
+
+def _file_stat(fpath):
+    '''[size, mtime in ns] of a trace file, as recorded in the store header.'''
+    st = os.stat(fpath)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _parse_worker(fpath):
+    # stat before reading, so a rewrite while parsing makes the store stale
+    return os.path.basename(fpath), _file_stat(fpath), parse_text(fpath)
+
+
+def pack(traces_path, out_path=None, suffix='', n_jobs=None):
+    '''Pack every file matching `suffix` in traces_path into one store file.'''
+    if out_path is None:
+        out_path = store_path_for(traces_path)
+    flist = sorted(os.path.join(traces_path, f) for f in os.listdir(traces_path)
+                   if f.endswith(suffix) and os.path.isfile(os.path.join(traces_path, f)))
+    logger.info("Packing %d traces from %s", len(flist), traces_path)
+
+    names = []
+    stats = []
+    offsets = [0]
+    meta_index, meta_offsets, meta_blob = [], [0], bytearray()
+    # Stream the two big columns to temp files so the dataset is never held in memory
+    tmpdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        tpath = os.path.join(tmpdir, 'times')
+        lpath = os.path.join(tmpdir, 'lengths')
+        with open(tpath, 'wb') as ft, open(lpath, 'wb') as fl:
+            pool = mp.Pool(n_jobs or mp.cpu_count())
+            try:
+                for name, stat, (times, lengths, metas) in pool.imap(_parse_worker, flist, chunksize=64):
+                    for pos, meta in metas:
+                        meta_index.append(offsets[-1] + pos)
+                        meta_blob += meta.encode('utf-8')
+                        meta_offsets.append(len(meta_blob))
+                    ft.write(times.tobytes())
+                    fl.write(lengths.tobytes())
+                    names.append(name)
+                    stats.append(stat)
+                    offsets.append(offsets[-1] + len(times))
+            finally:
+                pool.close()
+                pool.join()
+
+        labels = [name_to_label(n) for n in names]
+        arrays = {
+            'offsets': np.array(offsets, dtype=np.int64),
+            'sites': np.array([l[0] for l in labels], dtype=np.int32),
+            'insts': np.array([l[1] for l in labels], dtype=np.int32),
+            'meta_index': np.array(meta_index, dtype=np.int64),
+            'meta_offsets': np.array(meta_offsets, dtype=np.int64),
+            'meta_blob': np.frombuffer(bytes(meta_blob), dtype=np.uint8),
+        }
+        n_packets = offsets[-1]
+        counts = {'times': n_packets, 'lengths': n_packets}
+        counts.update({k: len(v) for k, v in arrays.items()})
+
+        header = {'version': 2, 'n_traces': len(names), 'n_packets': n_packets,
+                  'names': names, 'stats': stats, 'sections': {}}
+        # Section offsets depend on the header size, so lay out twice until it is stable
+        start = 0
+        while True:
+            header_bytes = json.dumps(header).encode('utf-8')
+            pos = _align(len(MAGIC) + 8 + len(header_bytes))
+            if pos == start:
+                break
+            start = pos
+            for key, dtype in SECTIONS:
+                header['sections'][key] = [pos, counts[key]]
+                pos = _align(pos + counts[key] * np.dtype(dtype).itemsize)
+
+        tmp_out = out_path + '.tmp'
+        with open(tmp_out, 'wb') as fo:
+            fo.write(MAGIC)
+            fo.write(np.uint64(len(header_bytes)).tobytes())
+            fo.write(header_bytes)
+            for key, dtype in SECTIONS:
+                _pad_to(fo, header['sections'][key][0])
+                if key == 'times':
+                    with open(tpath, 'rb') as fi:
+                        shutil.copyfileobj(fi, fo)
+                elif key == 'lengths':
+                    with open(lpath, 'rb') as fi:
+                        shutil.copyfileobj(fi, fo)
+                else:
+                    fo.write(arrays[key].astype(dtype).tobytes())
+        os.replace(tmp_out, out_path)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    logger.info("Packed %d packets into %s", n_packets, out_path)
+    return out_path
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _pad_to(fo, pos):
+    fo.write(b'\0' * (pos - fo.tell()))
+
+
+class TraceStore(object):
+    '''Read-only view over a packed store. All trace accessors return zero-copy slices
+    of the underlying memory map.'''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a trace store".format(path))
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        self._buf = np.memmap(path, dtype=np.uint8, mode='r')
+        for key, dtype in SECTIONS:
+            start, count = header['sections'][key]
+            nbytes = count * np.dtype(dtype).itemsize
+            setattr(self, key, self._buf[start:start + nbytes].view(dtype))
+        self.names = header['names']
+        self.stats = header.get('stats')
+        self._index = {n: i for i, n in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def index(self, key):
+        if isinstance(key, (int, np.integer)):
+            return int(key)
+        return self._index[key]
+
+    def stale(self, traces_path):
+        '''Why the store no longer matches traces_path, or None if it does.'''
+        if os.path.getmtime(self.path) < os.path.getmtime(traces_path):
+            return "files were added or removed after packing"
+        if self.stats is None:
+            return "it has no file stats, pack it again"
+        for name, stat in zip(self.names, self.stats):
+            try:
+                if _file_stat(os.path.join(traces_path, name)) != stat:
+                    return "{} changed after packing".format(name)
+            except OSError:
+                return "{} is missing".format(name)
+        return None
+
+    def label(self, key):
+        i = self.index(key)
+        return int(self.sites[i]), int(self.insts[i])
+
+    def get(self, key):
+        '''(times, lengths) of a trace, by file name or position.'''
+        i = self.index(key)
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.times[a:b], self.lengths[a:b]
+
+    def metadata(self, key):
+        '''{packet position within the trace: metadata dict} of a trace.'''
+        i = self.index(key)
+        a, b = self.offsets[i], self.offsets[i + 1]
+        lo, hi = np.searchsorted(self.meta_index, [a, b])
+        metas = {}
+        for m in range(lo, hi):
+            raw = self.meta_blob[self.meta_offsets[m]:self.meta_offsets[m + 1]]
+            metas[int(self.meta_index[m] - a)] = json.loads(raw.tobytes().decode('utf-8'))
+        return metas
+
+
+_stores = {}
+
+
+def open_store(traces_path):
+    '''Cached TraceStore for a dataset directory, or None if it has not been packed
+    (or a trace changed after packing).'''
+    path = store_path_for(traces_path)
+    if path not in _stores:
+        store = None
+        if os.path.exists(path):
+            store = TraceStore(path)
+            reason = store.stale(traces_path)
+            if reason is not None:
+                logger.warning("Ignoring %s: %s", path, reason)
+                store = None
+        _stores[path] = store
+    return _stores[path]
+
+
+def load(fpath):
+    '''(times, lengths) of a trace file, served from the packed store of its
+    directory when there is one and parsed from text otherwise.'''
+    store = open_store(os.path.dirname(os.path.abspath(fpath)))
+    name = os.path.basename(fpath)
+    if store is not None and name in store:
+        return store.get(name)
+    times, lengths, _ = parse_text(fpath)
+    return times, lengths
+
+
+def load_trace(fpath):
+    '''Drop-in for the pandas based load_trace helpers: an (n, 2) float array.'''
+    times, lengths = load(fpath)
+    return np.column_stack((times, lengths.astype(np.float64)))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Pack a trace directory into one memory-mapped store.')
+
+    parser.add_argument('p',
+                        metavar='<traces path>',
+                        help='Path to the directory with the traffic traces.')
+    parser.add_argument('-format',
+                        metavar='<suffix of a file>',
+                        default='',
+                        help='suffix of a file.')
+    parser.add_argument('-o',
+                        metavar='<store path>',
+                        default=None,
+                        help='Output store, <traces path>.wfts by default.')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    args = parse_arguments()
+    pack(args.p, args.o, args.format)
@@ -1,36 +1,222 @@
+import bisect
+import csv
 import heapq
-import random
+import os
 import json
 import logging
 import sys
 
 import math
+import itertools
+
+import numpy as np
+
+from gf2_decoder import GF2Decoder
+from lt_coverage import LTCoverage
 
 logger = logging.getLogger('transport_sim')
 logging.basicConfig(level=logging.INFO)
 
+# Event types of the simulation heap, whose entries are (time, counter, type, packet index)
+ARRIVAL, TIMEOUT, ACK, ACK_CLEAR = range(4)
+
+
+# Debug log levels. The defense drivers always pass a debug_log_path, so the level
+# comes from the TRANSPORT_SIM_DEBUG environment variable unless given explicitly:
+#   off      no debug file
+#   summary  run parameters, the stats line and per-event-type counts (default)
+#   events   additionally one CSV record per event
+DEBUG_OFF, DEBUG_SUMMARY, DEBUG_EVENTS = range(3)
+DEBUG_LEVELS = {'off': DEBUG_OFF, 'summary': DEBUG_SUMMARY, 'events': DEBUG_EVENTS}
+
+(EV_SEND, EV_ARRIVAL, EV_LOST_REAL, EV_LOST_FEC_DUMMY, EV_RETRANS_ARRIVED,
+ EV_RECOVERED, EV_TIMEOUT_RETRANS, EV_LOST_RETRANS) = range(8)
+EVENT_NAMES = ['PACKET_SEND', 'PACKET_ARRIVAL', 'LOST_REAL', 'LOST_FEC_DUMMY', 'RETRANS_ARRIVED',
+               'RECOVERED', 'TIMEOUT_RETRANS', 'LOST_RETRANS']
+
+
+class EventSink:
+    """
+    Debug log of one simulation run. Callers check `enabled` before calling
+    event(), so a disabled sink costs one boolean test per event and formats nothing.
+    """
+    __slots__ = ('level', 'enabled', 'counts', '_file', '_writer')
+
+    def __init__(self, path, level):
+        self.level = level if path else DEBUG_OFF
+        self.counts = [0] * len(EVENT_NAMES)
+        self._file = None
+        self._writer = None
+        if self.level > DEBUG_OFF:
+            try:
+                self._file = open(path, 'w', buffering=1 << 16, newline='')
+            except Exception as e:
+                print(f"Failed to open debug log: {e}")
+                self.level = DEBUG_OFF
+        self.enabled = self.level > DEBUG_OFF
+
+    def header(self, line):
+        if self._file:
+            self._file.write(line + '\n')
+            if self.level >= DEBUG_EVENTS:
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(['event', 'dir', 'ts', 'sim_id', 'type', 'info'])
+
+    def event(self, ev, direction, ts, sim_id='', pkt_type='', info=''):
+        self.counts[ev] += 1
+        if self._writer:
+            if isinstance(info, dict):
+                info = json.dumps(info, separators=(',', ':'))
+            self._writer.writerow([EVENT_NAMES[ev], direction, f"{ts:.4f}", sim_id, pkt_type, info])
+
+    def close(self, stats_line):
+        if self._file:
+            self._file.write(stats_line + '\n')
+            self._file.write("[TransportSimulator] Events: " +
+                             ", ".join(f"{name}={c}" for name, c in zip(EVENT_NAMES, self.counts)) + '\n')
+            self._file.close()
+            self._file = None
+
+
+def loss_generator(seed):
+    """
+    numpy generator whose random_sample() values are the random.random() values
+    drawn after random.seed(seed): CPython seeds MT19937 with the 32-bit words of
+    abs(seed), which RandomState does for a list key (not for a 1-element array).
+    """
+    if seed is None:
+        return np.random.RandomState()
+    seed = abs(seed)
+    key = []
+    while True:
+        key.append(seed & 0xffffffff)
+        seed >>= 32
+        if not seed:
+            return np.random.RandomState(key)
+
+
+class SeedDraws:
+    """
+    The random.random() stream of one seed (or the stream of a numpy Generator),
+    drawn in blocks and kept, so the runs of every loss rate read the same values
+    without redrawing them.
+    """
+    __slots__ = ('rng', 'u')
+
+    def __init__(self, seed, n, rng=None):
+        self.rng = loss_generator(seed) if rng is None else rng
+        self.u = self.rng.random(n)
+
+    def decisions(self, loss_rate, start):
+        """Loss decisions (u < loss_rate) from draw `start` on, extending the stream as needed."""
+        pos = start
+        while True:
+            if pos == len(self.u):
+                self.u = np.concatenate((self.u, self.rng.random(max(len(self.u), 1024))))
+            block = self.u[pos:]
+            yield from (block < loss_rate).tolist()
+            pos += len(block)
+
+
+def format_stats(stats, tag=''):
+    """The stats line of one run; sweeps tag it with the loss rate and seed."""
+    return (f"[TransportSimulator] Stats{tag}: Total Real={stats['total_real']}, FEC={stats['total_fec']}, "
+            f"Dummy={stats['total_dummy']}, Lost={stats['lost_real']}, Recovered={stats['recovered_real']}, "
+            f"Retransmitted={stats['retransmitted_real']}, FCT={stats['fct']:.4f}, AvgLatency={stats['avg_latency']:.4f}")
+
+
+class PacketTable:
+    """
+    Struct-of-arrays state of the packets of one simulation run; packet i is
+    column i of every list. sim_id 0 means "no sim_id yet" (real packets count from 1).
+    """
+    __slots__ = ('original_ts', 'length', 'metadata', 'is_real', 'direction',
+                 'sim_id', 'retrans_count', 'delivered', 'acked')
+
+    def __init__(self, trace, is_real):
+        n = len(trace)
+        self.original_ts = [p[0] for p in trace]
+        self.length = [p[1] for p in trace]
+        self.metadata = [p[2] if len(p) > 2 else {} for p in trace]
+        self.is_real = [is_real(p) for p in trace]
+        self.direction = [1 if l > 0 else -1 for l in self.length]
+        self.reset()
+
+    def reset(self):
+        """Clear the per-run state, so the table can be simulated again."""
+        n = len(self.length)
+        self.sim_id = [0] * n
+        self.retrans_count = [0] * n
+        self.delivered = [False] * n
+        self.acked = [False] * n
+
+    def __len__(self):
+        return len(self.length)
+
+class LostPackets:
+    """
+    sim_id -> packet index of the lost real packets of one direction, plus the ids in
+    sorted order so FEC packets can look up the lost ids of their range by bisection.
+    Only the operations that keep the two in step are exposed.
+    """
+    __slots__ = ('packets', 'ids')
+
+    def __init__(self):
+        self.packets = {}
+        self.ids = []
+
+    def __len__(self):
+        return len(self.packets)
+
+    def __contains__(self, sim_id):
+        return sim_id in self.packets
+
+    def __getitem__(self, sim_id):
+        return self.packets[sim_id]
+
+    def __setitem__(self, sim_id, packet):
+        if sim_id not in self.packets:
+            # ids are mostly lost in increasing order, so this is usually an append
+            if not self.ids or sim_id > self.ids[-1]:
+                self.ids.append(sim_id)
+            else:
+                bisect.insort(self.ids, sim_id)
+        self.packets[sim_id] = packet
+
+    def __delitem__(self, sim_id):
+        del self.packets[sim_id]
+        del self.ids[bisect.bisect_left(self.ids, sim_id)]
+
+    def in_range(self, start_id, end_id):
+        """Lost ids in [start_id, end_id], increasing."""
+        return self.ids[bisect.bisect_left(self.ids, start_id):bisect.bisect_right(self.ids, end_id)]
+
+
 class TransportSimulator:
-    def __init__(self, loss_rate=0.0, rtt=0.1, max_inflight=20, seed=None, debug_log_path=None, external_fec_rate=0.0):
+    def __init__(self, loss_rate=0.0, rtt=0.1, max_inflight=20, seed=None, debug_log_path=None, external_fec_rate=0.0, debug_level=None, rng=None):
+        """
+        Loss decisions come from rng, a numpy Generator (e.g. the per-trace transport
+        stream of seeding.trace_rngs), if given; otherwise from the random.random()
+        stream of seed, without touching the random module's state.
+        """
         self.loss_rate = loss_rate
         self.rtt = rtt
         self.max_inflight = max_inflight
         self.seed = seed
+        self.rng = rng
         self.debug_log_path = debug_log_path
+        if debug_level is None:
+            debug_level = os.environ.get('TRANSPORT_SIM_DEBUG', 'summary')
+        self.debug_level = DEBUG_LEVELS[debug_level] if isinstance(debug_level, str) else debug_level
         self.external_fec_rate = external_fec_rate
-        if seed:
-            random.seed(seed)
             
         # State for Gaussian Elimination (Shared by Strategy D and C)
-        self.gaussian_equations = {1: [], -1: []}
+        self.gaussian_equations = {1: GF2Decoder(), -1: GF2Decoder()}
         # State for Strategy B (MDS Block)
         self.strategy_b_state = {1: {}, -1: {}}
         
-        # Debug Log File Handle
-        self.log_file = None
-
-    def _log_event(self, event_type, details):
-        if self.log_file:
-            self.log_file.write(f"[{event_type}] {details}\n")
+        # Debug log of the current run
+        self.sink = None
 
     def _is_real(self, packet):
         meta = packet[2] if len(packet) > 2 else {}
@@ -103,196 +289,245 @@ class TransportSimulator:
         
         return new_trace
 
-    def simulate(self, trace):
-        random.seed(self.seed)
-        
+    def _prepare(self, trace):
+        """External FEC and the packet table of a trace, plus stats with its packet counts."""
         if self.external_fec_rate > 0:
             trace = self._apply_external_fec(trace)
-        
-        if self.debug_log_path:
-            try:
-                self.log_file = open(self.debug_log_path, 'w')
-                self.log_file.write(f"Simulation Start: Loss={self.loss_rate}, RTT={self.rtt}, MaxInflight={self.max_inflight}, Seed={self.seed}\n")
-            except Exception as e:
-                print(f"Failed to open debug log: {e}")
-
-        # Reset state
-        self.gaussian_equations = {1: [], -1: []}
-        self.strategy_b_state = {1: {}, -1: {}}
-        
+        pkts = PacketTable(trace, self._is_real)
+        total_fec = sum(1 for i in range(len(pkts)) if not pkts.is_real[i] and pkts.metadata[i].get('type') == 'FEC')
+        total_real = sum(pkts.is_real)
         stats = {
-            'total_real': 0,
-            'total_fec': 0,
-            'total_dummy': 0,
+            'total_real': total_real,
+            'total_fec': total_fec,
+            'total_dummy': len(pkts) - total_real - total_fec,
             'lost_real': 0,
             'recovered_real': 0,
             'retransmitted_real': 0,
             'total_latency': 0.0
         }
+        return pkts, stats
+
+    def simulate(self, trace):
+        pkts, stats = self._prepare(trace)
         
-        # Pre-process trace to identify types
-        trace_queue = []
-        for p in trace:
-            pkt_info = {
-                'original_ts': p[0],
-                'length': p[1],
-                'metadata': p[2] if len(p) > 2 else {},
-                'is_real': self._is_real(p),
-                'sim_id': None,
-                'retrans_count': 0,
-                'delivered': False,
-                'acked': False
-            }
-            if pkt_info['is_real']:
-                stats['total_real'] += 1
-            else:
-                meta = pkt_info['metadata']
-                if meta.get('type') == 'FEC':
-                    stats['total_fec'] += 1
-                else:
-                    stats['total_dummy'] += 1
-            trace_queue.append(pkt_info)
+        self.sink = sink = EventSink(self.debug_log_path, self.debug_level)
+        sink.header(f"Simulation Start: Loss={self.loss_rate}, RTT={self.rtt}, MaxInflight={self.max_inflight}, Seed={self.seed}")
+
+        loss_rate = self.loss_rate
+        lost = self._decisions(len(pkts), loss_rate)
+        final_trace = self._run(pkts, stats, lost, sink, loss_rate)
+        
+        stats_line = format_stats(stats)
+        print(stats_line, flush=True)
+        
+        sink.close(stats_line)
+            
+        return final_trace
+
+    def _decisions(self, n, loss_rate):
+        """
+        Loss decisions of simulate(). Nothing is drawn before the first one is asked
+        for, so a run that takes the lossless path leaves the stream untouched.
+        """
+        yield from SeedDraws(self.seed, n, self.rng).decisions(loss_rate, 0)
+
+    def simulate_many(self, trace, loss_rates, seeds=None):
+        """
+        simulate(trace) for every combination of loss_rates and seeds (default: self.seed,
+        or the rng's stream if there is one) without debug logs. The trace is
+        preprocessed once, and the loss decisions of all runs come from one
+        (seeds x loss rates x draws) matrix compared against the random.random()
+        values each seed would produce, so every run gives the same stats as
+        simulate() with that loss rate and seed.
+        Prints a tagged stats line per run and returns the stats dicts, seed-major.
+        """
+        use_rng = seeds is None and self.rng is not None
+        seeds = [self.seed] if seeds is None else list(seeds)
+        rates = np.asarray(loss_rates, dtype=float)
+        pkts, totals = self._prepare(trace)
+        # every packet is sent once; retransmissions past this read further draws lazily
+        n_draws = len(pkts) + len(pkts) // 2 + 64
+        if use_rng:
+            draws = [SeedDraws(None, n_draws, self.rng)]
+        else:
+            draws = [SeedDraws(seed, n_draws) for seed in seeds]
+        lost = np.stack([d.u for d in draws])[:, np.newaxis, :] < rates[:, np.newaxis]
+        sink = EventSink(None, DEBUG_OFF)
+        results = []
+        for s, seed in enumerate(seeds):
+            for r, loss_rate in enumerate(rates.tolist()):
+                pkts.reset()
+                stats = dict(totals)
+                decisions = itertools.chain(lost[s, r].tolist(), draws[s].decisions(loss_rate, n_draws))
+                self._run(pkts, stats, decisions, sink, loss_rate)
+                print(format_stats(stats, f"(Loss={loss_rate}, Seed={seed})"), flush=True)
+                stats['loss_rate'] = loss_rate
+                stats['seed'] = seed
+                results.append(stats)
+        return results
+
+    def _run(self, pkts, stats, lost, sink, loss_rate):
+        """
+        One simulation of the packet table. `lost` yields the loss decision of every
+        transmission in order; stats are updated in place (plus 'fct' and 'avg_latency').
+        Returns the delivered trace.
+        """
+        if loss_rate <= 0 and sink.level < DEBUG_EVENTS:
+            final_trace = self._run_lossless(pkts, stats, sink)
+            if final_trace is not None:
+                return final_trace
+
+        log = sink.enabled
+
+        # Reset state
+        self.gaussian_equations = {1: GF2Decoder(), -1: GF2Decoder()}
+        self.strategy_b_state = {1: {}, -1: {}}
+        
+        original_ts, length, metadata = pkts.original_ts, pkts.length, pkts.metadata
+        is_real, directions, sim_ids = pkts.is_real, pkts.direction, pkts.sim_id
+        retrans_count, delivered, acked = pkts.retrans_count, pkts.delivered, pkts.acked
 
         # Simulation State
         current_time = 0.0
         trace_idx = 0
+        n_pkts = len(pkts)
         inflight = {1: 0, -1: 0}
         sim_id_counters = {1: 0, -1: 0}
-        lost_real_packets = {1: {}, -1: {}}
+        lost_real_packets = {1: LostPackets(), -1: LostPackets()}
         
         events = []
         event_counter = 0
+        rto = self.rtt * 1.5
+        half_rtt = self.rtt / 2
         
         final_trace = []
         
-        while trace_idx < len(trace_queue) or events:
-            next_trace_ts = trace_queue[trace_idx]['original_ts'] if trace_idx < len(trace_queue) else float('inf')
+        while trace_idx < n_pkts or events:
+            next_trace_ts = original_ts[trace_idx] if trace_idx < n_pkts else float('inf')
             next_event_ts = events[0][0] if events else float('inf')
             
             can_send = False
-            if trace_idx < len(trace_queue):
-                p = trace_queue[trace_idx]
-                direction = 1 if p['length'] > 0 else -1
+            if trace_idx < n_pkts:
+                direction = directions[trace_idx]
                 if inflight[direction] < self.max_inflight:
                     effective_send_time = max(current_time, next_trace_ts)
                     if effective_send_time <= next_event_ts:
                         can_send = True
             
             if can_send:
-                p = trace_queue[trace_idx]
-                current_time = max(current_time, p['original_ts'])
-                direction = 1 if p['length'] > 0 else -1
+                i = trace_idx
+                current_time = max(current_time, original_ts[i])
+                direction = directions[i]
                 
-                if p['is_real'] and p['sim_id'] is None:
+                if is_real[i] and sim_ids[i] == 0:
                     sim_id_counters[direction] += 1
-                    p['sim_id'] = sim_id_counters[direction]
+                    sim_ids[i] = sim_id_counters[direction]
                 
                 inflight[direction] += 1
                 trace_idx += 1
                 
-                # Log SEND event
-                pkt_type = "REAL" if p['is_real'] else p['metadata'].get('type', 'DUMMY')
-                meta_str = json.dumps(p['metadata']) if not p['is_real'] else ""
-                sim_id_str = f"sim_id={p['sim_id']}" if p['is_real'] else ""
-                self._log_event("PACKET_SEND", f"type={pkt_type}, dir={direction}, ts={current_time:.4f}, {sim_id_str} {meta_str}")
+                if log:
+                    if is_real[i]:
+                        sink.event(EV_SEND, direction, current_time, sim_ids[i], "REAL")
+                    else:
+                        sink.event(EV_SEND, direction, current_time, '', metadata[i].get('type', 'DUMMY'), metadata[i])
                 
-                is_lost = random.random() < self.loss_rate
+                is_lost = next(lost)
                 
                 if is_lost:
-                    if p['is_real']:
-                        if p['retrans_count'] == 0:
+                    if is_real[i]:
+                        if retrans_count[i] == 0:
                             stats['lost_real'] += 1
-                            self._log_event("LOST_REAL", f"sim_id={p['sim_id']}, dir={direction}, ts={current_time:.4f}")
-                        lost_real_packets[direction][p['sim_id']] = p
+                            if log: sink.event(EV_LOST_REAL, direction, current_time, sim_ids[i])
+                        lost_real_packets[direction][sim_ids[i]] = i
                         
-                        rto = self.rtt * 1.5
-                        heapq.heappush(events, (current_time + rto, event_counter, 'TIMEOUT', p))
+                        heapq.heappush(events, (current_time + rto, event_counter, TIMEOUT, i))
                         event_counter += 1
                     else:
-                        self._log_event("LOST_FEC_DUMMY", f"type={p['metadata'].get('type', 'DUMMY')}, dir={direction}, ts={current_time:.4f}")
-                        heapq.heappush(events, (current_time + self.rtt, event_counter, 'ACK_CLEAR', p))
+                        if log: sink.event(EV_LOST_FEC_DUMMY, direction, current_time, '', metadata[i].get('type', 'DUMMY'))
+                        heapq.heappush(events, (current_time + self.rtt, event_counter, ACK_CLEAR, i))
                         event_counter += 1
                 else:
-                    arrival_time = current_time + (self.rtt / 2)
-                    heapq.heappush(events, (arrival_time, event_counter, 'ARRIVAL', p))
+                    arrival_time = current_time + half_rtt
+                    heapq.heappush(events, (arrival_time, event_counter, ARRIVAL, i))
                     event_counter += 1
                     
             else:
                 if not events: break
                 
-                ts, _, etype, p = heapq.heappop(events)
+                ts, _, etype, i = heapq.heappop(events)
                 current_time = ts
-                direction = 1 if p['length'] > 0 else -1
+                direction = directions[i]
                 
-                if etype == 'ARRIVAL':
-                    final_trace.append([current_time, p['length'], p['metadata']])
+                if etype == ARRIVAL:
+                    final_trace.append([current_time, length[i], metadata[i]])
                     
-                    # Log ARRIVAL event
-                    pkt_type = "REAL" if p['is_real'] else p['metadata'].get('type', 'DUMMY')
-                    meta_str = json.dumps(p['metadata']) if not p['is_real'] else ""
-                    sim_id_str = f"sim_id={p['sim_id']}" if p['is_real'] else ""
-                    self._log_event("PACKET_ARRIVAL", f"type={pkt_type}, dir={direction}, ts={current_time:.4f}, {sim_id_str} {meta_str}")
+                    if log:
+                        if is_real[i]:
+                            sink.event(EV_ARRIVAL, direction, current_time, sim_ids[i], "REAL")
+                        else:
+                            sink.event(EV_ARRIVAL, direction, current_time, '', metadata[i].get('type', 'DUMMY'), metadata[i])
                     
-                    if p['is_real']:
-                        if p['sim_id'] in lost_real_packets[direction]:
-                             del lost_real_packets[direction][p['sim_id']]
-                             self._remove_recovered_id_from_equations(direction, p['sim_id'])
-                             self._log_event("RETRANS_ARRIVED", f"sim_id={p['sim_id']}, dir={direction}, ts={current_time:.4f}")
+                    if is_real[i]:
+                        if sim_ids[i] in lost_real_packets[direction]:
+                             del lost_real_packets[direction][sim_ids[i]]
+                             self._remove_recovered_id_from_equations(direction, sim_ids[i])
+                             if log: sink.event(EV_RETRANS_ARRIVED, direction, current_time, sim_ids[i])
                         
-                        if not p['delivered']:
-                            p['delivered'] = True
-                            latency = current_time - p['original_ts']
+                        if not delivered[i]:
+                            delivered[i] = True
+                            latency = current_time - original_ts[i]
                             stats['total_latency'] += latency
                         
-                        ack_time = current_time + (self.rtt / 2)
-                        heapq.heappush(events, (ack_time, event_counter, 'ACK', p))
+                        ack_time = current_time + half_rtt
+                        heapq.heappush(events, (ack_time, event_counter, ACK, i))
                         event_counter += 1
                         
                     else:
                         # FEC/Dummy arrived
-                        recovered_pkts = self._process_fec(p, lost_real_packets)
-                        for rec_p in recovered_pkts:
-                            final_trace.append([current_time, rec_p['length'], rec_p['metadata']])
+                        recovered = self._process_fec(metadata[i], direction, lost_real_packets)
+                        for r in recovered:
+                            delivered[r] = True
+                            final_trace.append([current_time, length[r], metadata[r]])
                             stats['recovered_real'] += 1
-                            latency = current_time - rec_p['original_ts']
+                            latency = current_time - original_ts[r]
                             stats['total_latency'] += latency
                             
-                            self._log_event("RECOVERED", f"sim_id={rec_p['sim_id']}, dir={direction}, ts={current_time:.4f}, via_fec_ts={current_time:.4f}")
+                            if log: sink.event(EV_RECOVERED, direction, current_time, sim_ids[r])
                             
-                            ack_time = current_time + (self.rtt / 2)
-                            heapq.heappush(events, (ack_time, event_counter, 'ACK', rec_p))
+                            ack_time = current_time + half_rtt
+                            heapq.heappush(events, (ack_time, event_counter, ACK, r))
                             event_counter += 1
                             
-                        ack_time = current_time + (self.rtt / 2)
-                        heapq.heappush(events, (ack_time, event_counter, 'ACK_CLEAR', p))
+                        ack_time = current_time + half_rtt
+                        heapq.heappush(events, (ack_time, event_counter, ACK_CLEAR, i))
                         event_counter += 1
 
-                elif etype == 'ACK':
-                    if not p['acked']:
-                        p['acked'] = True
+                elif etype == ACK:
+                    if not acked[i]:
+                        acked[i] = True
                         inflight[direction] -= 1
                         
-                elif etype == 'ACK_CLEAR':
+                elif etype == ACK_CLEAR:
                     inflight[direction] -= 1
 
-                elif etype == 'TIMEOUT':
-                    if p['delivered'] or p['acked']:
+                elif etype == TIMEOUT:
+                    if delivered[i] or acked[i]:
                         continue
                     
-                    if p['is_real']:
-                        p['retrans_count'] += 1
+                    if is_real[i]:
+                        retrans_count[i] += 1
                         stats['retransmitted_real'] += 1
-                        self._log_event("TIMEOUT_RETRANS", f"sim_id={p['sim_id']}, dir={direction}, count={p['retrans_count']}, ts={current_time:.4f}")
+                        if log: sink.event(EV_TIMEOUT_RETRANS, direction, current_time, sim_ids[i], info=retrans_count[i])
                         
-                        is_lost = random.random() < self.loss_rate
+                        is_lost = next(lost)
                         if is_lost:
-                            self._log_event("LOST_RETRANS", f"sim_id={p['sim_id']}, dir={direction}, ts={current_time:.4f}")
-                            rto = self.rtt * 1.5
-                            heapq.heappush(events, (current_time + rto, event_counter, 'TIMEOUT', p))
+                            if log: sink.event(EV_LOST_RETRANS, direction, current_time, sim_ids[i])
+                            heapq.heappush(events, (current_time + rto, event_counter, TIMEOUT, i))
                             event_counter += 1
                         else:
-                            arrival_time = current_time + (self.rtt / 2)
-                            heapq.heappush(events, (arrival_time, event_counter, 'ARRIVAL', p))
+                            arrival_time = current_time + half_rtt
+                            heapq.heappush(events, (arrival_time, event_counter, ARRIVAL, i))
                             event_counter += 1
 
         final_trace.sort(key=lambda x: x[0])
@@ -303,35 +538,60 @@ class TransportSimulator:
                 fct = final_trace[i][0]
                 break
         
-        avg_latency = stats['total_latency'] / stats['total_real'] if stats['total_real'] > 0 else 0.0
-        
-        stats_line = f"[TransportSimulator] Stats: Total Real={stats['total_real']}, FEC={stats['total_fec']}, Dummy={stats['total_dummy']}, Lost={stats['lost_real']}, Recovered={stats['recovered_real']}, Retransmitted={stats['retransmitted_real']}, FCT={fct:.4f}, AvgLatency={avg_latency:.4f}"
-        print(stats_line, flush=True)
-        
-        if self.debug_log_path:
-            with open(self.debug_log_path, 'a') as f:
-                f.write(stats_line + '\n')
-        
-        if self.log_file:
-            self.log_file.close()
-            
+        stats['fct'] = fct
+        stats['avg_latency'] = stats['total_latency'] / stats['total_real'] if stats['total_real'] > 0 else 0.0
         return final_trace
 
+    def _run_lossless(self, pkts, stats, sink):
+        """
+        _run() without loss, computed with numpy when no packet ever waits for the
+        congestion window; returns None when one would, or the trace is not sorted.
+        Without loss every packet is sent at its timestamp if its direction has fewer
+        than max_inflight packets unacknowledged, arrives rtt/2 later and is
+        acknowledged another rtt/2 later. An ACK due at a send time is processed
+        after that send, as in the event loop.
+        """
+        n = len(pkts)
+        if n == 0:
+            return None
+        ts = np.asarray(pkts.original_ts, dtype=float)
+        if np.any(ts[1:] < ts[:-1]):
+            return None
+        half_rtt = self.rtt / 2
+        arrival = ts + half_rtt
+        ack = arrival + half_rtt
+        directions = np.asarray(pkts.direction)
+        for direction in (1, -1):
+            sel = directions == direction
+            t, a = ts[sel], ack[sel]
+            # packets of this direction sent before and not acknowledged strictly before t
+            inflight = np.arange(len(t)) - np.searchsorted(a, t, side='left')
+            if len(t) and inflight.max() >= self.max_inflight:
+                return None
+
+        is_real = np.asarray(pkts.is_real, dtype=bool)
+        if is_real.any():
+            # same summation order as the event loop, which adds latencies in arrival order
+            stats['total_latency'] = float(np.cumsum(arrival[is_real] - ts[is_real])[-1])
+            stats['fct'] = float(arrival[np.flatnonzero(is_real)[-1]])
+        else:
+            stats['fct'] = 0.0
+        stats['avg_latency'] = stats['total_latency'] / stats['total_real'] if stats['total_real'] > 0 else 0.0
+        sink.counts[EV_SEND] += n
+        sink.counts[EV_ARRIVAL] += n
+        return [[t, l, m] for t, l, m in zip(arrival.tolist(), pkts.length, pkts.metadata)]
+
     def _remove_recovered_id_from_equations(self, direction, sim_id):
-        new_eqs = []
-        for eq in self.gaussian_equations[direction]:
-            if sim_id in eq:
-                eq.remove(sim_id)
-            if eq:
-                new_eqs.append(eq)
-        self.gaussian_equations[direction] = new_eqs
-
-    def _process_fec(self, fec_pkt, lost_real_packets):
-        meta = fec_pkt['metadata']
+        self.gaussian_equations[direction].remove(sim_id)
+
+    def _process_fec(self, meta, direction, lost_real_packets):
+        """
+        Handles the arrival of a FEC/dummy packet with metadata `meta`.
+        Returns the packet indices recovered by it, removed from lost_real_packets.
+        """
         if not meta:
             return []
             
-        direction = 1 if fec_pkt['length'] > 0 else -1
         recovered_ids = []
         
         # Strategy B: MDS Block Recovery
@@ -348,10 +608,7 @@ class TransportSimulator:
             start_id = block_id * block_size + 1
             end_id = start_id + protected_count - 1
             
-            lost_in_block = []
-            for sim_id in lost_real_packets[direction]:
-                if start_id <= sim_id <= end_id:
-                    lost_in_block.append(sim_id)
+            lost_in_block = lost_real_packets[direction].in_range(start_id, end_id)
             
             if self.strategy_b_state[direction][block_id]['fec_count'] >= len(lost_in_block):
                 recovered_ids.extend(lost_in_block)
@@ -361,118 +618,28 @@ class TransportSimulator:
             unknowns = set()
             
             if 'seed' in meta: # Strategy C
-                seed = meta['seed']
-                degree = meta['degree']
-                min_id = meta['min_id']
-                max_id = meta['max_id']
-                buffer_size = meta['buffer_size']
-                
-                # Reconstruct the set of IDs covered by this FEC packet
-                # We need to replicate the exact logic from FECInjector
-                # Ideally, we should import FECInjector or share the logic, but for now we duplicate it carefully.
-                # Assuming history buffer was [min_id, ..., max_id] (contiguous)
-                # NOTE: This assumption holds if no gaps in ID generation, which is true for our sim_id.
-                
-                # Re-seed random generator
-                # We need to be careful about the random state. 
-                # Using a local Random instance is safer to avoid messing up the global state.
-                rng = random.Random(seed)
-                
-                # Reconstruct history buffer IDs
-                # If buffer_size matches max_id - min_id + 1, it's contiguous.
-                # If not, we might have an issue if we don't know the exact gaps.
-                # In our simulation, sim_id is strictly increasing 1, 2, 3... so it should be contiguous.
-                history_ids = list(range(min_id, max_id + 1))
-                
-                # In case the buffer was smaller than the range (e.g. sliding window popped old ones),
-                # FECInjector logic: history_buffer.append(packet_id); if len > window: pop(0)
-                # So the buffer is always a contiguous range of IDs [min, max].
-                # Wait, if we pop(0), min_id increases. Yes.
-                # So history_ids = list(range(min_id, max_id + 1)) is correct.
-                
-                if len(history_ids) != buffer_size:
-                     # This might happen if our assumption about contiguous IDs is wrong.
-                     # But given process_real_packet logic, it should be fine.
-                     pass
-
-                if history_ids:
-                    selected_indices = rng.sample(range(len(history_ids)), degree)
-                    covered_ids = [history_ids[i] for i in selected_indices]
-                    
-                    for sim_id in covered_ids:
-                        if sim_id in lost_real_packets[direction]:
-                            unknowns.add(sim_id)
+                # only the lost ids of the window are tested against the coverage set
+                # shared with FECInjector; sim_ids are contiguous, so the window is [min_id, max_id]
+                coverage = LTCoverage.from_meta(meta)
+                unknowns.update(coverage.select(lost_real_packets[direction].in_range(coverage.min_id, coverage.max_id)))
 
             elif 'start_id' in meta: # Strategy D
                 win_start = meta['start_id']
                 win_end = meta['end_id']
-                for sim_id in lost_real_packets[direction]:
-                    if win_start <= sim_id <= win_end:
-                        unknowns.add(sim_id)
+                unknowns.update(lost_real_packets[direction].in_range(win_start, win_end))
             
             if unknowns:
-                new_row = unknowns
-                current_basis = self.gaussian_equations[direction]
-                current_basis.append(new_row)
-                
-                new_basis = []
-                current_basis.sort(key=lambda x: min(x) if x else float('inf'))
-                
-                for row in current_basis:
-                    if not row: continue
-                    while row:
-                        pivot = min(row)
-                        collision = None
-                        for b_row in new_basis:
-                            if min(b_row) == pivot:
-                                collision = b_row
-                                break
-                        if collision:
-                            row = row.symmetric_difference(collision)
-                        else:
-                            new_basis.append(row)
-                            new_basis.sort(key=lambda x: min(x))
-                            break
-                
-                self.gaussian_equations[direction] = new_basis
-                
-                for i in range(len(new_basis) - 1, -1, -1):
-                    row = new_basis[i]
-                    pivot = min(row)
-                    for j in range(i):
-                        if pivot in new_basis[j]:
-                            new_basis[j] = new_basis[j].symmetric_difference(row)
-                
-                self.gaussian_equations[direction] = new_basis
-
-                progress = True
-                while progress:
-                    progress = False
-                    solved_vars = set()
-                    for eq in self.gaussian_equations[direction]:
-                        if len(eq) == 1:
-                            solved_var = list(eq)[0]
-                            if solved_var not in solved_vars:
-                                solved_vars.add(solved_var)
-                                recovered_ids.append(solved_var)
-                                progress = True
-                    if solved_vars:
-                        new_eqs = []
-                        for eq in self.gaussian_equations[direction]:
-                            eq.difference_update(solved_vars)
-                            if eq:
-                                new_eqs.append(eq)
-                        self.gaussian_equations[direction] = new_eqs
+                # one incremental reduction; ids solved by it (or left alone in a
+                # row by earlier removals) come back in increasing order
+                recovered_ids.extend(self.gaussian_equations[direction].add(unknowns))
 
         recovered_pkts = []
         recovered_ids = list(set(recovered_ids))
         
         for rec_id in recovered_ids:
             if rec_id in lost_real_packets[direction]:
-                p = lost_real_packets[direction][rec_id]
+                recovered_pkts.append(lost_real_packets[direction][rec_id])
                 del lost_real_packets[direction][rec_id]
-                p['delivered'] = True 
-                recovered_pkts.append(p)
                 self._remove_recovered_id_from_equations(direction, rec_id)
                 
         return recovered_pkts